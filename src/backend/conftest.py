@@ -0,0 +1 @@
+# Puts src/backend on sys.path, so tests import the code as the main package.
@@ -0,0 +1,66 @@
+import sys
+import time
+
+import numpy as np
+
+from ..devices.devicetable import DeviceTable
+
+# Per-tick cost of the power consumption pass.
+# Run from src/backend with: python -m main.benchmarks.powerconsumption [sizes...]
+
+SIZES = [1_000, 100_000, 1_000_000]
+LOOP_LIMIT = 100_000    # The per-device Python loop is only timed up to this many devices.
+REPEATS = 20
+
+
+def build_table(n: int, seed: int = 0) -> DeviceTable:  # Fills a table with synthetic devices without creating Device views.
+    rng = np.random.default_rng(seed)
+    table = DeviceTable(n)
+    for code in range(14):
+        table.groups.encode(f"GROUP{code}")
+    for code in range(10):
+        table.types.encode(f"TYPE{code}")
+    for code in range(13):
+        table.locations.encode(f"LOCATION{code}")
+
+    table.size = n
+    table.in_use[:n] = True
+    table.is_turned_on[:n] = rng.random(n) < 0.5
+    table.base_power_consumption[:n] = rng.uniform(1, 200, n)
+    table.power_level[:n] = rng.integers(0, 6, n)
+    table.group_code[:n] = rng.integers(0, 14, n)
+    table.type_code[:n] = rng.integers(0, 10, n)
+    table.location_code[:n] = rng.integers(0, 13, n)
+    table.recompute_totals()
+    return table
+
+
+def time_call(function, repeats: int = REPEATS) -> float:  # Best time of a number of runs, in milliseconds.
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def python_loop(table: DeviceTable) -> float:   # Same arithmetic as the old generator sum over poweredOnDevices.
+    on = table.is_turned_on.tolist()
+    base = table.base_power_consumption.tolist()
+    level = table.power_level.tolist()
+    return sum(base[row] * (level[row] if level[row] > 0 else 1) for row in range(table.size) if on[row])
+
+
+def main(sizes: list[int]):
+    print(f"{'devices':>10} {'total (ms)':>12} {'breakdown (ms)':>15} {'python loop (ms)':>17}")
+    for n in sizes:
+        table = build_table(n)
+        total = time_call(lambda: table.power_draw().sum())
+        breakdown = time_call(table.power_summary)
+        loop = f"{time_call(lambda: python_loop(table), 3):.3f}" if n <= LOOP_LIMIT else "-"
+        assert abs(table.power_summary()["total"] - python_loop(table)) < 1e-6 * max(1.0, table.power_summary()["total"])
+        print(f"{n:>10} {total:>12.3f} {breakdown:>15.3f} {loop:>17}")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or SIZES)
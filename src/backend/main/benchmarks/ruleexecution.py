@@ -0,0 +1,72 @@
+import sys
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from ..enums.DeviceGroup import DeviceGroupEnum
+from ..enums.DeviceType import DeviceTypeEnum
+from ..tasks.SmartHome import SmartHome
+
+# Rule application throughput of a batched SmartHome.executeRules against applying the same
+# rules one by one with runCompiledRule, by number of locations.
+# Run from src/backend with: python -m main.benchmarks.ruleexecution [devices] [rules]
+
+LOCATIONS = [1, 4, 16]
+DEVICES = 20_000
+RULES = 10_000
+REPEATS = 5
+
+Location = namedtuple("Location", "name")   # Stand-in for DeviceLocationEnum, which has fewer than 16 members.
+
+
+def build_home(locationCount: int, devices: int, seed: int = 0) -> SmartHome:
+    home = SmartHome(float("inf"), 22, False, seed=seed, autoStart=False)
+    locations = [Location(f"LOCATION{index}") for index in range(locationCount)]
+    for location in locations:
+        home.addLocation(location.name)
+    home.addDevices(
+        home.createDevice(f"device{index}", DeviceTypeEnum.OTHERS, DeviceGroupEnum.LIGHTS, locations[index % locationCount], index % 2 == 0)
+        for index in range(devices)
+    )
+    return home
+
+
+def build_rules(home: SmartHome, rules: int, seed: int = 0) -> list:   # Rules on distinct devices, so none are coalesced away.
+    rng = np.random.default_rng(seed)
+    deviceIds = rng.permutation(np.arange(1, len(home.devicesById) + 1))[:rules]
+    commands = ["turn {} on", "turn {} off", "set {} 3", "flip {}"]
+    choices = rng.integers(0, len(commands), len(deviceIds))
+    return [home.compileRule(commands[choice].format(deviceId)) for choice, deviceId in zip(choices, deviceIds.tolist())]
+
+
+def batched(home: SmartHome, rules: list):
+    for rule in rules:
+        home.addRule(rule)
+    start = time.perf_counter()
+    home.executeRules()
+    return time.perf_counter() - start
+
+
+def one_by_one(home: SmartHome, rules: list):
+    start = time.perf_counter()
+    for rule in rules:
+        home.runCompiledRule(rule)
+    return time.perf_counter() - start
+
+
+def rules_per_second(run, home: SmartHome, rules: list, repeats: int = REPEATS) -> float:
+    return len(rules) / min(run(home, rules) for _ in range(repeats))
+
+
+def main(devices: int, rules: int):
+    print(f"{'locations':>10} {'batched/s':>12} {'one by one/s':>14}")
+    for locationCount in LOCATIONS:
+        home = build_home(locationCount, devices)
+        compiled = build_rules(home, rules)
+        print(f"{locationCount:>10} {rules_per_second(batched, home, compiled):>12.0f} {rules_per_second(one_by_one, home, compiled):>14.0f}")
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*(args + [DEVICES, RULES][len(args):]))
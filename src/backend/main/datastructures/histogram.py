@@ -0,0 +1,65 @@
+import bisect
+import threading
+
+
+class LatencyHistogram:     # Counts durations in geometrically sized buckets, so percentiles cost O(buckets) and memory stays fixed.
+    def __init__(self, lowest=1e-6, highest=100.0, growth=1.1):
+        self.bounds = []        # Upper bound of every bucket, in seconds. The last bucket also takes everything above highest.
+        bound = lowest
+        while bound < highest:
+            self.bounds.append(bound)
+            bound *= growth
+        self.bounds.append(highest)
+        self.counts = [0] * len(self.bounds)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.lock = threading.Lock()
+
+    def _record(self, seconds):
+        index = min(bisect.bisect_left(self.bounds, seconds), len(self.bounds) - 1)
+        self.counts[index] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def record(self, seconds):
+        with self.lock:
+            self._record(seconds)
+
+    def record_many(self, durations):
+        with self.lock:
+            for seconds in durations:
+                self._record(seconds)
+
+    def percentile(self, p):    # Upper bound of the bucket holding the p-th percentile, within one growth factor of the true value.
+        with self.lock:
+            if self.count == 0:
+                return 0.0
+            rank = max(1, -(-self.count * p // 100))    # Ceiling of count * p / 100.
+            seen = 0
+            for bound, count in zip(self.bounds, self.counts):
+                seen += count
+                if seen >= rank:
+                    return min(bound, self.max)
+            return self.max
+
+    def snapshot(self):
+        p50, p90, p99 = self.percentile(50), self.percentile(90), self.percentile(99)
+        with self.lock:
+            return {
+                "count": self.count,
+                "mean": self.total / self.count if self.count else 0.0,
+                "p50": p50,
+                "p90": p90,
+                "p99": p99,
+                "max": self.max,
+            }
+
+    def clear(self):
+        with self.lock:
+            self.counts = [0] * len(self.bounds)
+            self.count = 0
+            self.total = 0.0
+            self.max = 0.0
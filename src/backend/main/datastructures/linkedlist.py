@@ -3,66 +3,101 @@ import typing
 from threading import Lock   # The threading library contains lock that helps us during multi threading operations.
 import threading
 
-class Node:    # For creation of a node. Each node contains the data and the address of the next node.
+class Node:    # For creation of a node. Each node contains the data and the addresses of the previous and next nodes.
     def __init__(self, val):
         self.val = val
+        self.prev = None
         self.next = None
+        self.owner = None   # Chain token of the list holding the node, None once it is removed.
 
-class LinkedList:   # Linked list implementation.
+class LinkedList:   # Doubly linked list implementation with head and tail pointers.
     def __init__(self):
         self.head = None
+        self.tail = None
         self.size = 0
+        self.chain = object()   # Identifies the nodes this list holds. swap_out hands it over with them.
         self.lock = threading.Lock()
 
-    def add_front(self, val):    # Adding a node in the front of the linked list.
-        with self.lock:
-            new_node = Node(val)
-            new_node.next = self.head
+    def _link_front(self, new_node):    # Links a node in front of the head. Caller must hold the lock.
+        new_node.prev = None
+        new_node.next = self.head
+        new_node.owner = self.chain
+        if self.head:
+            self.head.prev = new_node
+        else:
+            self.tail = new_node
+        self.head = new_node
+        self.size += 1
+        return new_node
+
+    def _link_end(self, new_node):      # Links a node after the tail. Caller must hold the lock.
+        new_node.next = None
+        new_node.prev = self.tail
+        new_node.owner = self.chain
+        if self.tail:
+            self.tail.next = new_node
+        else:
             self.head = new_node
-            self.size += 1
+        self.tail = new_node
+        self.size += 1
+        return new_node
+
+    def _unlink(self, node):            # Unlinks a node of this list in O(1). Caller must hold the lock.
+        if node.prev:
+            node.prev.next = node.next
+        else:
+            self.head = node.next
+        if node.next:
+            node.next.prev = node.prev
+        else:
+            self.tail = node.prev
+        node.prev = None
+        node.next = None
+        node.owner = None
+        self.size -= 1
+        return node.val
+
+    def _node_at(self, index):          # Walks from whichever end is closer to the index.
+        if index < 0 or index >= self.size:
+            raise IndexError("Index out of bounds")
+        if index < self.size // 2:
+            temp = self.head
+            for _ in range(index):
+                temp = temp.next
+        else:
+            temp = self.tail
+            for _ in range(self.size - 1 - index):
+                temp = temp.prev
+        return temp
+
+    def add_front(self, val):    # Adding a node in the front of the linked list. Returns the node as a handle.
+        with self.lock:
+            return self._link_front(Node(val))
 
-    def add_end(self, val):     # Adding a node at the end of the linked list.
+    def add_end(self, val):     # Adding a node at the end of the linked list. Returns the node as a handle.
         new_node = Node(val)
 
         with self.lock:
-            if not self.head:
-                self.head = new_node
+            return self._link_end(new_node)
 
-            else:
-                temp = self.head
-                while temp.next:
-                    temp = temp.next
-                temp.next = new_node
-            self.size += 1
+    def remove_node(self, node):    # Removes a node handle returned by add_front/add_end in O(1).
+        with self.lock:
+            if node.owner is not self.chain:
+                return None         # Node was already removed, or belongs to another list
+            return self._unlink(node)
 
     def remove_front(self):         # Removes the node at the front of the linked list.
         with self.lock:
             if not self.head:
                 return None
-            val = self.head.val
-            self.head = self.head.next
-            self.size -= 1
-            return val
+            return self._unlink(self.head)
 
     def remove_end(self):           # Removes the node at the end of the linked list.
 
         with self.lock:
-            if not self.head:
+            if not self.tail:
                 return None
-            if not self.head.next:
-                val = self.head.val
-                self.head = None
-                self.size -= 1
-                return val
-            
-            temp = self.head
-            while temp.next and temp.next.next:
-                temp = temp.next
-
-            val = temp.next.val
-            temp.next = None
-            self.size -= 1
-            return val
+            return self._unlink(self.tail)
 
     def peek(self):                 # Gives us the data in the very first node without popping it.
         with self.lock:
@@ -70,12 +105,7 @@ class LinkedList:   # Linked list implementation.
 
     def peek_end(self):             # Gives us the data at the last node without popping it.
         with self.lock:
-            if not self.head:
-                return None
-            temp = self.head
-            while temp.next:
-                temp = temp.next
-            return temp.val
+            return self.tail.val if self.tail else None
 
     def get_size(self):             # Gives us the size of the linked list.
 
@@ -94,8 +124,13 @@ class LinkedList:   # Linked list implementation.
     def clear(self):                   # Clears the entire list.
 
         with self.lock:
-            self.head = None
-            self.size = 0
+            self._clear()
+
+    def _clear(self):   # Nodes still pointing at the old chain token can no longer be removed through this list.
+        self.head = None
+        self.tail = None
+        self.size = 0
+        self.chain = object()
 
     def is_empty(self):                # Checks if the list is empty.
 
@@ -104,43 +139,75 @@ class LinkedList:   # Linked list implementation.
         
     def PeekandRemoveEnd(self):      # Peek and pop the last element.
         with self.lock:
-            if not self.head:
+            if not self.tail:
                 return None  # List is empty
-                
-            if not self.head.next:
-                val = self.head.val  # Only one element in the list
-                self.head = None
-                self.size -= 1
-                return val
-            
-            temp = self.head
-            while temp.next and temp.next.next:
-                temp = temp.next
-            
-            val = temp.next.val  # Peek the last element
-            temp.next = None  # Remove it
-            self.size -= 1
-            return val
+            return self._unlink(self.tail)
 
     def PeekandRemove(self):    # Peeks and pops the first element
         with self.lock:
             if not self.head:
                 return None             # List is empty
-            val = self.head.val             # Peek the first element
-            self.head = self.head.next      # Remove it
-            self.size -= 1
-            return val
+            return self._unlink(self.head)
 
 
 
-    def sortLL(self):
+    def swap_out(self):     # Detaches the whole chain in one lock acquisition and hands it back as a new list.
+        detached = LinkedList()
         with self.lock:
-            temp_array = self._make_array_list()  # Convert linked list to a Python list
-            temp_array.sort()  # Sort the list in ascending order
-            self.clear()  # Clear the linked list
+            detached.head = self.head
+            detached.tail = self.tail
+            detached.size = self.size
+            detached.chain = self.chain
+            self._clear()
+        return detached         # Node handles of the detached values now belong to the returned list.
+
+    def drain(self):        # Empties the list in one lock round-trip and returns an iterator over the removed values.
+        return iter(self.swap_out())
 
-            for val in temp_array:  # Reinsert sorted elements into the linked list
-                self.add_end(val)
+    def __iter__(self):     # Iterates from head to tail without taking the lock.
+        temp = self.head
+        while temp:
+            yield temp.val
+            temp = temp.next
+
+    def sortLL(self):   # Stable merge sort that relinks the existing nodes, so node handles stay valid.
+        with self.lock:
+            if self.size < 2:
+                return
+            self.head = self._merge_sort(self.head)
+            prev = None
+            temp = self.head
+            while temp:                 # Restore the prev pointers and the tail
+                temp.prev = prev
+                prev = temp
+                temp = temp.next
+            self.tail = prev
+
+    def _merge_sort(self, head):    # Sorts a chain linked through next pointers and returns its new head.
+        if not head or not head.next:
+            return head
+        slow = head
+        fast = head.next
+        while fast and fast.next:
+            slow = slow.next
+            fast = fast.next.next
+        second = slow.next
+        slow.next = None
+        left = self._merge_sort(head)
+        right = self._merge_sort(second)
+
+        dummy = Node(None)
+        temp = dummy
+        while left and right:
+            if right.val < left.val:
+                temp.next = right
+                right = right.next
+            else:
+                temp.next = left
+                left = left.next
+            temp = temp.next
+        temp.next = left if left else right
+        return dummy.next
 
 
 
@@ -154,32 +221,17 @@ class LinkedList:   # Linked list implementation.
 
         return array_list
     
-    def reverse(self):          # Reverses the array
+    def reverse(self):          # Reverses the list in place by swapping every node's pointers.
         with self.lock:
-            temp_array = self.make_array_list()
-            temp_array.reverse()
-            self.clear()
-
-            for val in temp_array:
-                self.add_end(val)
+            temp = self.head
+            while temp:
+                temp.prev, temp.next = temp.next, temp.prev
+                temp = temp.prev
+            self.head, self.tail = self.tail, self.head
 
     def remove_index(self, index):
         with self.lock:
-            if index == 0:
-                self.remove_front()
-                return
-
-            temp_node = self.head
-            current_index = 0
-
-            while temp_node and current_index < index - 1:
-                temp_node = temp_node.next
-                current_index += 1
-
-            if not temp_node or not temp_node.next:
-                raise IndexError("Index out of bounds")
-
-            temp_node.next = temp_node.next.next
+            self._unlink(self._node_at(index))
 
 
 
@@ -0,0 +1,138 @@
+import heapq
+import threading
+from collections import defaultdict
+from itertools import islice
+
+
+class NGramIndex:   # Case-insensitive substring index. The n character gram at every position of a key maps to the items containing it.
+    def __init__(self, n=3):
+        self.n = n
+        # Gram -> (position it starts at, key length) -> items, oldest first. Walking the
+        # slots in ascending order yields matches already ranked. Grams at the end of a
+        # key are shorter than n.
+        self.postings = defaultdict(lambda: defaultdict(dict))
+        self.counts = {}        # Gram -> entries under it, to pick the rarest gram of a query.
+        self.extensions = defaultdict(set)  # Prefix shorter than n -> grams starting with it, for short queries.
+        self.keys = {}          # Item -> case-folded key it is indexed under.
+        self.order = {}         # Item -> insertion number, used to break ranking ties.
+        self.counter = 0
+        self.lock = threading.Lock()
+
+    def _remove(self, item):
+        key = self.keys.pop(item, None)
+        if key is None:
+            return
+        del self.order[item]
+        size = len(key)
+        for start in range(size):
+            gram = key[start:start + self.n]
+            slots = self.postings[gram]
+            items = slots[start, size]
+            del items[item]
+            if not items:
+                del slots[start, size]
+            self.counts[gram] -= 1
+            if not self.counts[gram]:
+                del self.counts[gram]
+                del self.postings[gram]
+                for length in range(1, min(len(gram), self.n - 1) + 1):
+                    grams = self.extensions[gram[:length]]
+                    grams.discard(gram)
+                    if not grams:
+                        del self.extensions[gram[:length]]
+
+    def _add(self, item, key, order):
+        self.keys[item] = key
+        self.order[item] = order
+        size = len(key)
+        postings = self.postings
+        counts = self.counts
+        for start in range(size):
+            gram = key[start:start + self.n]
+            postings[gram][start, size][item] = None
+            if gram in counts:
+                counts[gram] += 1
+            else:
+                counts[gram] = 1
+                for length in range(1, min(len(gram), self.n - 1) + 1):
+                    self.extensions[gram[:length]].add(gram)
+
+    def add(self, item, text):      # Indexes item under text, replacing any previous key.
+        with self.lock:
+            self._remove(item)
+            self._add(item, text.casefold(), self.counter)
+            self.counter += 1
+
+    def add_many(self, entries):    # Bulk add of (item, text) pairs under one lock.
+        with self.lock:
+            for item, text in entries:
+                self._remove(item)
+                self._add(item, text.casefold(), self.counter)
+                self.counter += 1
+
+    def remove(self, item):
+        with self.lock:
+            self._remove(item)
+
+    def update(self, item, text):   # Re-indexes an item after a rename. It then ranks as the newest item, like add.
+        self.add(item, text)
+
+    def _lookup(self, query):
+        # Grams to walk for a query, the offset of the query they start at and their entry
+        # count. A long query uses its rarest gram, a short one every gram it begins.
+        if len(query) < self.n:
+            grams = self.extensions.get(query, ())
+            return grams, 0, sum(self.counts[gram] for gram in grams)
+        count, offset = min((self.counts.get(query[start:start + self.n], 0), start) for start in range(len(query) - self.n + 1))
+        return (query[offset:offset + self.n],), offset, count
+
+    def _walk(self, query, grams, offset, accept):   # Yields the items containing query, best match first.
+        slots = defaultdict(list)
+        for gram in grams:
+            for slot, items in self.postings.get(gram, {}).items():
+                slots[slot].append(items)
+        keys = self.keys
+        for position, size in sorted(slots):
+            start = position - offset   # Where the query starts when this gram is part of a match.
+            if start < 0:
+                continue
+            buckets = slots[position, size]
+            items = buckets[0] if len(buckets) == 1 else heapq.merge(*buckets, key=self.order.__getitem__)
+            for item in items:
+                # Items matching earlier in their key are yielded at that position instead.
+                if keys[item].find(query) == start and (accept is None or accept(item)):
+                    yield item
+
+    def _rank(self, items, query, limit):     # Ranks a given set of items like _walk, by checking each one.
+        matches = []
+        for item in items:
+            key = self.keys.get(item)
+            position = -1 if key is None else key.find(query)
+            if position >= 0:
+                matches.append((position, len(key), self.order[item], item))
+        if limit is not None:
+            matches = heapq.nsmallest(limit, matches, key=lambda match: match[:3])
+        else:
+            matches.sort(key=lambda match: match[:3])
+        return [match[3] for match in matches]
+
+    def search(self, text, limit=None, accept=None, among=None):
+        # Items whose key contains text, best match first: exact matches, then earlier
+        # matches, then shorter keys, then the oldest item. accept filters the items.
+        # among, when given, holds every item accept admits; when it is smaller than the
+        # index entries of the query, its items are checked directly instead.
+        query = text.casefold()
+        with self.lock:
+            if not query:
+                return []
+            grams, offset, count = self._lookup(query)
+            if among is not None and len(among) < count:
+                return self._rank(among, query, limit)
+            return list(islice(self._walk(query, grams, offset, accept), limit))
+
+    def get_size(self):
+        with self.lock:
+            return len(self.keys)
+
+    def __len__(self):
+        return self.get_size()
@@ -1,6 +1,5 @@
+import heapq
 import threading
-from ..datastructures.linkedlist import LinkedList, Node
-from ..misc import EmptyListAccessException
 
 
 class Task:
@@ -29,146 +28,355 @@ class Task:
         return False
 
 
-class PriorityQueue:
+class PriorityQueue:   # Indexed binary min-heap. Every task's content maps to its position in the heap.
     def __init__(self, task=None):
-        self.queue = LinkedList()  #Use Linked List instead of Python List
+        self.heap = []          # Each entry is [priority, insertion number, Task]. Equal priorities stay first come first served.
+        self.position = {}      # Task content -> index of its entry in the heap.
+        self.counter = 0        # Insertion number handed to the next entry.
         self.lock = threading.Lock()
 
         if task:
-            self.enqueue(task)  # Use enqueue to correctly insert into linked list.
+            self.enqueue(task)
+
+    def _swap(self, i, j):      # Swaps two heap entries and keeps the position map in sync.
+        self.heap[i], self.heap[j] = self.heap[j], self.heap[i]
+        self.position[self.heap[i][2].getTask()] = i
+        self.position[self.heap[j][2].getTask()] = j
+
+    def _sift_up(self, index):
+        while index > 0:
+            parent = (index - 1) // 2
+            if self.heap[index] < self.heap[parent]:
+                self._swap(index, parent)
+                index = parent
+            else:
+                break
+        return index
+
+    def _sift_down(self, index):
+        size = len(self.heap)
+        while True:
+            smallest = index
+            left = 2 * index + 1
+            right = left + 1
+            if left < size and self.heap[left] < self.heap[smallest]:
+                smallest = left
+            if right < size and self.heap[right] < self.heap[smallest]:
+                smallest = right
+            if smallest == index:
+                return index
+            self._swap(index, smallest)
+            index = smallest
+
+    def _push(self, newTask):   # Inserts without taking the lock. A task already in the queue is replaced.
+        key = newTask.getTask()
+        if key in self.position:
+            self._remove_at(self.position[key])
+        entry = [newTask.getPriority(), self.counter, newTask]
+        self.counter += 1
+        self.heap.append(entry)
+        self.position[key] = len(self.heap) - 1
+        self._sift_up(len(self.heap) - 1)
+
+    def _remove_at(self, index):    # Removes the entry at the given heap index in O(log n).
+        last = len(self.heap) - 1
+        if index != last:
+            self._swap(index, last)
+        entry = self.heap.pop()
+        del self.position[entry[2].getTask()]
+        if index < len(self.heap):
+            if self._sift_up(index) == index:
+                self._sift_down(index)
+        return entry[2]
+
+    def _rebuild(self, entries):    # Replaces the heap with the given entries in O(n) and re-indexes them.
+        heapq.heapify(entries)
+        self.heap = entries
+        self.position = {entry[2].getTask(): index for index, entry in enumerate(entries)}
+
+    def _prefer_rebuild(self, batch):   # A batch this large is cheaper as one heapify than as individual O(log n) updates.
+        return batch * max(1, len(self.heap).bit_length()) > len(self.heap)
 
     def enqueue(self, newTask):
-         with self.lock:
-            if self.queue.is_empty():
-                self.queue.add_end(newTask) #Add to the end of linked list
-                return
-
-            current = self.queue.head #set the current
-            prev = None #Set prev to none
-
-            while current: #Traversing the array
-                if newTask.getPriority() < current.val.getPriority():
-                    #Add task to front if priority is higher.
-                    if prev is None:
-                        self.queue.add_front(newTask)
-                    else:
-                         new_node = Node(newTask)
-                         new_node.next = current
-                         prev.next = new_node
-                         self.queue.size += 1
-
-                    return
-                prev = current
-                current = current.next
+        with self.lock:
+            self._push(newTask)
 
-            self.queue.add_end(newTask) #Add the task to the end if it is not added before
-            
+    def enqueueMany(self, tasks):   # Bulk enqueue. Tasks already in the queue are replaced, like enqueue.
+        with self.lock:
+            tasks = list(tasks)
+            if not self._prefer_rebuild(len(tasks)):
+                for newTask in tasks:
+                    self._push(newTask)
+                return
+            # The last task for a content wins and keeps the counter it would get from enqueue,
+            # so ties dequeue in the same order as after one enqueue per task.
+            latest = {newTask.getTask(): (index, newTask) for index, newTask in enumerate(tasks)}
+            entries = [entry for entry in self.heap if entry[2].getTask() not in latest]
+            counter = self.counter
+            entries += [[newTask.getPriority(), counter + index, newTask] for index, newTask in latest.values()]
+            self.counter += len(tasks)
+            self._rebuild(entries)
+
+    def removeManyT(self, contents):    # Bulk removeTaskT.
+        with self.lock:
+            contents = [content for content in contents if content in self.position]
+            if not self._prefer_rebuild(len(contents)):
+                for content in contents:
+                    if content in self.position:
+                        self._remove_at(self.position[content])
+                return
+            contents = set(contents)
+            self._rebuild([entry for entry in self.heap if entry[2].getTask() not in contents])
 
     def dequeue(self):  # Dequeuing the element with the most priority.
         with self.lock:
-            if self.queue.is_empty():
-                return None 
-            return self.queue.remove_front() #Removes the front of the linked list
+            if not self.heap:
+                return None
+            return self._remove_at(0)
 
     def peek(self):  # Returns the element with the most priority
         with self.lock:
-             if self.queue.is_empty():
+            if not self.heap:
                 return None
-             return self.queue.peek()
+            return self.heap[0][2]
 
     def print(self):  # Prints the queue with the priorities too.
         with self.lock:
-            current = self.queue.head
-            while current:
-                print(f"Priority: {current.val.getPriority()}, Task: {current.val.getTask()}")
-                current = current.next
+            for entry in sorted(self.heap):
+                print(f"Priority: {entry[2].getPriority()}, Task: {entry[2].getTask()}")
 
     def isEmpty(self):  # Checks if the queue is empty.
         with self.lock:
-            return self.queue.is_empty()  # Check if linked list is empty
+            return len(self.heap) == 0
 
     def size(self):  # Checks the size of the queue.
         with self.lock:
-            return self.queue.get_size()
+            return len(self.heap)
 
     def clear(self):  # clears the queue.
         with self.lock:
-            self.queue.clear()
+            self.heap = []
+            self.position = {}
 
     def contains(self, task):  # Checks if the task is in the queue.
         with self.lock:
-            current = self.queue.head
-            while current:
-                if current.val == task:
-                    return True
-                current = current.next
-            return False
+            index = self.position.get(task.getTask())
+            return index is not None and self.heap[index][2] == task
 
     def getPriority(self, task_content):  # Gets the priority of a given task.
         with self.lock:
-            current = self.queue.head
-            while current:
-                if current.val.getTask() == task_content:
-                    return current.val.getPriority()
-                current = current.next
-            return -1
+            index = self.position.get(task_content)
+            if index is None:
+                return -1
+            return self.heap[index][2].getPriority()
 
     def getTask(self, priority):  # Gets the first task the matches the priority.
         with self.lock:
-            current = self.queue.head
-            while current:
-                if current.val.getPriority() == priority:
-                    return current.val
-                current = current.next
-            return None
+            matches = [entry for entry in self.heap if entry[0] == priority]
+            return min(matches)[2] if matches else None
 
     def removeTask(self, task): #Removes the first matching task
         with self.lock:
-            current = self.queue.head
-            previous = None
+            index = self.position.get(task.getTask())
+            if index is not None and self.heap[index][2] == task:
+                self._remove_at(index)
 
-            while current:
-                if current.val == task: 
-                    if previous:
-                        previous.next = current.next  # Remove the task from the linked list
-                    else:
-                        self.queue.head = current.next 
-                    self.queue.size -= 1
-                    return
-                previous = current
-                current = current.next
+    def removeTaskT(self, task):    # Removes a task using the task's content.
+        with self.lock:
+            index = self.position.get(task)
+            if index is not None:
+                self._remove_at(index)
 
+    def getTaskT(self, task): #Get Task Using the task's name
+        with self.lock:
+            index = self.position.get(task)
+            return self.heap[index][2] if index is not None else None
 
-    def removeTaskT(self, task):
+    def updatePriority(self, task, priority): #Updates the priority of the task.
         with self.lock:
-            current = self.queue.head
-            previous = None
-
-            while current:
-                if current.val.getTask() == task:  
-                    if previous:
-                        previous.next = current.next  # Remove the task from the linked list
-                    else:
-                        self.queue.head = current.next 
-                    self.queue.size -= 1
-                    return
-                previous = current
-                current = current.next
-        
-    def getTaskT(self, task): #Get Task Using the task's name
+            index = self.position.get(task.getTask())
+            task.setPriority(priority)
+            if index is None:
+                self._push(task)
+                return
+            entry = self.heap[index]
+            entry[0] = priority
+            entry[1] = self.counter     # Re-prioritized tasks queue behind others of the same priority.
+            entry[2] = task
+            self.counter += 1
+            if self._sift_up(index) == index:
+                self._sift_down(index)
+
+class OffsetPriorityQueue:    # Tasks are grouped into buckets that share a priority offset, so shifting a whole bucket is O(log L).
+    def __init__(self, bucket_of):
+        self.bucket_of = bucket_of      # Maps a task's content to its bucket.
+        self.buckets = {}               # Bucket -> PriorityQueue of tasks holding their base priorities.
+        self.offsets = {}               # Bucket -> offset added to every priority in that bucket.
+        self.bucket_for = {}            # Task content -> bucket it was queued in.
+        self.heads = PriorityQueue()    # One entry per non-empty bucket, keyed by its best base priority plus its offset.
+        self.lock = threading.Lock()
+
+    def _refresh(self, bucket):     # Re-keys a bucket in heads after its best task or its offset changed.
+        queue = self.buckets.get(bucket)
+        best = queue.peek() if queue else None
+        if best is None:
+            self.heads.removeTaskT(bucket)
+        else:
+            self.heads.updatePriority(Task(bucket, 0), best.getPriority() + self.offsets.get(bucket, 0))
+
+    def _remove(self, content):
+        bucket = self.bucket_for.pop(content, None)
+        if bucket is None:
+            return None
+        queue = self.buckets[bucket]
+        task = queue.getTaskT(content)
+        queue.removeTaskT(content)
+        self._refresh(bucket)
+        return task
+
+    def enqueue(self, newTask):     # newTask carries its base priority; the bucket offset is applied on top.
+        with self.lock:
+            content = newTask.getTask()
+            self._remove(content)
+            bucket = self.bucket_of(content)
+            if bucket not in self.buckets:
+                self.buckets[bucket] = PriorityQueue()
+            self.buckets[bucket].enqueue(newTask)
+            self.bucket_for[content] = bucket
+            self._refresh(bucket)
+
+    def dequeue(self):
         with self.lock:
-            current = self.queue.head
-            while current:
-                if current.val.getTask() == task:
-                    return current.val
-                current = current.next
+            head = self.heads.peek()
+            if head is None:
+                return None
+            return self._remove(self.buckets[head.getTask()].peek().getTask())
+
+    def peek(self):
+        with self.lock:
+            head = self.heads.peek()
+            if head is None:
+                return None
+            return self.buckets[head.getTask()].peek()
+
+    def print(self):
+        with self.lock:
+            for bucket, queue in self.buckets.items():
+                print(f"Bucket: {bucket}, Offset: {self.offsets.get(bucket, 0)}")
+                queue.print()
+
+    def isEmpty(self):
+        with self.lock:
+            return len(self.bucket_for) == 0
+
+    def size(self):
+        with self.lock:
+            return len(self.bucket_for)
+
+    def clear(self):
+        with self.lock:
+            self.buckets = {}
+            self.bucket_for = {}
+            self.heads.clear()
+
+    def contains(self, task):
+        with self.lock:
+            bucket = self.bucket_for.get(task.getTask())
+            return bucket is not None and self.buckets[bucket].contains(task)
+
+    def getPriority(self, task_content):    # Effective priority, offset included.
+        with self.lock:
+            bucket = self.bucket_for.get(task_content)
+            if bucket is None:
+                return -1
+            return self.buckets[bucket].getPriority(task_content) + self.offsets.get(bucket, 0)
+
+    def getTask(self, priority):    # Gets a task whose effective priority matches.
+        with self.lock:
+            for bucket, queue in self.buckets.items():
+                task = queue.getTask(priority - self.offsets.get(bucket, 0))
+                if task is not None:
+                    return task
             return None
 
-    def updatePriority(self, task, priority): #Updates the priority of the task.
+    def removeTask(self, task):
+        with self.lock:
+            bucket = self.bucket_for.get(task.getTask())
+            if bucket is not None and self.buckets[bucket].contains(task):
+                self._remove(task.getTask())
+
+    def removeTaskT(self, task):
         with self.lock:
-          self.removeTask(task)
-          task.setPriority(priority)
-          self.enqueue(task)
+            self._remove(task)
+
+    def getTaskT(self, task):
+        with self.lock:
+            bucket = self.bucket_for.get(task)
+            return self.buckets[bucket].getTaskT(task) if bucket is not None else None
+
+    def updatePriority(self, task, priority):   # Sets the task's base priority.
+        with self.lock:
+            content = task.getTask()
+            bucket = self.bucket_for.get(content)
+            if bucket is None:
+                bucket = self.bucket_of(content)
+                self.bucket_for[content] = bucket
+                if bucket not in self.buckets:
+                    self.buckets[bucket] = PriorityQueue()
+            self.buckets[bucket].updatePriority(task, priority)
+            self._refresh(bucket)
+
+    def enqueueMany(self, tasks, buckets=None):
+        # Bulk enqueue. Each touched bucket is rebuilt and re-keyed once. Callers that
+        # already know the bucket of every task can pass them in the same order as tasks.
+        with self.lock:
+            tasks = list(tasks)
+            contents = [newTask.getTask() for newTask in tasks]
+            if buckets is None:
+                buckets = [self.bucket_of(content) for content in contents]
+            byBucket = {}
+            lastTouched = {}    # Bucket -> index of its last task in the batch.
+            for index, (newTask, bucket) in enumerate(zip(tasks, buckets)):
+                byBucket.setdefault(bucket, []).append(newTask)
+                lastTouched[bucket] = index
+            if not byBucket:
+                return
+            self._removeMany(contents)
+            # Buckets are re-keyed in the order enqueue would have touched them last, so ties between buckets match too.
+            for bucket in sorted(byBucket, key=lastTouched.get):
+                if bucket not in self.buckets:
+                    self.buckets[bucket] = PriorityQueue()
+                self.buckets[bucket].enqueueMany(byBucket[bucket])
+                self._refresh(bucket)
+            self.bucket_for.update(zip(contents, buckets))
+
+    def _removeMany(self, contents):
+        byBucket = {}
+        for content in contents:
+            bucket = self.bucket_for.pop(content, None)
+            if bucket is not None:
+                byBucket.setdefault(bucket, []).append(content)
+        for bucket, batch in byBucket.items():
+            self.buckets[bucket].removeManyT(batch)
+            self._refresh(bucket)
+
+    def removeManyT(self, contents):    # Bulk removeTaskT.
+        with self.lock:
+            self._removeMany(contents)
+
+    def setOffset(self, bucket, offset):    # Shifts every task in the bucket at once.
+        with self.lock:
+            self.offsets[bucket] = offset
+            self._refresh(bucket)
+
+    def getOffset(self, bucket):
+        with self.lock:
+            return self.offsets.get(bucket, 0)
+
+    def effectivePriority(self, task):      # Base priority of a task plus the offset of the bucket it was queued in.
+        with self.lock:
+            bucket = self.bucket_for.get(task.getTask(), self.bucket_of(task.getTask()))
+            return task.getPriority() + self.offsets.get(bucket, 0)
 
 # Testing the code
 pq = PriorityQueue()
@@ -186,4 +394,4 @@ pq.print()
 print("\nPeeking at the highest priority task:")
 print(pq.peek(), "\n")
 
-pq.print()
\ No newline at end of file
+pq.print()
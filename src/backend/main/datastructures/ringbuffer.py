@@ -0,0 +1,50 @@
+import threading
+
+
+class RingBuffer:   # Fixed capacity buffer. Once full, every append evicts the oldest entry.
+    def __init__(self, capacity):
+        if capacity <= 0:
+            raise ValueError("Capacity must be positive")
+        self.capacity = capacity
+        self.buffer = []        # Grows up to capacity on demand, so an idle buffer stays small.
+        self.start_seq = 0      # Sequence number of the oldest entry still stored.
+        self.next_seq = 0       # Sequence number the next append will receive. Never goes backwards.
+        self.lock = threading.Lock()
+
+    def append(self, val):      # Stores a value and returns its sequence number.
+        with self.lock:
+            seq = self.next_seq
+            index = seq % self.capacity
+            if index < len(self.buffer):
+                self.buffer[index] = val
+            else:
+                self.buffer.extend([None] * (index - len(self.buffer)))
+                self.buffer.append(val)
+            self.next_seq += 1
+            if self.next_seq - self.start_seq > self.capacity:
+                self.start_seq += 1     # Oldest entry was overwritten
+            return seq
+
+    def read_since(self, cursor, limit=None):   # Returns (entries, next cursor) for everything from cursor onwards.
+        with self.lock:
+            seq = max(cursor, self.start_seq)   # Entries older than start_seq were evicted.
+            end = self.next_seq
+            if limit is not None:
+                end = min(end, seq + limit)
+            entries = [self.buffer[i % self.capacity] for i in range(seq, end)]
+            return entries, max(end, cursor)
+
+    def to_list(self):          # All stored entries from oldest to newest.
+        return self.read_since(0)[0]
+
+    def get_size(self):
+        with self.lock:
+            return self.next_seq - self.start_seq
+
+    def __len__(self):
+        return self.get_size()
+
+    def clear(self):            # Drops the stored entries. Sequence numbers keep counting up.
+        with self.lock:
+            self.buffer = []
+            self.start_seq = self.next_seq
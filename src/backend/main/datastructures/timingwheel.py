@@ -0,0 +1,123 @@
+import math
+import threading
+
+
+class TimerHandle:  # A scheduled item. Keep it to cancel the timer later.
+    def __init__(self, item, due, interval=None):
+        self.item = item
+        self.due = due              # Absolute time, in seconds, the item is due at.
+        self.interval = interval    # Seconds between repeats, or None for a one-shot timer.
+        self.tick = 0               # Wheel tick the timer fires on.
+        self.slot = None            # Slot the timer currently sits in, None once fired or cancelled.
+
+    def is_active(self):
+        return self.slot is not None
+
+    def __repr__(self):
+        return f"TimerHandle(due={self.due}, interval={self.interval}, item={self.item})"
+
+
+class TimingWheel:  # Hashed timing wheel. Insert and cancel are O(1); timers more than one turn away wait extra rounds in their slot.
+    def __init__(self, resolution=1.0, wheel_size=512, start=0.0):
+        self.resolution = resolution
+        self.wheel_size = wheel_size
+        self.slots = [None] * wheel_size    # Dicts used as insertion ordered sets of handles, created on first use.
+        self.slot_min = [math.inf] * wheel_size     # Earliest tick in each slot, inf when empty, None until recomputed.
+        self.current_tick = math.floor(start / resolution)  # Last tick that has been processed.
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def _insert(self, handle):
+        # Never place a timer on a tick that has already been processed, or it would wait a full turn.
+        handle.tick = max(math.ceil(handle.due / self.resolution), self.current_tick + 1)
+        index = handle.tick % self.wheel_size
+        if self.slots[index] is None:
+            self.slots[index] = {}
+        handle.slot = self.slots[index]
+        handle.slot[handle] = None
+        if self.slot_min[index] is not None and handle.tick < self.slot_min[index]:
+            self.slot_min[index] = handle.tick
+        self.count += 1
+
+    def _remove(self, handle):
+        del handle.slot[handle]
+        index = handle.tick % self.wheel_size
+        if not handle.slot:
+            self.slot_min[index] = math.inf
+        elif handle.tick == self.slot_min[index]:
+            self.slot_min[index] = None     # Recomputed by _slot_min when next needed.
+        handle.slot = None
+        self.count -= 1
+
+    def _slot_min(self, index):
+        if self.slot_min[index] is None:
+            self.slot_min[index] = min(handle.tick for handle in self.slots[index])
+        return self.slot_min[index]
+
+    def schedule(self, item, due, interval=None):   # Schedules item for the absolute time due, repeating every interval seconds if given.
+        if interval is not None and interval <= 0:
+            raise ValueError("Interval must be positive")
+        handle = TimerHandle(item, due, interval)
+        with self.lock:
+            self._insert(handle)
+        return handle
+
+    def cancel(self, handle):   # Cancels a pending timer. Returns False if it already fired or was cancelled.
+        with self.lock:
+            if handle.slot is None:
+                return False
+            handle.interval = None  # Stops a repeating timer from being re-armed.
+            self._remove(handle)
+            return True
+
+    def advance(self, now):     # Processes every tick up to now and returns the items that became due, earliest first.
+        target = math.floor(now / self.resolution)
+        fired = []
+        with self.lock:
+            if target <= self.current_tick:
+                return fired
+            if target - self.current_tick >= self.wheel_size:
+                ticks = range(self.wheel_size)      # Fell behind by a full turn, so every slot needs a look.
+            else:
+                ticks = range(self.current_tick + 1, target + 1)
+
+            for tick in ticks:
+                slot = self.slots[tick % self.wheel_size]
+                if not slot:
+                    continue
+                for handle in [handle for handle in slot if handle.tick <= target]:
+                    self._remove(handle)
+                    fired.append(handle)
+            self.current_tick = target
+            fired.sort(key=lambda handle: handle.tick)
+            items = [handle.item for handle in fired]
+
+            for handle in fired:
+                if handle.interval is not None:
+                    # Missed repeats are skipped rather than fired in a burst.
+                    missed = max(0, math.floor((now - handle.due) / handle.interval)) + 1
+                    handle.due += missed * handle.interval
+                    self._insert(handle)
+
+        return items
+
+    def next_deadline(self):    # Time of the next occupied tick within one turn, or None when the wheel is empty.
+        # Every pending tick is after current_tick, so a slot holds a timer for the tick
+        # it stands for this turn exactly when its earliest tick is that tick. That keeps
+        # the scan at O(wheel_size) instead of O(timers).
+        with self.lock:
+            if self.count == 0:
+                return None
+            for offset in range(1, self.wheel_size + 1):
+                tick = self.current_tick + offset
+                if self._slot_min(tick % self.wheel_size) == tick:
+                    return tick * self.resolution
+            # Everything is more than a turn away, so wake up once the wheel has turned.
+            return (self.current_tick + self.wheel_size) * self.resolution
+
+    def get_size(self):
+        with self.lock:
+            return self.count
+
+    def __len__(self):
+        return self.get_size()
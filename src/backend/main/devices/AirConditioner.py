@@ -1,12 +1,25 @@
-import Device
+from .device import Device
 import time
 
 class AirConditioner(Device):
-    def __init__(self, device_name, device_type, device_group, location, is_turned_on, battery_level, power_consumption, max_battery_capacity, power_level, mode):
-        super().__init__(device_name, device_type, device_group, location, is_turned_on, battery_level, power_consumption, max_battery_capacity, power_level)
+
+    __slots__ = ("__mode", "__simulation_temp_change_time")
+
+    def __init__(self, device_id, device_name, device_type, location, device_group, battery_level, max_battery_capacity, current_battery_capacity, is_on_battery, is_turned_on, base_power_consumption, power_level, turned_on_time, is_interacted, mode=True, table=None, reserved=False):
+        super().__init__(device_id, device_name, device_type, location, device_group, battery_level, max_battery_capacity, current_battery_capacity, is_on_battery, is_turned_on, base_power_consumption, power_level, turned_on_time, is_interacted, table, reserved)
         self.__mode = mode
         self.__simulation_temp_change_time = 0
 
+    @classmethod
+    def from_device(cls, device: Device, mode: bool = True):    # Builds an AirConditioner in the same table and takes over the device's row values.
+        return cls(
+            device.get_device_id(), device.get_device_name(), device.get_device_type(), device.get_location(),
+            device.get_device_group(), device.get_battery_level(), device.get_battery_capacity(),
+            device.get_current_battery_capacity(), device.is_on_battery_power(), device.is_turned_on(),
+            device.get_base_power_consumption(), device.get_power_level(), device.get_turned_on_time(),
+            device.get_interaction_state(), mode, device.get_table(), device.is_reserved(),
+        )
+
     def get_mode(self) -> bool:
         return self.__mode
 
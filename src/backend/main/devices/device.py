@@ -1,23 +1,91 @@
 from datetime import datetime
 import time
 
-class Device:
-    def __init__(self, device_id, device_name, device_type, location, device_group, battery_level, max_battery_capacity, current_battery_capacity, is_on_battery, is_turned_on, base_power_consumption, power_level, turned_on_time, is_interacted):
+import numpy as np
+
+from .devicetable import DeviceTable
+
+class Device:   # Lightweight view over one row of a DeviceTable.
+
+    __slots__ = ("_table", "_row", "__device_id", "__device_name", "__is_interacted")
+
+    def __init__(self, device_id, device_name, device_type, location, device_group, battery_level, max_battery_capacity, current_battery_capacity, is_on_battery, is_turned_on, base_power_consumption, power_level, turned_on_time, is_interacted, table: DeviceTable | None = None, reserved: bool = False):
+        # A device built without a table gets a one-row table of its own, which goes away
+        # with the device. A reserved row is kept out of the table's totals until the
+        # device is attached, see SmartHome.createDevice.
+        self._table = table if table is not None else DeviceTable(1)
+        self._row = self._table.allocate(self, not reserved)
         self.__device_id = device_id
         self.__device_name = device_name
-        self.__device_type = device_type
-        self.__location = location
-        self.__device_group = device_group
-        self.__battery_level = battery_level
-        self.__max_battery_capacity = max_battery_capacity
-        self.__current_battery_capacity = current_battery_capacity
-        self.__is_on_battery = is_on_battery
-        self.__is_turned_on = is_turned_on
-        self.__base_power_consumption = base_power_consumption
-        self.__power_level = power_level
-        self.__turned_on_time = turned_on_time
         self.__is_interacted = is_interacted
-
+        self.set_device_type(device_type)
+        self.set_location(location)
+        self.set_device_group(device_group)
+        self.set_battery_level(battery_level)
+        self.set_battery_capacity(max_battery_capacity)
+        self.set_current_battery_capacity(current_battery_capacity)
+        self.set_on_battery(is_on_battery)
+        self.set_turned_on(is_turned_on)
+        self.set_base_power_consumption(base_power_consumption)
+        self.set_power_level(power_level)
+        self.set_turned_on_time(turned_on_time)
+
+    def attach(self, table: DeviceTable):   # Moves this device's row into another table, e.g. the one owned by a SmartHome.
+        if table is self._table:
+            table.activate_rows(np.array([self._row], dtype=np.int64))
+            return
+        old_table, old_row = self._table, self._row
+        row = table.allocate(self)
+        for name in DeviceTable.COLUMNS:
+            if not name.endswith("_code"):
+                getattr(table, name)[row] = getattr(old_table, name)[old_row]
+        table.group_code[row] = table.groups.encode(old_table.groups.decode(int(old_table.group_code[old_row])))
+        table.type_code[row] = table.types.encode(old_table.types.decode(int(old_table.type_code[old_row])))
+        table.location_code[row] = table.locations.encode(old_table.locations.decode(int(old_table.location_code[old_row])))
+        table.account(row, 1)
+        self._table, self._row = table, row
+        old_table.release(old_row)
+
+    @staticmethod
+    def attach_all(devices, table: DeviceTable):    # attach for many devices, moving their rows one column at a time.
+        devices = list(devices)
+        reserved = [device._row for device in devices if device._table is table]
+        if reserved:
+            table.activate_rows(np.array(reserved, dtype=np.int64))
+        moving = [device for device in devices if device._table is not table]
+        if not moving:
+            return
+        rows = table.allocate_many(moving)
+        by_table = {}
+        for device, row in zip(moving, rows.tolist()):
+            by_table.setdefault(device._table, []).append((device, device._row, row))
+
+        for old_table, entries in by_table.items():
+            old_rows = np.array([old_row for _, old_row, _ in entries], dtype=np.int64)
+            new_rows = np.array([row for _, _, row in entries], dtype=np.int64)
+            for name in DeviceTable.COLUMNS:
+                if not name.endswith("_code"):
+                    getattr(table, name)[new_rows] = getattr(old_table, name)[old_rows]
+            for name, old_book, new_book in (("group_code", old_table.groups, table.groups), ("type_code", old_table.types, table.types), ("location_code", old_table.locations, table.locations)):
+                # Old code -> new code, with the unset code -1 mapping to the trailing -1.
+                mapping = np.array([new_book.encode(value) for value in old_book.values] + [-1], dtype=np.int32)
+                getattr(table, name)[new_rows] = mapping[getattr(old_table, name)[old_rows]]
+            for device, _, row in entries:
+                device._table, device._row = table, row
+            old_table.release_many(old_rows)
+        table.account_rows(rows, 1)
+
+    def detach(self):   # Moves this device into a one-row table of its own, freeing its row in the current table.
+        self.attach(DeviceTable(1))
+
+    def is_reserved(self) -> bool:
+        return not self._table.in_use[self._row]
+
+    def get_table(self) -> DeviceTable:
+        return self._table
+
+    def get_row(self) -> int:
+        return self._row
 
     def flip_interaction_state(self):
         self.__is_interacted = not self.__is_interacted
@@ -26,33 +94,33 @@ class Device:
         return self.__is_interacted
 
     def get_minutes_since_turned_on(self):
-        if self.__turned_on_time:
-            return int((int(time.time()) - self.__turned_on_time) // 60)
+        if self.get_turned_on_time():
+            return int((int(time.time()) - self.get_turned_on_time()) // 60)
         return 0
 
     def set_turned_on(self, status: bool):
-        self.__is_turned_on = status
+        self._table.set_value(self._row, "is_turned_on", status)
 
     def is_turned_on(self) -> bool:
-        return self.__is_turned_on
+        return bool(self._table.is_turned_on[self._row])
 
     def set_battery_level(self, level: float):
-        self.__battery_level = level
+        self._table.battery_level[self._row] = level
     
     def get_battery_level(self) -> float:
-        return self.__battery_level
+        return float(self._table.battery_level[self._row])
 
     def set_base_power_consumption(self, consumption: float):
-        self.__base_power_consumption = consumption
+        self._table.set_value(self._row, "base_power_consumption", consumption)
 
     def get_base_power_consumption(self) -> float:
-        return self.__base_power_consumption
+        return float(self._table.base_power_consumption[self._row])
 
     def set_battery_capacity(self, capacity: int):
-        self.__max_battery_capacity = capacity
+        self._table.max_battery_capacity[self._row] = capacity
 
     def get_battery_capacity(self) -> int:
-        return self.__max_battery_capacity
+        return int(self._table.max_battery_capacity[self._row])
 
     def get_device_id(self) -> int:
         return self.__device_id
@@ -61,49 +129,67 @@ class Device:
         return self.__device_name
 
     def set_device_name(self, name: str):
+        old_name = self.__device_name
         self.__device_name = name
+        self._table.notify_rename(self, old_name, name)
 
     def get_device_type(self) -> str:
-        return self.__device_type
+        return self._table.types.decode(int(self._table.type_code[self._row]))
 
     def set_device_type(self, type_: str):
-        self.__device_type = type_
+        self._table.set_value(self._row, "type_code", self._table.types.encode(type_))
 
     def get_location(self) -> str:
-        return self.__location
+        return self._table.locations.decode(int(self._table.location_code[self._row]))
 
     def set_location(self, location: str):
-        self.__location = location
+        self._table.set_value(self._row, "location_code", self._table.locations.encode(location))
 
     def get_device_group(self) -> str:
-        return self.__device_group
+        return self._table.groups.decode(int(self._table.group_code[self._row]))
 
     def set_device_group(self, group: str):
-        self.__device_group = group
+        self._table.set_value(self._row, "group_code", self._table.groups.encode(group))
 
     def get_power_level(self) -> int:
-        return self.__power_level
+        return int(self._table.power_level[self._row])
 
     def set_power_level(self, level: int):
-        self.__power_level = level
+        self._table.set_value(self._row, "power_level", level)
 
     def is_on_battery_power(self) -> bool:
-        return self.__is_on_battery
+        return bool(self._table.is_on_battery[self._row])
 
     def set_on_battery(self, status: bool):
-        self.__is_on_battery = status
+        self._table.is_on_battery[self._row] = status
 
     def get_current_battery_capacity(self) -> float:
-        return self.__current_battery_capacity
+        return float(self._table.current_battery_capacity[self._row])
 
     def set_current_battery_capacity(self, capacity: float):
-        self.__current_battery_capacity = capacity
+        self._table.current_battery_capacity[self._row] = capacity
 
     def set_turned_on_time(self, time: int):
-        self.__turned_on_time = time
-
-    def get_turned_on_time(self) -> int:
-        return self.__turned_on_time
+        self._table.turned_on_time[self._row] = time or 0
+
+    def get_turned_on_time(self) -> float:
+        return float(self._table.turned_on_time[self._row])
+
+    # Attribute style access used throughout SmartHome.
+    deviceId = property(get_device_id)
+    deviceName = property(get_device_name, set_device_name)
+    device_type = property(get_device_type, set_device_type)
+    device_group = property(get_device_group, set_device_group)
+    location = property(get_location, set_location)
+    isTurnedOn = property(is_turned_on, set_turned_on)
+    turnedOnTime = property(get_turned_on_time, set_turned_on_time)
+    batteryLevel = property(get_battery_level, set_battery_level)
+    maxBatteryCapacity = property(get_battery_capacity, set_battery_capacity)
+    batteryCapacity = property(get_battery_capacity, set_battery_capacity)
+    currentBatteryCapacity = property(get_current_battery_capacity, set_current_battery_capacity)
+    onBattery = property(is_on_battery_power, set_on_battery)
+    basePowerConsumption = property(get_base_power_consumption, set_base_power_consumption)
+    powerLevel = property(get_power_level, set_power_level)
 
     def __str__(self):
         return (f"Device ID: {self.get_device_id()}\n"
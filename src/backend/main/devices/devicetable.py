@@ -0,0 +1,285 @@
+import threading
+
+import numpy as np
+
+
+class CodeBook:     # Gives every distinct group, type or location value a small integer code.
+    def __init__(self):
+        self.codes = {}
+        self.values = []
+
+    def encode(self, value) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self.codes[value] = code
+            self.values.append(value)
+        return code
+
+    def decode(self, code: int):
+        return self.values[code] if code >= 0 else None
+
+    def __len__(self):
+        return len(self.values)
+
+
+class DeviceTable:  # Struct of arrays holding the numeric state of every device. A Device is a view over one row.
+
+    # Numeric columns and their dtypes. Group, type and location are stored as CodeBook codes.
+    COLUMNS = {
+        "base_power_consumption": np.float64,
+        "power_level": np.int64,
+        "battery_level": np.float64,
+        "max_battery_capacity": np.float64,
+        "current_battery_capacity": np.float64,
+        "turned_on_time": np.float64,
+        "is_turned_on": np.bool_,
+        "is_on_battery": np.bool_,
+        "group_code": np.int32,
+        "type_code": np.int32,
+        "location_code": np.int32,
+        "in_use": np.bool_,
+    }
+
+    # Columns that change a row's power draw or the subtotal it counts towards.
+    DRAW_COLUMNS = {"base_power_consumption", "power_level", "is_turned_on", "in_use", "group_code", "location_code"}
+
+    def __init__(self, capacity: int = 64):
+        self.capacity = max(1, capacity)
+        self.size = 0                   # Rows below this index have been handed out at least once.
+        self.free_rows = []             # Released rows that can be reused.
+        self.devices = [None] * self.capacity   # Row -> Device view owning it.
+        self.groups = CodeBook()
+        self.types = CodeBook()
+        self.locations = CodeBook()
+        self.lock = threading.Lock()
+        self.rename_listeners = []      # Called as listener(device, old_name, new_name) when a device in this table is renamed.
+
+        # Running totals of the powered-on draw, kept up to date by set_value.
+        self.total_draw = 0.0
+        self.total_base = 0.0
+        self.location_draw = {}     # Location code -> draw
+        self.group_draw = {}        # Group code -> draw
+
+        for name, dtype in self.COLUMNS.items():
+            setattr(self, name, np.zeros(self.capacity, dtype=dtype))
+        self.group_code.fill(-1)
+        self.type_code.fill(-1)
+        self.location_code.fill(-1)
+
+    def _grow(self, capacity: int):   # Doubles the arrays so appends stay amortized O(1).
+        for name, dtype in self.COLUMNS.items():
+            column = np.zeros(capacity, dtype=dtype)
+            if name.endswith("_code"):
+                column.fill(-1)
+            column[:self.capacity] = getattr(self, name)
+            setattr(self, name, column)
+        self.devices.extend([None] * (capacity - self.capacity))
+        self.capacity = capacity
+
+    def allocate(self, device, in_use: bool = True) -> int:  # Hands out a zeroed row for the device. A reserved row (in_use False) stays out of every total until activate_rows.
+        with self.lock:
+            if self.free_rows:
+                row = self.free_rows.pop()
+            else:
+                if self.size == self.capacity:
+                    self._grow(self.capacity * 2)
+                row = self.size
+                self.size += 1
+            self.devices[row] = device
+            self.in_use[row] = in_use
+            return row
+
+    def activate_rows(self, rows: np.ndarray):     # Brings reserved rows into use and into the running totals.
+        with self.lock:
+            rows = rows[~self.in_use[rows]]
+            self.in_use[rows] = True
+            self._account_rows(rows, 1)
+
+    def allocate_many(self, devices) -> np.ndarray:     # Bulk allocate. Grows the arrays at most once.
+        with self.lock:
+            rows = [self.free_rows.pop() for _ in range(min(len(devices), len(self.free_rows)))]
+            fresh = len(devices) - len(rows)
+            if self.size + fresh > self.capacity:
+                capacity = self.capacity
+                while capacity < self.size + fresh:
+                    capacity *= 2
+                self._grow(capacity)
+            rows.extend(range(self.size, self.size + fresh))
+            self.size += fresh
+            rows = np.array(rows, dtype=np.int64)
+            for row, device in zip(rows.tolist(), devices):
+                self.devices[row] = device
+            self.in_use[rows] = True
+            return rows
+
+    def release_many(self, rows: np.ndarray):  # Bulk release.
+        with self.lock:
+            self._account_rows(rows, -1)
+            for name in self.COLUMNS:
+                getattr(self, name)[rows] = -1 if name.endswith("_code") else 0
+            for row in rows.tolist():
+                self.devices[row] = None
+            self.free_rows.extend(rows.tolist())
+
+    def release(self, row: int):    # Clears a row and makes it available again.
+        with self.lock:
+            self._account(row, -1)
+            for name in self.COLUMNS:
+                getattr(self, name)[row] = 0
+            self.group_code[row] = -1
+            self.type_code[row] = -1
+            self.location_code[row] = -1
+            self.devices[row] = None
+            self.free_rows.append(row)
+
+    def _account(self, row: int, sign: int):   # Adds (+1) or removes (-1) a row's contribution to the running totals.
+        if not (self.in_use[row] and self.is_turned_on[row]):
+            return
+        base = float(self.base_power_consumption[row])
+        draw = base * max(int(self.power_level[row]), 1)
+        self.total_base += sign * base
+        self.total_draw += sign * draw
+        location = int(self.location_code[row])
+        group = int(self.group_code[row])
+        self.location_draw[location] = self.location_draw.get(location, 0.0) + sign * draw
+        self.group_draw[group] = self.group_draw.get(group, 0.0) + sign * draw
+
+    def _account_rows(self, rows: np.ndarray, sign: int):   # Vectorized _account over many rows.
+        rows = rows[self.in_use[rows] & self.is_turned_on[rows]]
+        if len(rows) == 0:
+            return
+        base = self.base_power_consumption[rows]
+        draw = base * np.maximum(self.power_level[rows], 1)
+        self.total_base += sign * float(base.sum())
+        self.total_draw += sign * float(draw.sum())
+        for totals, codes in ((self.location_draw, self.location_code[rows]), (self.group_draw, self.group_code[rows])):
+            sums = np.bincount(codes, weights=draw)
+            for code in np.flatnonzero(sums):
+                totals[int(code)] = totals.get(int(code), 0.0) + sign * float(sums[code])
+
+    def account(self, row: int, sign: int):
+        with self.lock:
+            self._account(row, sign)
+
+    def account_rows(self, rows: np.ndarray, sign: int):
+        with self.lock:
+            self._account_rows(rows, sign)
+
+    def set_value(self, row: int, name: str, value):   # Writes one cell and applies the resulting draw delta in O(1).
+        if name not in self.DRAW_COLUMNS:
+            getattr(self, name)[row] = value
+            return
+        with self.lock:
+            self._account(row, -1)
+            getattr(self, name)[row] = value
+            self._account(row, 1)
+
+    def set_values(self, rows: np.ndarray, name: str, values):  # Bulk set_value for many rows at once.
+        with self.lock:
+            if name in self.DRAW_COLUMNS:
+                self._account_rows(rows, -1)
+            getattr(self, name)[rows] = values
+            if name in self.DRAW_COLUMNS:
+                self._account_rows(rows, 1)
+
+    def recompute_totals(self):     # Rebuilds the running totals from the columns.
+        summary = self.power_summary()
+        base = float(self.power_draw(base_only=True).sum())
+        with self.lock:
+            self.total_draw = summary["total"]
+            self.total_base = base
+            self.location_draw = {self.locations.encode(value): draw for value, draw in summary["location"].items()}
+            self.group_draw = {self.groups.encode(value): draw for value, draw in summary["group"].items()}
+
+    def check_totals(self, tolerance: float = 1e-6) -> float:
+        # Largest difference between a running total (draw, base, per location or per
+        # group) and a full recomputation from the columns, 0 when all of them match.
+        with self.lock:
+            summary = self.power_summary()
+            pairs = [
+                (self.total_draw, summary["total"]),
+                (self.total_base, float(self.power_draw(base_only=True).sum())),
+            ]
+            for totals, recomputed, codebook in ((self.location_draw, summary["location"], self.locations), (self.group_draw, summary["group"], self.groups)):
+                recomputed = {codebook.encode(value): draw for value, draw in recomputed.items()}
+                pairs.extend((totals.get(code, 0.0), recomputed.get(code, 0.0)) for code in totals.keys() | recomputed.keys())
+        drifts = [abs(running - actual) for running, actual in pairs if abs(running - actual) > tolerance * max(1.0, abs(actual))]
+        return max(drifts, default=0.0)
+
+    def location_totals(self) -> dict:
+        with self.lock:
+            return {self.locations.decode(code): draw for code, draw in self.location_draw.items()}
+
+    def group_totals(self) -> dict:
+        with self.lock:
+            return {self.groups.decode(code): draw for code, draw in self.group_draw.items()}
+
+    def drain_batteries(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:    # One battery tick for every powered-on device running on battery.
+        with self.lock:
+            n = self.size
+            powered = self.in_use[:n] & self.is_turned_on[:n]
+            max_capacity = self.max_battery_capacity[:n]
+            capacity = self.current_battery_capacity[:n]
+
+            # Devices with a battery but no charge left are switched over to a full battery.
+            refill = powered & (max_capacity > 0) & (capacity == 0)
+            capacity[refill] = max_capacity[refill]
+            self.is_on_battery[:n][refill] = True
+            self.battery_level[:n][refill] = 100
+
+            rows = np.flatnonzero(powered & self.is_on_battery[:n])
+            previous = self.battery_level[rows].copy()
+            capacity[rows] -= self.base_power_consumption[rows] * self.power_level[rows]
+            current = np.trunc(np.divide(capacity[rows] * 100, max_capacity[rows], out=np.zeros(len(rows)), where=max_capacity[rows] > 0))
+            self.battery_level[rows] = current
+            return rows, previous, current     # Rows drained plus their battery percentage before and after.
+
+    def active_rows(self) -> np.ndarray:    # Indices of every row currently owned by a device.
+        return np.flatnonzero(self.in_use[:self.size])
+
+    def powered_on_rows(self) -> np.ndarray:
+        return np.flatnonzero(self.in_use[:self.size] & self.is_turned_on[:self.size])
+
+    def powered_off_rows(self) -> np.ndarray:
+        return np.flatnonzero(self.in_use[:self.size] & ~self.is_turned_on[:self.size])
+
+    def power_draw(self, base_only: bool = False) -> np.ndarray:    # Per-row draw of powered-on devices, 0 for every other row.
+        n = self.size
+        draw = self.base_power_consumption[:n]
+        if not base_only:
+            draw = draw * np.maximum(self.power_level[:n], 1)   # A power level of 0 still draws the base consumption.
+        return np.where(self.is_turned_on[:n] & self.in_use[:n], draw, 0.0)
+
+    def power_summary(self, base_only: bool = False) -> dict:    # Total, per-location, per-group and per-type draw in one pass.
+        draw = self.power_draw(base_only)
+        rows = self.active_rows()
+        draw = draw[rows]
+        return {
+            "total": float(draw.sum()),
+            "location": self._sum_by(self.location_code[rows], draw, self.locations),
+            "group": self._sum_by(self.group_code[rows], draw, self.groups),
+            "type": self._sum_by(self.type_code[rows], draw, self.types),
+        }
+
+    def _sum_by(self, codes: np.ndarray, weights: np.ndarray, codebook: CodeBook) -> dict:
+        sums = np.bincount(codes, weights=weights, minlength=len(codebook))
+        return {codebook.decode(code): float(total) for code, total in enumerate(sums)}
+
+    def add_rename_listener(self, listener):
+        self.rename_listeners.append(listener)
+
+    def notify_rename(self, device, old_name: str, new_name: str):
+        for listener in self.rename_listeners:
+            listener(device, old_name, new_name)
+
+    def get_device(self, row: int):
+        return self.devices[row]
+
+    def get_size(self) -> int:
+        with self.lock:
+            return self.size - len(self.free_rows)
+
+    def __len__(self):
+        return self.get_size()
+
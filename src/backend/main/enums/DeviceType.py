@@ -17,34 +17,60 @@ class DeviceTypeEnum(Enum):
 
     def get_priority(self):
         return self.value
+
+    @property
+    def priority(self):     # Some members are declared with a trailing comma, which makes their value a 1-tuple.
+        return self.value[0] if isinstance(self.value, tuple) else self.value
     
 class DeviceType:
-    def __init__(self, typeName: str):
+    def __init__(self, typeName: str, name_index=None):
         self.typeName = typeName
-        self.devices = []
+        self.devices = {}   # Device ID -> device, in insertion order.
+        self.name_index = name_index     # Shared NGramIndex over device names, if the owner keeps one.
 
     def add_device(self, device: device.Device):
-        self.devices.append(device)
+        self.devices[device.get_device_id()] = device
+
+    def add_devices(self, devices):
+        self.devices.update((device.get_device_id(), device) for device in devices)
 
     def remove_device(self, device: device.Device):
-        if device in self.devices:
-            self.devices.remove(device)
+        if self.devices.get(device.get_device_id()) is device:
+            del self.devices[device.get_device_id()]
 
     def get_devices(self):
-        return self.devices
+        return list(self.devices.values())
+
+    def contains(self, device) -> bool:
+        return self.devices.get(device.get_device_id()) is device
+
+    def __len__(self):
+        return len(self.devices)
     
     def turn_off_all_devices(self):
-        for device in self.devices:
+        for device in self.devices.values():
             device.set_turned_on(False)
 
     def turn_on_all_devices(self):
-        for device in self.devices:
+        for device in self.devices.values():
             device.set_turned_on(True)
 
     def get_device_by_name(self, name: str):
+
+        if self.name_index is not None:
+            matches = self.search_devices(name, 1)
+            return matches[0] if matches else None
+        name_lower = name.lower()
+        return next((device for device in self.devices.values() if name_lower in device.get_device_name().lower()), None)
+
+    def search_devices(self, name: str, limit: int | None = None):
+
+        if self.name_index is not None:
+            return self.name_index.search(name, limit, self.contains, self.devices.values())
         name_lower = name.lower()
-        return next((device for device in self.devices if name_lower in device.get_device_name().lower()), None)
+        matches = [device for device in self.devices.values() if name_lower in device.get_device_name().lower()]
+        return matches[:limit] if limit is not None else matches
     
     def get_device_by_id(self, device_id: int):
-        return next((device for device in self.devices if device.get_device_id() == device_id), None)
+        return self.devices.get(device_id)
     
\ No newline at end of file
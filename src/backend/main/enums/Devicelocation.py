@@ -1,5 +1,5 @@
 from enum import Enum
-from ..devices.Device import Device
+from ..devices.device import Device
 
 class DeviceLocationEnum(Enum):
     LIVINGROOM = "Living Room"
@@ -17,24 +17,37 @@ class DeviceLocationEnum(Enum):
     OTHERS = "Others"
 
 class DeviceLocation:
-    def __init__(self, location: str):
+    def __init__(self, location: str, name_index=None):
         self.location = location
-        self.devices = []
+        self.devices = {}   # Device ID -> device, in insertion order.
+        self.name_index = name_index     # Shared NGramIndex over device names, if the owner keeps one.
         self.people = 0
         self.temperature = 0.0
 
     def add_device(self, device: Device):
 
-        self.devices.append(device)
+        self.devices[device.get_device_id()] = device
+
+    def add_devices(self, devices):
+
+        self.devices.update((device.get_device_id(), device) for device in devices)
 
     def remove_device(self, device: Device):
 
-        if device in self.devices:
-            self.devices.remove(device)
+        if self.devices.get(device.get_device_id()) is device:
+            del self.devices[device.get_device_id()]
 
     def get_devices(self):
 
-        return self.devices
+        return list(self.devices.values())
+
+    def contains(self, device) -> bool:
+
+        return self.devices.get(device.get_device_id()) is device
+
+    def __len__(self):
+
+        return len(self.devices)
 
     def get_people(self):
         return self.people
@@ -50,12 +63,12 @@ class DeviceLocation:
 
     def turn_off_all_devices(self):
 
-        for device in self.devices:
+        for device in self.devices.values():
             device.set_turned_on(False)
 
     def turn_on_all_devices(self):
 
-        for device in self.devices:
+        for device in self.devices.values():
             device.set_turned_on(True)
 
     def get_temperature(self):
@@ -66,12 +79,23 @@ class DeviceLocation:
 
     def get_device_by_name(self, name: str):
 
+        if self.name_index is not None:
+            matches = self.search_devices(name, 1)
+            return matches[0] if matches else None
+        name_lower = name.lower()
+        return next((device for device in self.devices.values() if name_lower in device.get_device_name().lower()), None)
+
+    def search_devices(self, name: str, limit: int | None = None):
+
+        if self.name_index is not None:
+            return self.name_index.search(name, limit, self.contains, self.devices.values())
         name_lower = name.lower()
-        return next((device for device in self.devices if name_lower in device.get_device_name().lower()), None)
+        matches = [device for device in self.devices.values() if name_lower in device.get_device_name().lower()]
+        return matches[:limit] if limit is not None else matches
 
     def get_device_by_id(self, device_id: int):
 
-        return next((device for device in self.devices if device.get_device_id() == device_id), None)
+        return self.devices.get(device_id)
 
     def __str__(self):
         return f"Location: {self.location}"
@@ -4,16 +4,15 @@ from functools import total_ordering
 @total_ordering
 class LogTask:
 
+    # Most to least severe. Python's logging has no OFF/SEVERE/CONFIG/FINE.../ALL levels,
+    # so the standard levels stand in for them.
     LEVEL_LIST = [
-        logging.OFF,
-        logging.SEVERE,
+        logging.CRITICAL,
+        logging.ERROR,
         logging.WARNING,
         logging.INFO,
-        logging.CONFIG,
-        logging.FINE,
-        logging.FINER,
-        logging.FINEST,
-        logging.ALL
+        logging.DEBUG,
+        logging.NOTSET
     ]
 
     def __init__(self, log_level, message):
@@ -1,84 +1,216 @@
-from ..datastructures.LinkedList import LinkedList, Node
-from ..datastructures.PriorityQueue import PriorityQueue, Task
-from ..devices import AirConditioner, Device
+from ..datastructures.histogram import LatencyHistogram
+from ..datastructures.linkedlist import LinkedList
+from ..datastructures.ngramindex import NGramIndex
+from ..datastructures.priorityqueue import OffsetPriorityQueue, PriorityQueue, Task
+from ..datastructures.ringbuffer import RingBuffer
+from ..datastructures.timingwheel import TimerHandle, TimingWheel
+from ..devices.AirConditioner import AirConditioner
+from ..devices.device import Device
+from ..devices.devicetable import DeviceTable
 from ..enums import DeviceGroup, Devicelocation, DeviceType
-from ..misc import RuleParsingException
-from ..tasks import LogTask, Rule
+from ..misc.RuleParsingException import RuleParsingException
+from ..tasks import LogTask
+from ..tasks.asyncruntime import AsyncRuntime
+from ..tasks.compiledrule import CompiledRule, RuleCache, RuleOp
+from ..tasks.conditionrule import COMPARISONS, ConditionIndex, ConditionRule
+from ..tasks.fixedrate import FixedRateTicker
+from ..tasks.tickphases import PhaseRegistry, TickPhase
+from ..tasks.pendingrules import PendingRules
+from ..tasks.rule import Rule
 
 import logging
 import random
+from datetime import datetime, timedelta
 import threading
 import time
 from concurrent.futures import ThreadPoolExecutor
-import concurrent.futures
+from itertools import compress
+
+import numpy as np
 
 
 
 class SmartHome:
+
+    LOG_CAPACITY = 10000    # Entries kept per log stream before the oldest are evicted.
+    POWER_CHECK_INTERVAL = 30   # Seconds between running total cross-checks when debugPowerTotals is on.
+    RULE_CACHE_SIZE = 1024      # Compiled rule strings kept by compileRule.
+    TICK_INTERVAL = 1.0         # Seconds between ticks.
+    LOG_INTERVAL = 2.0          # Seconds between log flushes.
+    LOCATION_CHECK_INTERVAL = 5     # Seconds between location temperature checks.
+    RUNTIMES = ("threads", "asyncio")   # How the tick, log, rule and schedule loops are run, see start.
+
+    # Device attributes a condition rule can test, and the DeviceTable column each one reads.
+    CONDITION_DEVICE_ATTRIBUTES = {
+        "power": "base_power_consumption",
+        "level": "power_level",
+        "battery": "battery_level",
+    }
    
-    def __init__(self, threshold: float, ideal_temp: int, simulate: bool):
+    def __init__(
+        self,
+        threshold: float,
+        ideal_temp: int,
+        simulate: bool,
+        seed: int | None = None,
+        tickOverrunPolicy: str = "skip",
+        runtime: str = "threads",
+        homeId=None,
+        configureLogging: bool = True,
+        autoStart: bool = True,
+    ):
+
+        if runtime not in self.RUNTIMES:
+            raise ValueError(f"Unknown runtime {runtime}, expected one of {self.RUNTIMES}")
 
         self.tickCount = 0
         self.threshold = threshold
         self.idealTemp = ideal_temp
         self.simulate = simulate
         self.powerConsumption = 1.0
+        self.debugPowerTotals = False
         self.mode = "Normal"
         self.date = time.time()
-        self.lock = threading.Lock()
-        self.random = random.Random()
+        # Guards the powered-on and powered-off sets, the shedding queues and other
+        # multi-step state changes that the rule executor, the tick and API callers share.
+        self.lock = threading.RLock()
+        self.random = random.Random(seed)
+        self.rng = np.random.default_rng(seed)     # Batched draws for the simulation phases.
 
         self.groupMap = {}
         self.typeMap = {}
         self.locationMap = {}
 
-        self.poweredOnDevices = []
-        self.poweredOffDevices = []
+        self.deviceTable = DeviceTable()    # Numeric state of every device added to this home.
+        self.nextDeviceId = 1
+
+        # Dicts used as insertion ordered sets, for O(1) membership and removal.
+        self.poweredOnDevices = {}
+        self.poweredOffDevices = {}
 
-        self.deviceQueue = PriorityQueue()
-        self.powerReducibleDevices = PriorityQueue()
+        self.devicesById = {}
+        self.devicesByName = {}     # Case-folded name -> devices with that name, oldest first.
+        self.nameIndex = NGramIndex()   # Substring search, shared by every group, type and location.
+        self.deviceTable.add_rename_listener(self._onDeviceRenamed)
+
+        # Occupancy is applied as a per-location offset (people * 10), see _updateLocationOffset.
+        # Both queues bucket devices by their location code, so bulk paths read buckets
+        # straight from the table.
+        self.deviceQueue = OffsetPriorityQueue(self._locationCode)
+        self.powerReducibleDevices = OffsetPriorityQueue(self._locationCode)
         self.turnBackOnDevices = PriorityQueue()
 
         self.loggingList = LinkedList()
         self.powerConsumptionLogList = LinkedList()
         self.deviceBatteryLogList = LinkedList()
 
-        self.ruleList = LinkedList()
+        self.ruleList = PendingRules()     # Later rules for the same target supersede pending ones.
+        self.ruleCache = RuleCache(self.RULE_CACHE_SIZE)
+        self.ruleHandlers = {
+            RuleOp.FLIP: lambda rule: self.flipDeviceState(rule.target),
+            RuleOp.TURN_ON: lambda rule: self.turnOnDevice(rule.target),
+            RuleOp.TURN_OFF: lambda rule: self.turnOffDevice(rule.target),
+            RuleOp.SET_POWER_LEVEL: lambda rule: self.setDevicePowerLevel(rule.target, rule.argument),
+            RuleOp.GROUP_ON: lambda rule: self.turnOnDevicesByGroup(rule.target),
+            RuleOp.GROUP_OFF: lambda rule: self.turnOffDevicesByGroup(rule.target),
+            RuleOp.TYPE_ON: lambda rule: self.turnOnDevicesByType(rule.target),
+            RuleOp.TYPE_OFF: lambda rule: self.turnOffDevicesByType(rule.target),
+            RuleOp.LOCATION_ON: lambda rule: self.turnOnDevicesByLocation(rule.target),
+            RuleOp.LOCATION_OFF: lambda rule: self.turnOffDevicesByLocation(rule.target),
+        }
+        self.conditionRules = ConditionIndex(self.deviceTable, self._readConditionInput)
+
+        self.ruleBatchWindow = 0.0      # Seconds the executor waits after the first rule of a batch arrives.
+        self.ruleMaxBatch = None        # Pending rules that end the batch window early.
+        self.ruleLatency = LatencyHistogram()
+        self.ruleScheduler = TimingWheel(start=time.time())
+        self.scheduleCondition = threading.Condition()
+        self.stopped = threading.Event()    # Ends the loops of the threads runtime.
+
+        self.infoTasks = RingBuffer(self.LOG_CAPACITY)
+        self.warningTasks = RingBuffer(self.LOG_CAPACITY)
+        self.severeTasks = RingBuffer(self.LOG_CAPACITY)
+        self.powerConsumptionTasks = RingBuffer(self.LOG_CAPACITY)
+        self.deviceBatteryTasks = RingBuffer(self.LOG_CAPACITY)
+
+        # Keyed like the /devices/log/<stream> endpoints.
+        self.logStreams = {
+            "info": self.infoTasks,
+            "warning": self.warningTasks,
+            "severe": self.severeTasks,
+            "power_consumption": self.powerConsumptionTasks,
+            "battery": self.deviceBatteryTasks,
+        }
+
+        # Logger setup. A home with an ID logs to its own child loggers, e.g.
+        # PowerConsumptionLog.<homeId>. Without configureLogging the process-wide logging
+        # setup is left alone, and records reach whatever handlers sit on the parent loggers.
+        self.homeId = homeId
+        self.configureLogging = configureLogging
+        if configureLogging:
+            logging.basicConfig(
+                level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+            )
+        self.powerConsumptionlogger = logging.getLogger(self._loggerName("PowerConsumptionLog"))
+        self.logger = logging.getLogger(self._loggerName(__name__))
+        self.deviceBatteryLogger = logging.getLogger(self._loggerName("DeviceBatteryLog"))
 
-        self.infoTasks = []
-        self.warningTasks = []
-        self.severeTasks = []
-        self.powerConsumptionTasks = []
-        self.deviceBatteryTasks = []
+        self._initialize()
 
-        # Logger setup
-        logging.basicConfig(
-            level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
-        )
-        self.powerConsumptionlogger = logging.getLogger("PowerConsumptionLog")
-        self.logger = logging.getLogger(__name__)
-        self.deviceBatteryLogger = logging.getLogger("DeviceBatteryLog")
+        # Fixed-rate loops for the tick and the log flush. Log flushes drain everything
+        # pending, so a late one never needs to be repeated.
+        self.tickOverrunPolicy = tickOverrunPolicy
+        self.tickPhases = PhaseRegistry()
+        self._registerDefaultPhases()
+        self.tickTicker = FixedRateTicker(self.TICK_INTERVAL, self.tick, tickOverrunPolicy)
+        self.logTicker = FixedRateTicker(self.LOG_INTERVAL, self.log, "skip")
 
-        self._initialize()
+        # The threads runtime runs each loop on its own thread. The asyncio runtime runs
+        # them as tasks on an event loop, which many homes can share.
+        self.scheduler = None
+        self.loggerInitialized = False
+        self.asyncRuntime = AsyncRuntime(self) if runtime == "asyncio" else None
+        if autoStart:
+            self.start()
 
-        self.scheduler = ThreadPoolExecutor(max_workers=3)
-        self.startTick()
-        self.logger.info("Tick started")
-        self.initializeLogger()
-        self.startLogging()
-        self.logger.info("Logging started")
-        self.startRuleExecution()
+    def _loggerName(self, name: str) -> str:
+
+        return name if self.homeId is None else f"{name}.{self.homeId}"
+
+    def releaseLoggers(self):
+
+        # Drops the home's child loggers from the logging registry, which never forgets a
+        # logger on its own. The shared loggers of a home without an ID are left alone.
+        if self.homeId is None:
+            return
+        manager = logging.Logger.manager
+        with logging._lock:
+            for logger in (self.logger, self.powerConsumptionlogger, self.deviceBatteryLogger):
+                for handler in list(logger.handlers):
+                    logger.removeHandler(handler)
+                    if self.configureLogging:   # Opened by initializeLogger, not by the application.
+                        handler.close()
+                if manager.loggerDict.get(logger.name) is logger:
+                    del manager.loggerDict[logger.name]
+                # Placeholders for missing parents, e.g. PowerConsumptionLog, also hold on to the logger.
+                name = logger.name
+                dot = name.rfind(".")
+                while dot > 0:
+                    parent = manager.loggerDict.get(name[:dot])
+                    if isinstance(parent, logging.PlaceHolder):
+                        parent.loggerMap.pop(logger, None)
+                    dot = name.rfind(".", 0, dot)
 
     def _initialize(self):
 
         for deviceGroup in DeviceGroup.DeviceGroupEnum:
-            self.groupMap[deviceGroup.name] = DeviceGroup.DeviceGroup(deviceGroup.name)
+            self.groupMap[deviceGroup.name] = DeviceGroup.DeviceGroup(deviceGroup.name, self.nameIndex)
 
         for deviceType in DeviceType.DeviceTypeEnum:
-            self.typeMap[deviceType.name] = DeviceType.DeviceType(deviceType.name)
+            self.typeMap[deviceType.name] = DeviceType.DeviceType(deviceType.name, self.nameIndex)
 
         for location in Devicelocation.DeviceLocationEnum:
-            devLocation = Devicelocation.DeviceLocation(location.name)
+            devLocation = Devicelocation.DeviceLocation(location.name, self.nameIndex)
             self.locationMap[location.name] = devLocation
             devLocation.temperature = self.random.randint(10, 45)
 
@@ -105,203 +237,283 @@ class SmartHome:
         powerLevel: int = 1,
     ) -> Device:
 
-        if deviceGroup.name.lower() == "airconditioners":
-            return AirConditioner.AirConditioner(
-                deviceName,
-                deviceType,
-                deviceGroup,
-                location,
-                isTurnedOn,
-                batteryLevel,
-                powerConsumption,
-                maxBatteryCapacity,
-                powerLevel,
-                True,
-            )
-        return Device.Device(
+        deviceId = self.nextDeviceId
+        self.nextDeviceId += 1
+        deviceClass = AirConditioner if deviceGroup.name.lower() == "airconditioners" else Device
+
+        return deviceClass(
+            deviceId,
             deviceName,
             deviceType,
-            deviceGroup,
             location,
-            isTurnedOn,
+            deviceGroup,
             batteryLevel,
-            powerConsumption,
             maxBatteryCapacity,
+            maxBatteryCapacity * batteryLevel / 100,
+            batteryLevel > 0 and maxBatteryCapacity > 0,
+            isTurnedOn,
+            powerConsumption,
             powerLevel,
+            time.time() if isTurnedOn else 0,
+            False,
+            table=self.deviceTable,
+            reserved=True,  # Built straight into the home's table, counted once addDevices accepts it.
         )
 
     def addDevice(self, device: Device):
 
-        if (
-            device.device_group.name.lower() == "airconditioners"
-            and not isinstance(device, AirConditioner.AirConditioner)
-        ):
-            device = AirConditioner.AirConditioner(
-                device.deviceName,
-                device.device_type,
-                device.device_group,
-                device.location,
-                device.isTurnedOn,
-                device.batteryLevel,
-                device.basePowerConsumption,
-                int(device.maxBatteryCapacity),
-                device.powerLevel,
-                True,
-            )
-
-        if device.isTurnedOn:
-            self.poweredOnDevices.append(device)
-            device.turnedOnTime = time.time()
+        self.addDevices([device])
+
+    def addDevices(self, devices) -> list[Device]:
+
+        # Validates and converts the whole batch first, then moves every row into the
+        # home's table, fills the indexes and builds the queue entries in bulk.
+        accepted = {}   # Device ID -> device
+        groups, types, locations = {}, {}, {}
+        for device in devices:
+            deviceId = device.deviceId
+            groupName = device.device_group.name
+            typeName = device.device_type.name
+            locationName = device.location.name
+            if deviceId in self.devicesById or deviceId in accepted:
+                self.addLog(logging.WARNING, f"Device ID {deviceId} is already in use, skipping {device.deviceName}")
+                self._releaseReserved(device)
+                continue
+            if groupName not in self.groupMap or typeName not in self.typeMap or locationName not in self.locationMap:
+                self.addLog(logging.WARNING, f"Unknown group, type or location for {device.deviceName}, skipping it")
+                self._releaseReserved(device)
+                continue
+            if groupName.lower() == "airconditioners" and not isinstance(device, AirConditioner):
+                plainDevice = device
+                device = AirConditioner.from_device(plainDevice)
+                plainDevice.detach()
+            accepted[deviceId] = device
+            groups.setdefault(groupName, []).append(device)
+            types.setdefault(typeName, []).append(device)
+            locations.setdefault(locationName, []).append(device)
+        accepted = list(accepted.values())
+        if not accepted:
+            return accepted
+
+        with self.lock:
+            Device.attach_all(accepted, self.deviceTable)
+            self.devicesById.update((device.deviceId, device) for device in accepted)
+            names = [device.deviceName for device in accepted]
+            for device, name in zip(accepted, names):
+                self.devicesByName.setdefault(name.casefold(), []).append(device)
+            self.nameIndex.add_many(zip(accepted, names))
+            for containers, batches in ((self.groupMap, groups), (self.typeMap, types), (self.locationMap, locations)):
+                for name, batch in batches.items():
+                    containers[name].add_devices(batch)
+
+            rows = np.fromiter((device.get_row() for device in accepted), dtype=np.int64, count=len(accepted))
+            isOn = self.deviceTable.is_turned_on[rows]
+            poweredOn = list(compress(accepted, isOn.tolist()))
+            self.poweredOffDevices.update(dict.fromkeys(compress(accepted, (~isOn).tolist())))
+            self.poweredOnDevices.update(dict.fromkeys(poweredOn))
+            if poweredOn:
+                self.deviceTable.set_values(rows[isOn], "turned_on_time", time.time())
+                self._enqueuePowered(poweredOn, rows[isOn])
+            return accepted
+
+    def _releaseReserved(self, device: Device):
+
+        # A rejected device from createDevice must not keep its reserved row in the home's table.
+        if device.get_table() is self.deviceTable and device.is_reserved():
+            device.detach()
+
+    def _indexDevice(self, device: Device):
+
+        self.devicesById[device.deviceId] = device
+        self.devicesByName.setdefault(device.deviceName.casefold(), []).append(device)
+        self.nameIndex.add(device, device.deviceName)
+
+    def _unindexDevice(self, device: Device, name: str | None = None):
+
+        if self.devicesById.get(device.deviceId) is device:
+            del self.devicesById[device.deviceId]
+        self.nameIndex.remove(device)
+        key = (name if name is not None else device.deviceName).casefold()
+        devices = self.devicesByName.get(key, [])
+        if device in devices:
+            devices.remove(device)
+            if not devices:
+                del self.devicesByName[key]
+
+    def _onDeviceRenamed(self, device: Device, oldName: str, newName: str):
+
+        if self.devicesById.get(device.deviceId) is not device:
+            return
+        devices = self.devicesByName.get(oldName.casefold(), [])
+        if device in devices:
+            devices.remove(device)
+            if not devices:
+                del self.devicesByName[oldName.casefold()]
+        self.devicesByName.setdefault(newName.casefold(), []).append(device)
+        self.nameIndex.update(device, newName)     # Ranks the device as the newest among equally ranked matches.
+        self.ruleCache.invalidate(device)
+
+    def _basePriority(self, device: Device) -> float:
+
+        # The location's people * 10 term is not included here; the queues apply
+        # it as a shared offset per location.
+        return device.device_type.priority + device.device_group.priority
+
+    def _basePriorities(self, rows: np.ndarray) -> np.ndarray:
+
+        # _basePriority for many rows, through lookup arrays indexed by type and group code.
+        table = self.deviceTable
+        typePriorities = np.array([deviceType.priority for deviceType in table.types.values], dtype=np.float64)
+        groupPriorities = np.array([deviceGroup.priority for deviceGroup in table.groups.values], dtype=np.float64)
+        return typePriorities[table.type_code[rows]] + groupPriorities[table.group_code[rows]]
+
+    def _locationCode(self, device: Device) -> int:
+
+        return int(self.deviceTable.location_code[device.get_row()])
+
+    def _enqueuePowered(self, devices: list[Device], rows: np.ndarray):
+
+        # Bulk form of the queueing at the end of turnOnDevice, for devices already switched on.
+        # Priorities and location buckets come from the table columns. Caller holds self.lock.
+        priorities = self._basePriorities(rows)
+        queued = np.flatnonzero(np.isfinite(priorities))
+        tasks = [Task(devices[index], priority) for index, priority in zip(queued.tolist(), priorities[queued].tolist())]
+        buckets = self.deviceTable.location_code[rows[queued]].tolist()
+        self.deviceQueue.enqueueMany(tasks, buckets)
+        reducible = (self.deviceTable.power_level[rows[queued]] != 0).tolist()
+        self.powerReducibleDevices.enqueueMany(
+            [Task(task.getTask(), task.getPriority()) for task in compress(tasks, reducible)],
+            list(compress(buckets, reducible)),
+        )
 
-            if device.device_type.priority == float("inf"):
-                return
-            location = self.locationMap[device.location.name]
-
-            self.deviceQueue.enqueue(
-                    Task(
-                    device,
-                    device.device_type.priority
-                    + device.device_group.priority
-                    + (location.people * 10),
-                )
-            )
+    def _updateLocationOffset(self, location: Devicelocation.DeviceLocation):
 
-            if device.powerLevel != 0:
-                if device.device_type.priority == float("inf"):
-                    return
-                location = self.locationMap[device.location.name]
-
-                self.powerReducibleDevices.enqueue(
-                    Task(
-                        device,
-                        device.device_type.priority
-                        + device.device_group.priority
-                        + (location.people * 10),
-                    )
-                )
-        else:
-            self.poweredOffDevices.append(device)
-        self._addToGroupAndType(device)
+        # Queue buckets are location codes. A location added with addLocation has no
+        # enum member, and so no devices, and keeps its name as its bucket.
+        member = Devicelocation.DeviceLocationEnum.__members__.get(location.location)
+        bucket = location.location if member is None else self.deviceTable.locations.encode(member)
+        offset = location.people * 10
+        self.deviceQueue.setOffset(bucket, offset)
+        self.powerReducibleDevices.setOffset(bucket, offset)
 
     def turnOnDevice(self, device: Device):
 
-        device.isTurnedOn = True
+        with self.lock:
+            device.isTurnedOn = True
 
-        if device not in self.poweredOnDevices:
-            self.poweredOnDevices.append(device)
-            device.turnedOnTime = time.time()
+            if device not in self.poweredOnDevices:
+                self.poweredOnDevices[device] = None
+                device.turnedOnTime = time.time()
 
-        if device in self.poweredOffDevices:
-            self.poweredOffDevices.remove(device)
-        if device.device_type.priority == float("inf"):
-            return
-        location = self.locationMap[device.location.name]
-
-        self.deviceQueue.enqueue(
-            Task(
-                device,
-                device.device_type.priority
-                + device.device_group.priority
-                + (location.people * 10),
-            )
-        )
-        if device.powerLevel != 0:
+            self.poweredOffDevices.pop(device, None)
             if device.device_type.priority == float("inf"):
                 return
-            location = self.locationMap[device.location.name]
-
-        self.powerReducibleDevices.enqueue(
-            Task(
-                device,
-                device.device_type.priority
-                + device.device_group.priority
-                + (location.people * 10),
-            )
-        )
+
+            self.deviceQueue.enqueue(Task(device, self._basePriority(device)))
+            if device.powerLevel != 0:
+                self.powerReducibleDevices.enqueue(Task(device, self._basePriority(device)))
 
     def turnOffDevice(self, device: Device):
 
-        device.isTurnedOn = False
+        with self.lock:
+            device.isTurnedOn = False
+
+            self.poweredOffDevices[device] = None
+            self.poweredOnDevices.pop(device, None)
+            self.deviceQueue.removeTaskT(device)
+            self.powerReducibleDevices.removeTaskT(device)
+
+    def applyTransitions(self, devices, on: bool) -> list[Device]:
+
+        # Bulk turnOnDevice/turnOffDevice. Devices already in the requested state are
+        # skipped, the table columns are written once and each queue is updated in one
+        # batch, so switching n devices costs O(n log n) at most.
+        with self.lock:
+            target = self.poweredOnDevices if on else self.poweredOffDevices
+            other = self.poweredOffDevices if on else self.poweredOnDevices
+            changed = [device for device in dict.fromkeys(devices) if device not in target]
+            if not changed:
+                return changed
+
+            rows = np.fromiter((device.get_row() for device in changed), dtype=np.int64, count=len(changed))
+            self.deviceTable.set_values(rows, "is_turned_on", on)
+            for device in changed:
+                target[device] = None
+                other.pop(device, None)
+
+            if not on:
+                self.deviceQueue.removeManyT(changed)
+                self.powerReducibleDevices.removeManyT(changed)
+                return changed
+
+            self.deviceTable.set_values(rows, "turned_on_time", time.time())
+            self._enqueuePowered(changed, rows)
+            return changed
+
+    def removeDevice(self, device: Device):
 
-        if device not in self.poweredOffDevices:
-            self.poweredOffDevices.append(device)
+        with self.lock:
+            self.poweredOnDevices.pop(device, None)
+            self.poweredOffDevices.pop(device, None)
+            self.deviceQueue.removeTaskT(device)
+            self.powerReducibleDevices.removeTaskT(device)
+            self.turnBackOnDevices.removeTaskT(device)
+            self._unindexDevice(device)
+            self.ruleCache.invalidate(device)
+            self.conditionRules.remove_device(device)
+            self.ruleList.cancel(("state", device))
+            self.ruleList.cancel(("level", device))
+            self.groupMap[device.device_group.name].remove_device(device)
+            self.typeMap[device.device_type.name].remove_device(device)
+            self.locationMap[device.location.name].remove_device(device)
+            device.detach()
 
-        if device in self.poweredOnDevices:
-            self.poweredOnDevices.remove(device)
-        self.deviceQueue.remove_task(device)
-        self.powerReducibleDevices.remove_task(device)
+    def getDeviceByName(self, name: str) -> Device | None:
 
-    def removeDevice(self, device: Device):
+        devices = self.devicesByName.get(name.casefold())
+        return devices[0] if devices else None
 
-        if device in self.poweredOnDevices:
-            self.poweredOnDevices.remove(device)
-        if device in self.poweredOffDevices:
-            self.poweredOffDevices.remove(device)
-        self.groupMap[device.device_group.name].remove_device(device)
-        self.typeMap[device.device_type.name].remove_device(device)
-        self.locationMap[device.location.name].remove_device(device)
-
-    def getDeviceByName(self, name: str) -> Device.Device | None:
-
-        for device in self.poweredOnDevices:
-            if device.deviceName.lower() == name.lower():
-                return device
-        for device in self.poweredOffDevices:
-            if device.deviceName.lower() == name.lower():
-                return device
-        return None
-
-    def getDeviceByID(self, deviceId: int) -> Device.Device | None:
-
-        for device in self.poweredOnDevices:
-            if device.deviceId == deviceId:
-                return device
-        for device in self.poweredOffDevices:
-            if device.deviceId == deviceId:
-                return device
-        return None
+    def getDeviceByID(self, deviceId: int) -> Device | None:
+
+        return self.devicesById.get(deviceId)
 
     def turnOffDevicesByGroup(self, groupName: str):
 
-        for device in self.groupMap[groupName].devices:
-            self.turnOffDevice(device)
+        self.applyTransitions(self.groupMap[groupName].get_devices(), False)
 
     def turnOnDevicesByGroup(self, groupName: str):
 
-        for device in self.groupMap[groupName].devices:
-            self.turnOnDevice(device)
+        self.applyTransitions(self.groupMap[groupName].get_devices(), True)
 
     def turnOffDevicesByType(self, typeName: str):
 
-        for device in self.typeMap[typeName].devices:
-            self.turnOffDevice(device)
+        self.applyTransitions(self.typeMap[typeName].get_devices(), False)
 
     def turnOnDevicesByType(self, typeName: str):
 
-        for device in self.typeMap[typeName].devices:
-            self.turnOnDevice(device)
+        self.applyTransitions(self.typeMap[typeName].get_devices(), True)
 
     def turnOffDevicesByLocation(self, locationName: str):
 
-        for device in self.locationMap[locationName].devices:
-            self.turnOffDevice(device)
+        self.applyTransitions(self.locationMap[locationName].get_devices(), False)
 
     def turnOnDevicesByLocation(self, locationName: str):
 
-        for device in self.locationMap[locationName].devices:
-            self.turnOnDevice(device)
+        self.applyTransitions(self.locationMap[locationName].get_devices(), True)
 
     def turnOffAllDevices(self):
 
-        for device in list(self.poweredOnDevices):
-            self.turnOffDevice(device)
+        self.applyTransitions(list(self.poweredOnDevices), False)
 
     def turnOnAllDevices(self):
 
-        for device in list(self.poweredOffDevices):
-            self.turnOnDevice(device)
+        self.applyTransitions(list(self.poweredOffDevices), True)
 
-    def getDevice(self, identifier: str | int) -> Device.Device | None:
+    def searchDevices(self, query: str, limit: int | None = 10) -> list[Device]:
+
+        return self.nameIndex.search(query, limit)
+
+    def getDevice(self, identifier: str | int) -> Device | None:
 
         if isinstance(identifier, int):
             return self.getDeviceByID(identifier)
@@ -318,10 +530,7 @@ class SmartHome:
             locationObj = location
 
         locationObj.add_people(1)
-        for device in locationObj.devices:
-            if device.isTurnedOn:
-                task = self.deviceQueue.get_task(device)
-                self.deviceQueue.update_priority(task, task.priority + 10)
+        self._updateLocationOffset(locationObj)
 
     def removePerson(self, location: Devicelocation.DeviceLocationEnum):
 
@@ -334,25 +543,69 @@ class SmartHome:
             return
 
         locationObj.remove_people(1)
-
-        for device in locationObj.devices:
-            if device.isTurnedOn:
-                task = self.deviceQueue.get_task(device)
-                self.deviceQueue.update_priority(task, task.priority - 10)
+        self._updateLocationOffset(locationObj)
 
     # ========================================================================
     # Tick and Scheduling
     # ========================================================================
 
+    def start(self, loop=None, phase: float | None = None):
+
+        # With the asyncio runtime the loops become tasks on loop, or on the running
+        # loop when none is given, and the first tick comes after phase seconds. start
+        # and stop may be called from any thread.
+        if self.isRunning():
+            return
+        if self.asyncRuntime is None:
+            self.initializeScheduler()
+            return
+        self._resetTickers()
+        self.asyncRuntime.start(loop, phase)    # First, so a missing loop fails before any log files are opened.
+        self.initializeLogger()
+        self.logger.info("Runtime started on event loop")
+
+    def stop(self):
+
+        # Every loop exits at its next wake-up, which stop triggers right away. A tick
+        # or rule batch already running is finished first.
+        if self.asyncRuntime is not None:
+            self.asyncRuntime.stop()
+            return
+        self.stopped.set()
+        self.tickTicker.stop()
+        self.logTicker.stop()
+        self.ruleList.close()
+        with self.scheduleCondition:
+            self.scheduleCondition.notify()
+        if self.scheduler is not None:
+            self.scheduler.shutdown(wait=False)
+            self.scheduler = None
+
+    def isRunning(self) -> bool:
+
+        if self.asyncRuntime is not None:
+            return self.asyncRuntime.is_running()
+        return self.scheduler is not None
+
+    def _resetTickers(self):
+
+        if not self.tickTicker.is_running():
+            self.tickTicker = FixedRateTicker(self.TICK_INTERVAL, self.tick, self.tickOverrunPolicy)
+        if not self.logTicker.is_running():
+            self.logTicker = FixedRateTicker(self.LOG_INTERVAL, self.log, "skip")
+
     def initializeScheduler(self):
 
-        self.scheduler = ThreadPoolExecutor(max_workers=3)
+        self._resetTickers()
+        self.stopped = threading.Event()    # A fresh event, so loops of an earlier run still see their stop.
+        self.scheduler = ThreadPoolExecutor(max_workers=4)
         self.startTick()
         self.logger.info("Tick started")
         self.initializeLogger()
         self.startLogging()
         self.logger.info("Logging started")
         self.startRuleExecution()
+        self.startScheduledRules()
 
     def startTick(self):
 
@@ -360,17 +613,16 @@ class SmartHome:
 
     def _runTickPeriodically(self):
 
-        while True:
-            start_time = time.time()
-            self.tick()
-            end_time = time.time()
-            execution_time = end_time - start_time
-            sleep_time = max(0, 1 - execution_time)
-            time.sleep(sleep_time)
+        self.tickTicker.run()
 
     def stopTick(self):
 
-        self.scheduler.shutdown(wait=False)
+        self.stop()
+
+    def getTickStats(self) -> dict:
+
+        # Missed ticks and lag show when a home is too big for the tick budget.
+        return {"tick": self.tickTicker.get_stats(), "log": self.logTicker.get_stats()}
 
     def tick(self):
 
@@ -382,113 +634,233 @@ class SmartHome:
 
     def checkPowerConsumption(self):
 
-        currPowerConsumption = self.calculateCurrentPowerConsumption()
+        with self.lock:
+            currPowerConsumption = self.calculateCurrentPowerConsumption()
 
-        if currPowerConsumption > self.threshold:
-            reducePowerTask = self.powerReducibleDevices.dequeue()
-            if reducePowerTask is None:
-                self.logger.info("No devices to reduce power consumption")
-                return
-            device = reducePowerTask.task
-
-            if (
-                currPowerConsumption
-                - (device.basePowerConsumption * (device.powerLevel - 1))
-                > self.threshold
-            ):
-                self.powerReducibleDevices.enqueue(reducePowerTask)
-                removeTask = self.deviceQueue.dequeue()
-                if removeTask is None:
-                    self.logger.info("No devices to turn off")
+            if currPowerConsumption > self.threshold:
+                reducePowerTask = self.powerReducibleDevices.dequeue()
+                if reducePowerTask is None:
+                    self.logger.info("No devices to reduce power consumption")
                     return
-                removeDevice = removeTask.task
-
-                self.logger.info(
-                    f"Reducing power consumption by turning off {device.deviceName}"
-                )
-
-                # add curr_rule
-                # self.addRule(self.parseRule(f"turn {removeDevice.device_id} off"))
-                self.turnOffDevice(removeDevice)
-                self.turnBackOnDevices.enqueue(
-                    Task(device, -removeTask.priority)
-                )
-            else:
-                # add curr_rule
-                # self.addRule(self.parseRule(f"set {device.device_id} 1"))
-                device.powerLevel = 1
-        else:
-            turnBackOnTask = self.turnBackOnDevices.dequeue()
-            if turnBackOnTask is not None:
-                turnBackOnDevice = turnBackOnTask.task
+                device = reducePowerTask.task
+
                 if (
                     currPowerConsumption
-                    + (
-                        turnBackOnDevice.basePowerConsumption
-                        * turnBackOnDevice.powerLevel
-                    )
+                    - (device.basePowerConsumption * (device.powerLevel - 1))
                     > self.threshold
                 ):
+                    self.powerReducibleDevices.enqueue(reducePowerTask)
+                    removeTask = self.deviceQueue.dequeue()
+                    if removeTask is None:
+                        self.logger.info("No devices to turn off")
+                        return
+                    removeDevice = removeTask.task
+
                     self.logger.info(
-                        f"Not turning back on {turnBackOnTask.task.deviceName}"
+                        f"Reducing power consumption by turning off {device.deviceName}"
                     )
-                    turnBackOnTask.priority = turnBackOnTask.priority + 3
-                    self.turnBackOnDevices.enqueue(turnBackOnTask)
-                    return
-                self.logger.info(
-                    f"Turning back on {turnBackOnTask.task.deviceName}"
-                )
-                # add curr_rule
-                # self.addRule(
-                #    self.parseRule(f"turn {turnBackOnTask.task.device_id} on")
-                # )
-                self.turnOnDevice(turnBackOnDevice)
+
+                    # add curr_rule
+                    # self.addRule(self.parseRule(f"turn {removeDevice.device_id} off"))
+                    self.turnOffDevice(removeDevice)
+                    self.turnBackOnDevices.enqueue(
+                        Task(device, -self.deviceQueue.effectivePriority(removeTask))
+                    )
+                else:
+                    # add curr_rule
+                    # self.addRule(self.parseRule(f"set {device.device_id} 1"))
+                    device.powerLevel = 1
+            else:
+                turnBackOnTask = self.turnBackOnDevices.dequeue()
+                if turnBackOnTask is not None:
+                    turnBackOnDevice = turnBackOnTask.task
+                    if (
+                        currPowerConsumption
+                        + (
+                            turnBackOnDevice.basePowerConsumption
+                            * turnBackOnDevice.powerLevel
+                        )
+                        > self.threshold
+                    ):
+                        self.logger.info(
+                            f"Not turning back on {turnBackOnTask.task.deviceName}"
+                        )
+                        turnBackOnTask.priority = turnBackOnTask.priority + 3
+                        self.turnBackOnDevices.enqueue(turnBackOnTask)
+                        return
+                    self.logger.info(
+                        f"Turning back on {turnBackOnTask.task.deviceName}"
+                    )
+                    # add curr_rule
+                    # self.addRule(
+                    #    self.parseRule(f"turn {turnBackOnTask.task.device_id} on")
+                    # )
+                    self.turnOnDevice(turnBackOnDevice)
 
     def tickTask(self):
 
         self.tickCount += 1
-        if self.tickCount % 2 == 0:
-            try:
-                if self.simulate:
-                    self.simulateDeviceChange()
-                self.realisticPowerConsumption()
-            except Exception as e:
-                self.logger.error(f"Error during deviceChange execution: {e}")
-                self.logger.exception(e)
-        try:
-            self.logPowerConsumption()
-            self.reduceBatteryTick()
-            self.checkEachDevice()
-            self.checkEachLocation()
-            self.checkPowerConsumption()
-        except Exception as e:
-            self.logger.error(f"Error during tickTask execution: {e}")
-            self.logger.exception(e)
+        self.tickPhases.run(self.tickCount, self._onPhaseError)
+
+    def _onPhaseError(self, phase: TickPhase, e: Exception):
+
+        self.logger.error(f"Error during {phase.name} phase: {e}")
+        self.logger.exception(e)
+
+    def _registerDefaultPhases(self):
+
+        # Periods are given in seconds; lower priorities run first within a tick.
+        self.registerTickPhase("simulation", self._simulationPhase, 2, priority=0)
+        self.registerTickPhase("power_log", self.logPowerConsumption, 1, priority=10)
+        self.registerTickPhase("battery", self.reduceBatteryTick, 1, priority=20)
+        self.registerTickPhase("locations", self.checkEachLocation, self.LOCATION_CHECK_INTERVAL, priority=30)
+        self.registerTickPhase("power_shedding", self.checkPowerConsumption, 1, priority=40)
+        self.registerTickPhase("condition_rules", self.evaluateConditionRules, 1, priority=50)
+        self.registerTickPhase(
+            "power_check", self.checkPowerTotals, self.POWER_CHECK_INTERVAL, priority=60, enabled=self.debugPowerTotals
+        )
+
+    def _simulationPhase(self):
+
+        if self.simulate:
+            self.simulateDeviceChange()
+        self.realisticPowerConsumption()
+
+    def _ticks(self, seconds: float) -> int:
+
+        return max(1, round(seconds / self.TICK_INTERVAL))
+
+    def registerTickPhase(
+        self,
+        name: str,
+        function,
+        period: float = 1.0,
+        offset: float = 0.0,
+        priority: int = 0,
+        enabled: bool = True,
+    ) -> TickPhase:
+
+        # Period and offset are in seconds and rounded to whole ticks, so a phase keeps
+        # its cadence if TICK_INTERVAL changes. Phases faster than the tick need a
+        # smaller TICK_INTERVAL.
+        return self.tickPhases.register(name, function, self._ticks(period), round(offset / self.TICK_INTERVAL), priority, enabled)
+
+    def unregisterTickPhase(self, name: str) -> bool:
+
+        return self.tickPhases.unregister(name)
+
+    def setTickPhaseEnabled(self, name: str, enabled: bool):
+
+        self.tickPhases.set_enabled(name, enabled)
+
+    def setTickPhasePeriod(self, name: str, period: float, offset: float | None = None):
+
+        self.tickPhases.set_period(name, self._ticks(period), None if offset is None else round(offset / self.TICK_INTERVAL))
+
+    def getTickPhaseStats(self) -> dict:
+
+        return self.tickPhases.get_stats()
 
     def startRuleExecution(self):
 
         try:
-            self.scheduler.submit(self._runExecuteRulesPeriodically)
+            self.scheduler.submit(self._runRuleExecutor, self.ruleList.generation)
         except Exception as e:
             self.logger.error(f"Error during curr_rule execution: {e}")
             self.logger.exception(e)
 
-    def _runExecuteRulesPeriodically(self):
+    def _runRuleExecutor(self, generation: int):
+
+        # Sleeps until a rule is queued instead of polling, so an idle home never wakes
+        # and a new rule runs within milliseconds. A batch window trades a little of
+        # that latency for larger batches. stop closes the rule queue, which ends this
+        # loop for good, even when a new run has already started.
+        while self.ruleList.generation == generation:
+            if self.ruleList.wait(None, self.ruleBatchWindow, self.ruleMaxBatch, generation):
+                self.executeRules()
+
+    def setRuleBatchWindow(self, seconds: float, maxBatch: int | None = None):
+
+        self.ruleBatchWindow = seconds
+        self.ruleMaxBatch = maxBatch
+
+    def getRuleLatencyStats(self) -> dict:
+
+        # Enqueue-to-apply latency of executed rules, in seconds.
+        return self.ruleLatency.snapshot()
+
+    def executeRules(self, limit: int | None = None):
+
+        # Applies the pending batch in queue order, on the calling thread. The gain of a
+        # batch comes from _applyRules merging runs of on/off rules into bulk transitions.
+        entries = list(self.ruleList.drain(limit))
+        if entries:
+            self._applyRules([rule for rule, _ in entries])
+            self._recordRuleLatency(entries)
+
+    def _recordRuleLatency(self, entries: list[tuple]):
+
+        now = time.perf_counter()
+        self.ruleLatency.record_many(now - enqueued for _, enqueued in entries)
+
+    def _applyRules(self, rules: list[CompiledRule]):
+
+        # Runs of plain on/off rules for distinct devices are applied with one
+        # applyTransitions call per direction; everything else runs one by one.
+        turnOn, turnOff = {}, {}
+        for rule in rules:
+            if rule.op in (RuleOp.TURN_ON, RuleOp.TURN_OFF) and self.devicesById.get(rule.target.deviceId) is rule.target:
+                if rule.target in turnOn or rule.target in turnOff:
+                    self._flushTransitions(turnOn, turnOff)
+                (turnOn if rule.op == RuleOp.TURN_ON else turnOff)[rule.target] = None
+                continue
+            self._flushTransitions(turnOn, turnOff)
+            try:
+                self.runCompiledRule(rule)
+            except RuleParsingException as e:
+                self.addLog(logging.ERROR, f"Rule execution error: {e}")
+            except Exception as e:
+                self.addLog(logging.ERROR, f"Unexpected error executing rule: {e}")
+        self._flushTransitions(turnOn, turnOff)
+
+    def _flushTransitions(self, turnOn: dict, turnOff: dict):
 
-        while True:
-            start_time = time.time()
-            self.executeRules()
-            end_time = time.time()
-            execution_time = end_time - start_time
-            sleep_time = max(0, 1 - execution_time)
-            time.sleep(sleep_time)
+        try:
+            if turnOff:
+                self.applyTransitions(list(turnOff), False)
+            if turnOn:
+                self.applyTransitions(list(turnOn), True)
+        except Exception as e:
+            self.addLog(logging.ERROR, f"Unexpected error executing rule: {e}")
+        turnOn.clear()
+        turnOff.clear()
+
+    def startScheduledRules(self):
+
+        try:
+            self.scheduler.submit(self._runScheduledRules)
+        except Exception as e:
+            self.logger.error(f"Error during scheduled rule execution: {e}")
+            self.logger.exception(e)
 
-    def executeRules(self):
+    def _runScheduledRules(self):
 
-        rule = self.ruleList.peekAndRemove()
-        while rule is not None:
-            self.executeRule(rule)
-            rule = self.ruleList.peekAndRemove()
+        # Sleeps until the next scheduled rule is due instead of polling; scheduling
+        # an earlier rule wakes it up through scheduleCondition.
+        stopped = self.stopped
+        while not stopped.is_set():
+            with self.scheduleCondition:
+                if stopped.is_set():
+                    return
+                deadline = self.ruleScheduler.next_deadline()
+                timeout = None if deadline is None else max(0, deadline - time.time())
+                self.scheduleCondition.wait(timeout)
+            try:
+                for rule in self.ruleScheduler.advance(time.time()):
+                    self.addRule(rule)
+            except Exception as e:
+                self.logger.error(f"Error during scheduled rule execution: {e}")
+                self.logger.exception(e)
 
     # ========================================================================
     # Logging
@@ -496,9 +868,10 @@ class SmartHome:
 
     def initializeLogger(self):
 
-        self.powerConsumptionlogger = logging.getLogger("PowerConsumptionLog")
-        self.logger = logging.getLogger(__name__)
-        self.deviceBatteryLogger = logging.getLogger("DeviceBatteryLog")
+        # Handlers are added once, so a restart doesn't duplicate every line.
+        if self.loggerInitialized or not self.configureLogging:
+            return
+        self.loggerInitialized = True
 
         infoFileHandler = None
         warningFileHandler = None
@@ -507,9 +880,9 @@ class SmartHome:
         deviceBatteryFileHandler = None
 
         try:
-            self.powerConsumptionlogger.setLevel(logging.ALL)
+            self.powerConsumptionlogger.setLevel(logging.DEBUG)
             powerConsumptionFileHandler = logging.FileHandler("PowerConsumption.log")
-            powerConsumptionFileHandler.setLevel(logging.ALL)
+            powerConsumptionFileHandler.setLevel(logging.DEBUG)
             powerConsumptionFileHandler.setFormatter(logging.Formatter("%(asctime)s - %(message)s"))
 
             infoFileHandler = logging.FileHandler("Info.log")
@@ -523,13 +896,13 @@ class SmartHome:
             warningFileHandler.addFilter(lambda record: record.levelno == logging.WARNING)
 
             severeFileHandler = logging.FileHandler("Severe.log")
-            severeFileHandler.setLevel(logging.SEVERE)
+            severeFileHandler.setLevel(logging.ERROR)
             severeFileHandler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
-            severeFileHandler.addFilter(lambda record: record.levelno == logging.SEVERE)
+            severeFileHandler.addFilter(lambda record: record.levelno == logging.ERROR)
 
-            self.deviceBatteryLogger.setLevel(logging.ALL)
+            self.deviceBatteryLogger.setLevel(logging.DEBUG)
             deviceBatteryFileHandler = logging.FileHandler("DeviceBattery.log")
-            deviceBatteryFileHandler.setLevel(logging.ALL)
+            deviceBatteryFileHandler.setLevel(logging.DEBUG)
             deviceBatteryFileHandler.setFormatter(logging.Formatter("%(asctime)s - %(message)s"))
 
             self.logger.addHandler(infoFileHandler)
@@ -555,31 +928,18 @@ class SmartHome:
 
     def _runLogPeriodically(self):
 
-        while True:
-            start_time = time.time()
-            self.log()
-            end_time = time.time()
-            execution_time = end_time - start_time
-            sleep_time = max(0, 2 - execution_time)
-            time.sleep(sleep_time)
+        self.logTicker.run()
 
     def log(self):
 
-        task = self.loggingList.peekAndRemove()
-        powerTask = self.powerConsumptionLogList.peekAndRemove()
-        batteryTask = self.deviceBatteryLogList.peekAndRemove()
-
-        while task is not None:
+        for task in self.loggingList.drain():
             self.logger.log(task.logLevel, task.message)
-            task = self.loggingList.peekAndRemove()
 
-        while powerTask is not None:
+        for powerTask in self.powerConsumptionLogList.drain():
             self.powerConsumptionlogger.log(powerTask.logLevel, powerTask.message)
-            powerTask = self.powerConsumptionLogList.peekAndRemove()
 
-        while batteryTask is not None:
+        for batteryTask in self.deviceBatteryLogList.drain():
             self.deviceBatteryLogger.log(batteryTask.logLevel, batteryTask.message)
-            batteryTask = self.deviceBatteryLogList.peekAndRemove()
 
     def addLog(self, logLevel, message):
 
@@ -589,20 +949,20 @@ class SmartHome:
         elif logLevel == logging.WARNING:
             self.warningTasks.append(message)
 
-        elif logLevel == logging.SEVERE:
+        elif logLevel == logging.ERROR:
             self.severeTasks.append(message)
-        self.loggingList.addEnd(LogTask.LogTask(logLevel, message))
+        self.loggingList.add_end(LogTask.LogTask(logLevel, message))
 
     def addPowerLog(self, logLevel, message):
 
-        self.powerConsumptionLogList.addEnd(LogTask.LogTask(logLevel, message))
+        self.powerConsumptionLogList.add_end(LogTask.LogTask(logLevel, message))
         self.powerConsumptionTasks.append(message)
         if logLevel != logging.INFO:
             self.addLog(logLevel, message)
 
     def addBatteryLog(self, logLevel, message):
 
-        self.deviceBatteryLogList.addEnd(LogTask.LogTask(logLevel, message))
+        self.deviceBatteryLogList.add_end(LogTask.LogTask(logLevel, message))
         self.deviceBatteryTasks.append(message)
         if logLevel != logging.INFO:
             self.addLog(logLevel, message)
@@ -613,14 +973,29 @@ class SmartHome:
 
     def calculateCurrentBasePowerConsumption(self) -> float:
 
-        return sum(device.basePowerConsumption for device in self.poweredOnDevices)
+        # Running totals are updated by the device setters, so these are O(1).
+        return self.deviceTable.total_base
 
     def calculateCurrentPowerConsumption(self) -> float:
 
-        return sum(
-            device.basePowerConsumption * (device.powerLevel if device.powerLevel > 0 else 1)
-            for device in self.poweredOnDevices
-        )
+        return self.deviceTable.total_draw
+
+    def recalculatePowerConsumption(self) -> float:
+
+        return float(self.deviceTable.power_draw().sum())
+
+    def checkPowerTotals(self) -> float:
+
+        drift = self.deviceTable.check_totals()
+        if drift:
+            self.addLog(logging.WARNING, f"Running power total drifted by {drift}W, recomputing it")
+            self.deviceTable.recompute_totals()
+        return drift
+
+    def calculatePowerBreakdown(self, baseOnly: bool = False) -> dict:
+
+        # Total plus per-location, per-group and per-type consumption, keyed by enum.
+        return self.deviceTable.power_summary(baseOnly)
 
     def logPowerConsumption(self):
 
@@ -638,44 +1013,56 @@ class SmartHome:
 
     def getPowerConsumption(self) -> float:
 
-        return self.powerConsumption
+        return self.deviceTable.total_draw
+
+    def getPowerConsumptionByLocation(self) -> dict:
+
+        return self.deviceTable.location_totals()
+
+    def getPowerConsumptionByGroup(self) -> dict:
+
+        return self.deviceTable.group_totals()
 
     def realisticPowerConsumption(self):
 
-        for device in self.poweredOnDevices:
-            if self.random.random() >= 0.9:
-                device.basePowerConsumption += device.basePowerConsumption * self.random.uniform(0.3, 0.5)
-            elif self.random.random() <= 0.1:
-                device.basePowerConsumption -= device.basePowerConsumption * self.random.uniform(0.3, 0.5)
+        # Each powered-on device has a 10% chance of drawing 30-50% more, otherwise a
+        # 10% chance of drawing 30-50% less. All draws for the tick are made at once.
+        rows = self.deviceTable.powered_on_rows()
+        increase = self.rng.random(len(rows)) >= 0.9
+        decrease = ~increase & (self.rng.random(len(rows)) <= 0.1)
+        factor = self.rng.uniform(0.3, 0.5, len(rows))
+        change = np.where(increase, factor, np.where(decrease, -factor, 0.0))
+
+        changed = np.flatnonzero(change)
+        self.deviceTable.set_values(
+            rows[changed],
+            "base_power_consumption",
+            self.deviceTable.base_power_consumption[rows[changed]] * (1 + change[changed]),
+        )
 
     def reduceBatteryTick(self):
 
-        for device in self.poweredOnDevices:
-            # ikr ui is sooo dumb :3
-            if device.maxBatteryCapacity > 0 and device.currentBatteryCapacity == 0:
-                device.currentBatteryCapacity = device.batteryCapacity
-                device.onBattery = True
-
-            if device.onBattery:
-                toLog = self.reduceBatteryLevel(device)
-                if device.batteryLevel < 20:
-                    self.addBatteryLog(
-                        logging.WARNING, f"Battery level of {device.deviceName} is below 20 percent!"
-                    )
-                elif device.batteryLevel < 10:
-                    self.addBatteryLog(
-                        logging.SEVERE, f"Battery level of {device.deviceName} is below 10 percent!" 
-                    )
-                elif not toLog:
-                    self.addBatteryLog(
-                        logging.INFO, f"Battery level of {device.deviceName} is now {device.batteryLevel}"
-                    )
-
-                if device.batteryLevel <= 0:
-                    self.addBatteryLog(
-                        logging.ERROR, f"Battery of {device.deviceName} has run out! Plug it in!"
-                    )
-                    self.turnOffDevice(device)
+        rows, previous, current = self.deviceTable.drain_batteries()
+
+        # Only rows that crossed a threshold this tick produce a log line.
+        depleted = current <= 0
+        below10 = (current < 10) & (previous >= 10) & ~depleted
+        below20 = (current < 20) & (previous >= 20) & ~below10 & ~depleted
+        newDecile = (current >= 20) & (current // 10 != previous // 10)
+
+        for index in np.flatnonzero(newDecile):
+            device = self.deviceTable.get_device(rows[index])
+            self.addBatteryLog(logging.INFO, f"Battery level of {device.deviceName} is now {int(current[index])}")
+        for index in np.flatnonzero(below20):
+            device = self.deviceTable.get_device(rows[index])
+            self.addBatteryLog(logging.WARNING, f"Battery level of {device.deviceName} is below 20 percent!")
+        for index in np.flatnonzero(below10):
+            device = self.deviceTable.get_device(rows[index])
+            self.addBatteryLog(logging.ERROR, f"Battery level of {device.deviceName} is below 10 percent!")
+        for index in np.flatnonzero(depleted):
+            device = self.deviceTable.get_device(rows[index])
+            self.addBatteryLog(logging.ERROR, f"Battery of {device.deviceName} has run out! Plug it in!")
+            self.turnOffDevice(device)
 
     def reduceBatteryLevel(self, device: Device) -> bool:
 
@@ -688,7 +1075,281 @@ class SmartHome:
     # Rule Management
     # ========================================================================
 
-   
+    def executeRule(self, rule: Rule | CompiledRule):
+
+        compiledRules = [rule] if isinstance(rule, CompiledRule) else self.compileParsedRule(rule)
+        for compiled in compiledRules:
+            self.runCompiledRule(compiled)
+
+    def runCompiledRule(self, rule: CompiledRule):
+
+        # A device may have been removed between compiling and running the rule.
+        if rule.targets_device() and self.devicesById.get(rule.target.deviceId) is not rule.target:
+            raise RuleParsingException(f"Device with ID {rule.target.deviceId} not found")
+        self.ruleHandlers[rule.op](rule)
+
+    def setDevicePowerLevel(self, device: Device, powerLevel: int):
+
+        with self.lock:
+            device.powerLevel = powerLevel
+
+    def compileParsedRule(self, rule: Rule) -> list[CompiledRule]:
+
+        # Resolves a Rule's flags to opcodes, in the order the flags used to be tested.
+        compiled = []
+        if rule.get_deviceId() != -1:
+            device = self.getDevice(rule.get_deviceId())
+            if device is None:
+                raise RuleParsingException(f"Device with ID {rule.get_deviceId()} not found")
+
+            if rule.get_flipState():
+                compiled.append(CompiledRule(RuleOp.FLIP, device))
+            elif rule.get_setPowerLevel():
+                if not (0 <= rule.get_powerLevel() <= 5):
+                    raise RuleParsingException(f"Invalid power level {rule.get_powerLevel()}, must be between 0 and 5")
+                compiled.append(CompiledRule(RuleOp.SET_POWER_LEVEL, device, rule.get_powerLevel()))
+            elif rule.get_turnOn():
+                compiled.append(CompiledRule(RuleOp.TURN_ON, device))
+            elif rule.get_turnOff():
+                compiled.append(CompiledRule(RuleOp.TURN_OFF, device))
+
+        for name, names, turnOn, turnOff, onOp, offOp, kind in (
+            (rule.get_groupName(), self.groupMap, rule.get_turnGroupOn(), rule.get_turnGroupOff(), RuleOp.GROUP_ON, RuleOp.GROUP_OFF, "Group"),
+            (rule.get_typeName(), self.typeMap, rule.get_turnTypeOn(), rule.get_turnTypeOff(), RuleOp.TYPE_ON, RuleOp.TYPE_OFF, "Type"),
+            (rule.get_locationName(), self.locationMap, rule.get_turnLocationOn(), rule.get_turnLocationOff(), RuleOp.LOCATION_ON, RuleOp.LOCATION_OFF, "Location"),
+        ):
+            if not name:
+                continue
+            if name not in names:
+                raise RuleParsingException(f"{kind} {name} not found")
+            if turnOn:
+                compiled.append(CompiledRule(onOp, name))
+            elif turnOff:
+                compiled.append(CompiledRule(offOp, name))
+        return compiled
+
+    def compileRule(self, ruleString: str) -> CompiledRule:
+
+        # Rule strings are resubmitted constantly, so compiled rules are cached by their
+        # normalized text. Entries targeting a device are dropped when it is removed or renamed.
+        key = RuleCache.normalize(ruleString)
+        compiled = self.ruleCache.get(key)
+        if compiled is None:
+            compiled = self.compileParsedRule(self.parseRule(ruleString))[0]
+            self.ruleCache.put(key, compiled)
+        return compiled
+
+    def submitRule(self, ruleString: str, immediate: bool = False) -> CompiledRule:
+
+        compiled = self.compileRule(ruleString)
+        if immediate:
+            self.addImmediateRule(compiled)
+        else:
+            self.addRule(compiled)
+        return compiled
+
+    def flipDeviceState(self, device: Device):
+
+        with self.lock:
+            if device.isTurnedOn:
+                self.turnOffDevice(device)
+            else:
+                self.turnOnDevice(device)
+
+    def parseRule(self, ruleString: str) -> Rule:
+
+        tokens = ruleString.split()
+        if not tokens:
+            raise RuleParsingException("Empty rule")
+
+        command = tokens[0].lower()
+        args = tokens[1:]
+
+        if command == "flip":
+            self.checkTokenSize(args, 1)
+            device = self.checkTokenForDevice(args[0])
+            return Rule(deviceId=device.deviceId, flipState=True)
+
+        elif command == "turn":
+            self.checkTokenSize(args, 2)
+            device = self.checkTokenForDevice(args[0])
+            state = self.checkTokenOnOff(args[1])
+            return Rule(deviceId=device.deviceId, turnOn=state, turnOff=not state)
+
+        elif command == "set":
+            self.checkTokenSize(args, 2)
+            device = self.checkTokenForDevice(args[0])
+            if not self.isNumeric(args[1]):
+                raise RuleParsingException(f"Invalid power level {args[1]}")
+            powerLevel = int(float(args[1]))
+            if not (0 <= powerLevel <= 5):
+                raise RuleParsingException(f"Invalid power level {powerLevel}, must be between 0 and 5")
+            return Rule(deviceId=device.deviceId, setPowerLevel=True, powerLevel=powerLevel)
+
+        elif command == "group":
+            self.checkTokenSize(args, 2)
+            groupName = args[0].upper()
+            if groupName not in self.groupMap:
+                raise RuleParsingException(f"Group {groupName} not found")
+            state = self.checkTokenOnOff(args[1])
+            return Rule(groupName=groupName, turnGroupOn=state, turnGroupOff=not state)
+
+        elif command == "type":
+            self.checkTokenSize(args, 2)
+            typeName = args[0].upper()
+            if typeName not in self.typeMap:
+                raise RuleParsingException(f"Type {typeName} not found")
+            state = self.checkTokenOnOff(args[1])
+            return Rule(typeName=typeName, turnTypeOn=state, turnTypeOff=not state)
+
+        elif command == "location":
+            self.checkTokenSize(args, 2)
+            locationName = args[0].upper()
+            if locationName not in self.locationMap:
+                raise RuleParsingException(f"Location {locationName} not found")
+            state = self.checkTokenOnOff(args[1])
+            return Rule(locationName=locationName, turnLocationOn=state, turnLocationOff=not state)
+
+        raise RuleParsingException(f"Invalid rule command {command}")
+
+    def _readConditionInput(self, key: tuple):
+
+        if key[0] == "location":
+            location = self.locationMap.get(key[1])
+            return getattr(location, key[2]) if location is not None else None
+        if key == ("home", "power"):
+            return self.deviceTable.total_draw
+        if key == ("home", "threshold"):
+            return self.threshold
+        raise RuleParsingException(f"Unknown condition input {key}")
+
+    def parseConditionRule(self, ruleString: str) -> tuple:
+
+        # if power <op> <value> <rule>
+        # if <location> temperature|people <op> <value> <rule>
+        # if <device> power|level|battery <op> <value> <rule>
+        # <value> is a number or "threshold".
+        tokens = ruleString.split()
+        if len(tokens) < 5 or tokens[0].lower() != "if":
+            raise RuleParsingException("Condition rules look like: if <subject> [attribute] <op> <value> <rule>")
+
+        if tokens[1].lower() == "power":
+            key = ("home", "power")
+            read = lambda: self.deviceTable.total_draw
+            rest = tokens[2:]
+        elif tokens[1].upper() in self.locationMap and tokens[2].lower() in ("temperature", "people"):
+            location = self.locationMap[tokens[1].upper()]
+            attribute = tokens[2].lower()
+            key = ("location", tokens[1].upper(), attribute)
+            read = lambda: getattr(location, attribute)
+            rest = tokens[3:]
+        else:
+            device = self.checkTokenForDevice(tokens[1])
+            column = self.CONDITION_DEVICE_ATTRIBUTES.get(tokens[2].lower())
+            if column is None:
+                raise RuleParsingException(f"Invalid device attribute {tokens[2]}")
+            key = ("device", device, column)
+            read = lambda: getattr(self.deviceTable, column)[device.get_row()]
+            rest = tokens[3:]
+
+        if len(rest) < 3:
+            raise RuleParsingException("Condition rule has no action")
+        compare = COMPARISONS.get(rest[0])
+        if compare is None:
+            raise RuleParsingException(f"Invalid comparison {rest[0]}")
+        reads = [key]
+        if rest[1].lower() == "threshold":
+            reads.append(("home", "threshold"))
+            condition = lambda: compare(read(), self.threshold)
+        elif self.isNumeric(rest[1]):
+            value = float(rest[1])
+            condition = lambda: compare(read(), value)
+        else:
+            raise RuleParsingException(f"Invalid comparison value {rest[1]}")
+        return reads, condition, self.compileRule(" ".join(rest[2:]))
+
+    def addConditionRule(self, ruleString: str) -> ConditionRule:
+
+        return self.registerConditionRule(*self.parseConditionRule(ruleString))
+
+    def registerConditionRule(self, reads: list[tuple], condition, action: CompiledRule) -> ConditionRule:
+
+        # reads lists every input the condition looks at; the rule is only re-evaluated
+        # on ticks where one of them changed.
+        return self.conditionRules.add(reads, condition, action)
+
+    def removeConditionRule(self, ruleId: int) -> bool:
+
+        return self.conditionRules.remove(ruleId)
+
+    def evaluateConditionRules(self):
+
+        for rule in self.conditionRules.changed_rules():
+            try:
+                result = bool(rule.condition())
+            except Exception as e:
+                self.addLog(logging.ERROR, f"Error evaluating condition rule {rule.rule_id}: {e}")
+                continue
+            if result and not rule.active:
+                self.addRule(rule.action)
+            rule.active = result
+
+    def _compileQueuedRule(self, rule: Rule | CompiledRule) -> list[CompiledRule]:
+
+        if isinstance(rule, CompiledRule):
+            return [rule]
+        try:
+            return self.compileParsedRule(rule)
+        except RuleParsingException as e:
+            self.addLog(logging.ERROR, f"Rule execution error: {e}")
+            return []
+
+    def addRule(self, rule: Rule | CompiledRule):
+
+        if rule:
+            for compiled in self._compileQueuedRule(rule):
+                self.ruleList.add(compiled, compiled.target_key(), compiled.overrides())
+
+    def addImmediateRule(self, rule: Rule | CompiledRule):
+
+        if rule:
+            for compiled in reversed(self._compileQueuedRule(rule)):
+                self.ruleList.add_front(compiled)
+
+    def cancelPendingRules(self, rule: CompiledRule) -> int:
+
+        # Drops every pending rule writing the same target as the given rule.
+        return self.ruleList.cancel(rule.target_key())
+
+    def getRuleQueueStats(self) -> dict:
+
+        return self.ruleList.get_stats()
+
+    def scheduleRuleAt(self, rule: Rule, due: float, interval: float | None = None) -> TimerHandle:
+
+        handle = self.ruleScheduler.schedule(rule, due, interval)
+        with self.scheduleCondition:
+            self.scheduleCondition.notify()
+        if self.asyncRuntime is not None:
+            self.asyncRuntime.notify_scheduled()
+        return handle
+
+    def scheduleRule(self, rule: Rule, delay: float, interval: float | None = None) -> TimerHandle:
+
+        return self.scheduleRuleAt(rule, time.time() + delay, interval)
+
+    def scheduleDailyRule(self, rule: Rule, hour: int, minute: int = 0) -> TimerHandle:
+
+        now = datetime.now()
+        due = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if due <= now:
+            due += timedelta(days=1)
+        return self.scheduleRuleAt(rule, due.timestamp(), 24 * 60 * 60)
+
+    def cancelScheduledRule(self, handle: TimerHandle) -> bool:
+
+        return self.ruleScheduler.cancel(handle)
+
     # ========================================================================
     # Location and Temperature Management
     # ========================================================================
@@ -700,7 +1361,7 @@ class SmartHome:
                 logging.WARNING, f"Location already exists, user tried to add {location} again"
             )
             return
-        self.locationMap[location] = Devicelocation.DeviceLocation(location)
+        self.locationMap[location] = Devicelocation.DeviceLocation(location, self.nameIndex)
 
     def checkEachLocation(self):
 
@@ -716,13 +1377,13 @@ class SmartHome:
             # }
             # }
             if location.temperature > 40:
-                self.addLog(logging.SEVERE, f"Temperature in {location} is above 40 degrees!")
+                self.addLog(logging.ERROR, f"Temperature in {location} is above 40 degrees!")
             elif location.temperature > 35:
                 self.addLog(logging.WARNING, f"Temperature in {location} is above 35 degrees!")
             elif location.temperature < 15:
                 self.addLog(logging.WARNING, f"Temperature in {location} is below 15 degrees!")
             elif location.temperature < 10:
-                self.addLog(logging.SEVERE, f"Temperature in {location} is below 10 degrees!")
+                self.addLog(logging.ERROR, f"Temperature in {location} is below 10 degrees!")
 
 
             # if (location.temperature != ideal_temp) {
@@ -759,30 +1420,21 @@ class SmartHome:
 
     def simulateDeviceChange(self):
 
-        toTurnOff = []
-        toTurnOn = []
+        # Powered-on devices turn off with a 40% chance, otherwise get a random power
+        # level from 1 to 6 unless they are at level 0. Powered-off devices turn on
+        # with a 40% chance.
+        with self.lock:
+            onRows = self.deviceTable.powered_on_rows()
+            offRows = self.deviceTable.powered_off_rows()
+            turnOff = self.rng.random(len(onRows)) >= 0.6
+            turnOn = self.rng.random(len(offRows)) >= 0.6
 
-        for device in self.poweredOnDevices:
-            if not isinstance(device, Device):
-                continue
-            randomDouble = self.random.random()
-            if randomDouble >= 0.6:
-                toTurnOff.append(device)
+            stayOn = onRows[~turnOff]
+            stayOn = stayOn[self.deviceTable.power_level[stayOn] != 0]
+            self.deviceTable.set_values(stayOn, "power_level", self.rng.integers(1, 7, len(stayOn)))
 
-            elif device.powerLevel != 0:
-                device.powerLevel = self.random.randint(1, 6)
-
-        for device in self.poweredOffDevices:
-            if not isinstance(device, Device):
-                continue
-
-            if self.random.random() >= 0.6:
-                toTurnOn.append(device)
-
-        for device in toTurnOff:
-            self.turnOffDevice(device)
-        for device in toTurnOn:
-            self.turnOnDevice(device)
+            self.applyTransitions([self.deviceTable.get_device(row) for row in onRows[turnOff]], False)
+            self.applyTransitions([self.deviceTable.get_device(row) for row in offRows[turnOn]], True)
 
     def accidentallyturnedoncheck(self):
 
@@ -807,9 +1459,9 @@ class SmartHome:
         except ValueError:
             return False
 
-    def getDevicesByGroup(self, groupName: str) -> list[Device.Device]:
+    def getDevicesByGroup(self, groupName: str) -> list[Device]:
 
-        return self.groupMap[groupName].devices
+        return self.groupMap[groupName].get_devices()
 
     def getDeviceGroups(self) -> dict[str, DeviceGroup.DeviceGroup]:
 
@@ -823,13 +1475,13 @@ class SmartHome:
 
         return self.locationMap
 
-    def getDevicesByType(self, typeName: str) -> list[Device.Device]:
+    def getDevicesByType(self, typeName: str) -> list[Device]:
 
-        return self.typeMap[typeName].devices
+        return self.typeMap[typeName].get_devices()
 
-    def getDevicesByLocation(self, locationName: str) -> list[Device.Device]:
+    def getDevicesByLocation(self, locationName: str) -> list[Device]:
 
-        return self.locationMap[locationName].devices
+        return self.locationMap[locationName].get_devices()
 
     def checkTokenForDevice(self, token: str) -> Device:
 
@@ -867,6 +1519,11 @@ class SmartHome:
     
         self.simulate = simulate
 
+    def setDebugPowerTotals(self, debugPowerTotals: bool):
+
+        self.debugPowerTotals = debugPowerTotals
+        self.setTickPhaseEnabled("power_check", debugPowerTotals)
+
     def getThreshold(self) -> float:
 
         return self.threshold
@@ -879,15 +1536,15 @@ class SmartHome:
 
         return self.simulate
 
-    def getPoweredOnDevices(self) -> list[Device.Device]:
+    def getPoweredOnDevices(self) -> list[Device]:
 
-        return self.poweredOnDevices
+        return list(self.poweredOnDevices)
 
-    def getPoweredOffDevices(self) -> list[Device.Device]:
+    def getPoweredOffDevices(self) -> list[Device]:
 
-        return self.poweredOffDevices
+        return list(self.poweredOffDevices)
 
-    def getDevices(self) -> list[Device.Device]:
+    def getDevices(self) -> list[Device]:
 
         devices = []
         devices.extend(self.poweredOnDevices)
@@ -908,23 +1565,23 @@ class SmartHome:
 
     def getPowerConsumptionTasks(self) -> list[str]:
 
-        return self.powerConsumptionTasks
+        return self.powerConsumptionTasks.to_list()
 
     def getDeviceBatteryTasks(self) -> list[str]:
 
-        return self.deviceBatteryTasks
+        return self.deviceBatteryTasks.to_list()
 
     def getInfoTasks(self) -> list[str]:
 
-        return self.infoTasks
+        return self.infoTasks.to_list()
 
     def getWarningTasks(self) -> list[str]:
 
-        return self.warningTasks
+        return self.warningTasks.to_list()
 
     def getSevereTasks(self) -> list[str]:
 
-        return self.severeTasks
+        return self.severeTasks.to_list()
 
     def clearInfoTasks(self):
 
@@ -946,6 +1603,12 @@ class SmartHome:
  
         self.deviceBatteryTasks.clear()
 
+    def readLogSince(self, stream: str, cursor: int, limit: int | None = None) -> tuple[list[str], int]:
+
+        # Pollers pass back the returned cursor to fetch only entries added since
+        # their last read. Entries already evicted from the buffer are skipped.
+        return self.logStreams[stream].read_since(cursor, limit)
+
     def getDeviceBatteryLogList(self) -> LinkedList:
 
         return self.deviceBatteryLogList
@@ -958,19 +1621,27 @@ class SmartHome:
 
         return self.loggingList
 
-    def getRuleList(self) -> LinkedList:
+    def getRuleList(self) -> PendingRules:
 
         return self.ruleList
 
+    def getRuleScheduler(self) -> TimingWheel:
+
+        return self.ruleScheduler
+
     def clearDeviceBatteryLogList(self):
 
         self.deviceBatteryLogList.clear()
 
-    def getDeviceQueue(self) -> PriorityQueue:
+    def getDeviceTable(self) -> DeviceTable:
+
+        return self.deviceTable
+
+    def getDeviceQueue(self) -> OffsetPriorityQueue:
 
         return self.deviceQueue
 
-    def getPowerReducibleDevices(self) -> PriorityQueue:
+    def getPowerReducibleDevices(self) -> OffsetPriorityQueue:
 
         return self.powerReducibleDevices
 
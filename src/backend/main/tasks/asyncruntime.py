@@ -0,0 +1,140 @@
+import asyncio
+import time
+
+
+class AsyncRuntime:     # Runs a home's tick, log flush, rule executor and rule scheduler as tasks on one event loop.
+    def __init__(self, home):
+        self.home = home
+        self.loop = None
+        self.tasks = []
+        self.running = False
+        self.generation = 0     # Bumped by every start, so a stale start never creates tasks.
+        self.phase = None       # Delay before the first tick and log flush, None for one full period.
+        self.rule_quantum = None    # Rules applied per turn before other tasks on the loop get to run, None for all pending.
+        self.rule_arrived = asyncio.Event()       # Set when a rule is queued, from any thread.
+        self.schedule_changed = asyncio.Event()   # Set when a rule is scheduled, so the next deadline is recomputed.
+
+    def _on_loop(self):
+        try:
+            return asyncio.get_running_loop() is self.loop
+        except RuntimeError:
+            return False
+
+    def _call(self, callback):  # Runs callback on the loop, directly when already on it.
+        if self._on_loop():
+            callback()
+        else:
+            self.loop.call_soon_threadsafe(callback)
+
+    def _set(self, event):
+        # A set event is cleared by its waiter before it reads the queue, so anything
+        # added before this check is seen without another wake-up.
+        if self.running and not event.is_set():
+            self._call(event.set)
+
+    def start(self, loop=None, phase=None):     # Uses the running loop unless one is given. May be called from any thread.
+        if self.running:
+            return
+        if loop is None:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                raise RuntimeError(
+                    "The asyncio runtime needs an event loop: call start from inside a running loop or pass one in. "
+                    "A home built outside a loop needs autoStart=False."
+                ) from None
+        self.loop = loop
+        self.phase = phase
+        self.running = True
+        self.generation += 1
+        self.rule_arrived = asyncio.Event()
+        self.schedule_changed = asyncio.Event()
+        self.home.ruleList.add_arrival_listener(self.notify_rules)
+        generation = self.generation
+        self._call(lambda: self._create_tasks(generation))
+
+    def _create_tasks(self, generation):
+        if not self.running or generation != self.generation:    # Stopped before the loop got to it.
+            return
+        home = self.home
+        self.tasks = [
+            self.loop.create_task(home.tickTicker.run_async(self.phase), name="tick"),
+            self.loop.create_task(home.logTicker.run_async(self.phase), name="log"),
+            self.loop.create_task(self._run_rules(), name="rules"),
+            self.loop.create_task(self._run_scheduled_rules(), name="scheduled_rules"),
+        ]
+        if home.ruleList.get_size() > 0:
+            self.rule_arrived.set()
+
+    def stop(self):     # Cancels every task. May be called from any thread.
+        if not self.running:
+            return
+        self.running = False
+        self.home.ruleList.remove_arrival_listener(self.notify_rules)
+        self.home.tickTicker.stop()
+        self.home.logTicker.stop()
+        tasks = self.tasks
+        self._call(lambda: self._cancel_tasks(tasks))
+
+    def _cancel_tasks(self, tasks):
+        for task in tasks:
+            task.cancel()
+
+    async def wait_closed(self):    # Waits on the loop until every cancelled task has finished.
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+
+    def is_running(self):
+        return self.running
+
+    def notify_rules(self):
+        self._set(self.rule_arrived)
+
+    def notify_scheduled(self):
+        self._set(self.schedule_changed)
+
+    async def _run_rules(self):
+        home = self.home
+        while True:
+            await self.rule_arrived.wait()
+            if home.ruleBatchWindow > 0:
+                await self._batch_window(home.ruleBatchWindow, home.ruleMaxBatch)
+            self.rule_arrived.clear()
+            try:
+                home.executeRules(self.rule_quantum)
+            except Exception as e:
+                home.logger.error(f"Error during rule execution: {e}")
+                home.logger.exception(e)
+            if home.ruleList.get_size() > 0:
+                # More than a quantum was pending. Yield first, so one busy home
+                # cannot hold up the other homes sharing the loop.
+                self.rule_arrived.set()
+                await asyncio.sleep(0)
+
+    async def _batch_window(self, window, max_batch):
+        deadline = self.loop.time() + window
+        while max_batch is None or self.home.ruleList.get_size() < max_batch:
+            remaining = deadline - self.loop.time()
+            if remaining <= 0:
+                return
+            self.rule_arrived.clear()
+            try:
+                await asyncio.wait_for(self.rule_arrived.wait(), remaining)
+            except asyncio.TimeoutError:
+                return
+
+    async def _run_scheduled_rules(self):
+        home = self.home
+        while True:
+            self.schedule_changed.clear()
+            deadline = home.ruleScheduler.next_deadline()
+            timeout = None if deadline is None else max(0, deadline - time.time())
+            try:
+                await asyncio.wait_for(self.schedule_changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                for rule in home.ruleScheduler.advance(time.time()):
+                    home.addRule(rule)
+            except Exception as e:
+                home.logger.error(f"Error during scheduled rule execution: {e}")
+                home.logger.exception(e)
@@ -0,0 +1,117 @@
+import threading
+from collections import OrderedDict
+from enum import IntEnum
+
+
+class RuleOp(IntEnum):     # Opcodes up to SET_POWER_LEVEL target a single device.
+    FLIP = 0
+    TURN_ON = 1
+    TURN_OFF = 2
+    SET_POWER_LEVEL = 3
+    GROUP_ON = 4
+    GROUP_OFF = 5
+    TYPE_ON = 6
+    TYPE_OFF = 7
+    LOCATION_ON = 8
+    LOCATION_OFF = 9
+
+
+# Kind of target each group, type or location opcode writes.
+TARGET_KINDS = {
+    RuleOp.GROUP_ON: "group",
+    RuleOp.GROUP_OFF: "group",
+    RuleOp.TYPE_ON: "type",
+    RuleOp.TYPE_OFF: "type",
+    RuleOp.LOCATION_ON: "location",
+    RuleOp.LOCATION_OFF: "location",
+}
+
+
+class CompiledRule:     # A rule reduced to one opcode and an already resolved target.
+
+    __slots__ = ("op", "target", "argument")
+
+    def __init__(self, op: RuleOp, target, argument=None):
+        self.op = op
+        self.target = target        # Device handle, or group/type/location name.
+        self.argument = argument    # Power level for SET_POWER_LEVEL.
+
+    def targets_device(self) -> bool:
+        return self.op <= RuleOp.SET_POWER_LEVEL
+
+    def target_key(self):   # The state this rule writes. A device's on/off state and its power level are separate targets.
+        if self.op == RuleOp.SET_POWER_LEVEL:
+            return ("level", self.target)
+        if self.targets_device():
+            return ("state", self.target)
+        return (TARGET_KINDS[self.op], self.target)
+
+    def overrides(self) -> bool:    # Whether the result is independent of the state before it ran. Flips are not.
+        return self.op != RuleOp.FLIP
+
+    def __repr__(self):
+        return f"CompiledRule(op={self.op.name}, target={self.target!r}, argument={self.argument})"
+
+
+class RuleCache:    # Bounded LRU of compiled rules keyed by their normalized rule string.
+    def __init__(self, capacity=1024):
+        if capacity <= 0:
+            raise ValueError("Capacity must be positive")
+        self.capacity = capacity
+        self.entries = OrderedDict()    # Normalized string -> CompiledRule, least recently used first.
+        self.by_device = {}             # Device -> keys of entries targeting it, for invalidation.
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def normalize(rule_string):     # Rule tokens are case-insensitive and whitespace separated.
+        return " ".join(rule_string.split()).casefold()
+
+    def _forget(self, key, compiled):
+        if not compiled.targets_device():
+            return
+        keys = self.by_device.get(compiled.target)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self.by_device[compiled.target]
+
+    def get(self, key):
+        with self.lock:
+            compiled = self.entries.get(key)
+            if compiled is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return compiled
+
+    def put(self, key, compiled):
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self._forget(key, old)
+            self.entries[key] = compiled
+            if compiled.targets_device():
+                self.by_device.setdefault(compiled.target, set()).add(key)
+            if len(self.entries) > self.capacity:
+                evicted_key, evicted = self.entries.popitem(last=False)
+                self._forget(evicted_key, evicted)
+
+    def invalidate(self, device):   # Drops every entry that resolved to the device.
+        with self.lock:
+            for key in self.by_device.pop(device, ()):
+                self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.by_device.clear()
+
+    def get_size(self):
+        with self.lock:
+            return len(self.entries)
+
+    def __len__(self):
+        return self.get_size()
@@ -0,0 +1,151 @@
+import operator
+import threading
+
+import numpy as np
+
+COMPARISONS = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+# Attribute keys a condition rule can read:
+#   ("location", location name, "temperature" | "people")
+#   ("device", device, DeviceTable column name)
+#   ("home", "power" | "threshold")
+
+
+class ConditionRule:    # Runs its action when its condition goes from false to true.
+
+    __slots__ = ("rule_id", "reads", "condition", "action", "active")
+
+    def __init__(self, rule_id, reads, condition, action):
+        self.rule_id = rule_id
+        self.reads = tuple(reads)       # Attribute keys the condition depends on.
+        self.condition = condition      # Called with no arguments, returns a bool.
+        self.action = action            # CompiledRule queued when the condition becomes true.
+        self.active = False             # Result of the last evaluation.
+
+    def __repr__(self):
+        return f"ConditionRule(id={self.rule_id}, reads={self.reads}, action={self.action})"
+
+
+class ConditionIndex:   # Maps every watched attribute to the rules reading it, and finds the attributes that changed.
+    def __init__(self, table, read_scalar):
+        self.table = table                  # DeviceTable the device attributes are read from.
+        self.read_scalar = read_scalar      # Reads the current value of a location or home key.
+        self.rules = {}                     # Rule ID -> ConditionRule
+        self.dependents = {}                # Attribute key -> IDs of the rules reading it.
+        self.scalar_values = {}             # Location or home key -> last value seen.
+        self.device_watches = {}            # Column -> watched devices, as an insertion ordered set.
+        self.device_arrays = {}             # Column -> (devices, rows, last values)
+        self.stale_columns = set()          # Columns whose arrays must be rebuilt because their watches changed.
+        self.pending = set()                # Rules to evaluate on the next pass whatever their inputs do.
+        self.next_id = 1
+        self.lock = threading.Lock()
+
+    def add(self, reads, condition, action) -> ConditionRule:
+        with self.lock:
+            rule = ConditionRule(self.next_id, reads, condition, action)
+            self.next_id += 1
+            self.rules[rule.rule_id] = rule
+            for key in rule.reads:
+                if key not in self.dependents:
+                    self.dependents[key] = set()
+                    if key[0] == "device":
+                        self.device_watches.setdefault(key[2], {})[key[1]] = None
+                        self.stale_columns.add(key[2])
+                    else:
+                        self.scalar_values[key] = self.read_scalar(key)
+                self.dependents[key].add(rule.rule_id)
+            self.pending.add(rule.rule_id)
+            return rule
+
+    def remove(self, rule_id) -> bool:
+        with self.lock:
+            return self._remove(rule_id)
+
+    def _remove(self, rule_id) -> bool:
+        rule = self.rules.pop(rule_id, None)
+        if rule is None:
+            return False
+        self.pending.discard(rule_id)
+        for key in rule.reads:
+            dependents = self.dependents.get(key)
+            if dependents is None:
+                continue
+            dependents.discard(rule_id)
+            if dependents:
+                continue
+            del self.dependents[key]
+            if key[0] == "device":
+                watches = self.device_watches[key[2]]
+                del watches[key[1]]
+                if not watches:
+                    del self.device_watches[key[2]]
+                    self.device_arrays.pop(key[2], None)
+                self.stale_columns.add(key[2])
+            else:
+                self.scalar_values.pop(key, None)
+        return True
+
+    def remove_device(self, device) -> int:     # Drops every rule reading the device or acting on it.
+        with self.lock:
+            stale = [
+                rule_id for rule_id, rule in self.rules.items()
+                if rule.action.target is device or any(key[0] == "device" and key[1] is device for key in rule.reads)
+            ]
+            for rule_id in stale:
+                self._remove(rule_id)
+            return len(stale)
+
+    def _device_array(self, column):
+        arrays = self.device_arrays.get(column)
+        if arrays is None or column in self.stale_columns:
+            self.stale_columns.discard(column)
+            devices = list(self.device_watches[column])
+            rows = np.fromiter((device.get_row() for device in devices), dtype=np.int64, count=len(devices))
+            last = getattr(self.table, column)[rows].copy()
+            if arrays is not None:
+                # Devices that were already watched keep their last value, so a change
+                # made before the rebuild is still reported.
+                previous = dict(zip(arrays[0], arrays[2].tolist()))
+                for index, device in enumerate(devices):
+                    if device in previous:
+                        last[index] = previous[device]
+            arrays = (devices, rows, last)
+            self.device_arrays[column] = arrays
+        return arrays
+
+    def changed_rules(self) -> list[ConditionRule]:     # Rules with at least one input that changed since the last call.
+        with self.lock:
+            changed = set(self.pending)
+            self.pending.clear()
+
+            for key, last in self.scalar_values.items():
+                value = self.read_scalar(key)
+                if value != last:
+                    self.scalar_values[key] = value
+                    changed.update(self.dependents.get(key, ()))
+
+            # Device inputs are compared one column at a time, so a quiet tick costs a
+            # few array comparisons however many rules there are.
+            for column in self.device_watches:
+                devices, rows, last = self._device_array(column)
+                current = getattr(self.table, column)[rows]
+                moved = np.flatnonzero(current != last)
+                last[moved] = current[moved]
+                for index in moved.tolist():
+                    changed.update(self.dependents.get(("device", devices[index], column), ()))
+
+            return [self.rules[rule_id] for rule_id in sorted(changed)]
+
+    def get_size(self):
+        with self.lock:
+            return len(self.rules)
+
+    def __len__(self):
+        return self.get_size()
@@ -0,0 +1,102 @@
+import asyncio
+import math
+import threading
+import time
+
+# What a FixedRateTicker does when a run ends after the next deadline:
+#   skip      drop the missed deadlines and resume on the original grid
+#   catch_up  run the missed deadlines back to back, at most max_catch_up of them
+#   stretch   start a new grid one period after the late run ended
+OVERRUN_POLICIES = ("skip", "catch_up", "stretch")
+
+
+class FixedRateTicker:      # Runs a task on absolute deadlines start + k * period, so timing error never accumulates.
+    def __init__(self, period, task, policy="skip", max_catch_up=10, clock=time.monotonic):
+        if period <= 0:
+            raise ValueError("Period must be positive")
+        if policy not in OVERRUN_POLICIES:
+            raise ValueError(f"Unknown overrun policy {policy}, expected one of {OVERRUN_POLICIES}")
+        self.period = period
+        self.task = task
+        self.policy = policy
+        self.max_catch_up = max_catch_up
+        self.clock = clock
+        self.stopped = threading.Event()
+        self.lock = threading.Lock()
+
+        self.ticks = 0          # Runs of the task.
+        self.overruns = 0       # Runs that ended after the next deadline.
+        self.missed = 0         # Deadlines that never got a run.
+        self.last_lag = 0.0     # How late the most recent run started, in seconds.
+        self.max_lag = 0.0
+        self.total_lag = 0.0
+
+    def run(self):      # Blocks until stop is called. Meant to be the body of a worker thread.
+        deadline = self.clock() + self.period
+        while not self.stopped.is_set():
+            delay = deadline - self.clock()
+            if delay > 0 and self.stopped.wait(delay):
+                return
+            self._record_start(max(0.0, self.clock() - deadline))   # Measured after the wait, so wake-up jitter counts.
+            self.task()
+            deadline = self._next_deadline(deadline, self.clock())
+
+    async def run_async(self, first_delay=None):
+        # Same schedule as run, as a task on an event loop. Ends on stop or when the task
+        # is cancelled. first_delay shifts the grid, so tickers started together can be spread out.
+        deadline = self.clock() + (self.period if first_delay is None else first_delay)
+        while not self.stopped.is_set():
+            delay = deadline - self.clock()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                if self.stopped.is_set():
+                    return
+            self._record_start(max(0.0, self.clock() - deadline))   # Includes time the loop was too busy to resume the task.
+            self.task()
+            deadline = self._next_deadline(deadline, self.clock())
+
+    def _record_start(self, lag):
+        with self.lock:
+            self.ticks += 1
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            self.total_lag += lag
+
+    def _next_deadline(self, deadline, now):
+        deadline += self.period
+        if now < deadline:
+            return deadline
+        behind = math.floor((now - deadline) / self.period) + 1     # Deadlines at or before now.
+        with self.lock:
+            self.overruns += 1
+            if self.policy == "skip":
+                self.missed += behind
+                return deadline + behind * self.period
+            if self.policy == "stretch":
+                self.missed += behind
+                return now + self.period
+            # catch_up: run now and keep the grid, unless the backlog grew too large.
+            if behind > self.max_catch_up:
+                skipped = behind - self.max_catch_up
+                self.missed += skipped
+                deadline += skipped * self.period
+            return deadline
+
+    def stop(self):
+        self.stopped.set()
+
+    def is_running(self):
+        return not self.stopped.is_set()
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return {
+                "period": self.period,
+                "policy": self.policy,
+                "ticks": self.ticks,
+                "overruns": self.overruns,
+                "missed": self.missed,
+                "last_lag": self.last_lag,
+                "max_lag": self.max_lag,
+                "mean_lag": self.total_lag / self.ticks if self.ticks else 0.0,
+            }
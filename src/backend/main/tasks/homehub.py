@@ -0,0 +1,141 @@
+import asyncio
+import threading
+import zlib
+
+from ..tasks.SmartHome import SmartHome
+
+
+class HomeHub:      # Runs many homes on a fixed set of worker threads, each driving one event loop.
+    def __init__(self, workers=4, rule_quantum=256):
+        if workers < 1:
+            raise ValueError("A hub needs at least one worker")
+        self.workers = workers
+        self.rule_quantum = rule_quantum    # Rules a home applies before the other homes on its worker get a turn.
+        self.homes = {}         # Home ID -> SmartHome
+        self.shard_sizes = [0] * workers
+        self.loops = []
+        self.threads = []
+        self.running = False
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _hash(home_id):     # Stable across processes, unlike hash() on strings.
+        return zlib.crc32(str(home_id).encode())
+
+    def shard_of(self, home_id) -> int:
+        return self._hash(home_id) % self.workers
+
+    def _phase(self, home_id, period):
+        # Spreads the homes of a worker over the period, so their ticks don't all land at once.
+        return (self._hash(home_id) // self.workers % 1000) / 1000 * period
+
+    def _run_loop(self, loop):
+        asyncio.set_event_loop(loop)
+        try:
+            loop.run_forever()
+            # Let the homes' cancelled tasks finish before the loop closes.
+            tasks = asyncio.all_tasks(loop)
+            for task in tasks:
+                task.cancel()
+            loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            loop.run_until_complete(loop.shutdown_asyncgens())
+        finally:
+            loop.close()
+
+    def _start_home(self, home_id, home):
+        home.start(self.loops[self.shard_of(home_id)], self._phase(home_id, home.TICK_INTERVAL))
+
+    def start(self):
+        with self.lock:
+            if self.running:
+                return
+            self.loops = [asyncio.new_event_loop() for _ in range(self.workers)]
+            self.threads = [
+                threading.Thread(target=self._run_loop, args=(loop,), name=f"HomeHub-{index}", daemon=True)
+                for index, loop in enumerate(self.loops)
+            ]
+            for thread in self.threads:
+                thread.start()
+            self.running = True
+            for home_id, home in self.homes.items():
+                self._start_home(home_id, home)
+
+    def stop(self, timeout=None):   # Stops every home, then the workers. Homes stay registered and restart with start.
+        with self.lock:
+            if not self.running:
+                return
+            self.running = False
+            for home in self.homes.values():
+                home.stop()
+            for loop in self.loops:
+                loop.call_soon_threadsafe(loop.stop)
+            threads = self.threads
+        for thread in threads:
+            thread.join(timeout)
+
+    def is_running(self):
+        return self.running
+
+    def register(self, home_id, home: SmartHome) -> int:    # Adds a home and returns its worker. Started right away when the hub runs.
+        if home.asyncRuntime is None:
+            raise ValueError('Homes run by a hub need runtime="asyncio"')
+        if home.isRunning():
+            raise ValueError(f"Home {home_id} is already running")
+        shard = self.shard_of(home_id)
+        with self.lock:
+            if home_id in self.homes:
+                raise ValueError(f"Home {home_id} is already registered")
+            self.homes[home_id] = home
+            self.shard_sizes[shard] += 1
+            home.asyncRuntime.rule_quantum = self.rule_quantum
+            if self.running:
+                self._start_home(home_id, home)
+        return shard
+
+    def create_home(self, home_id, threshold: float, ideal_temp: int, simulate: bool, **kwargs) -> SmartHome:
+        # Homes made here log to their own child loggers and leave the process-wide
+        # logging configuration to the application.
+        home = SmartHome(
+            threshold,
+            ideal_temp,
+            simulate,
+            homeId=home_id,
+            runtime="asyncio",
+            configureLogging=False,
+            autoStart=False,
+            **kwargs,
+        )
+        self.register(home_id, home)
+        return home
+
+    def unregister(self, home_id) -> SmartHome | None:     # Stops the home, releases its loggers and hands it back.
+        with self.lock:
+            home = self.homes.pop(home_id, None)
+            if home is None:
+                return None
+            self.shard_sizes[self.shard_of(home_id)] -= 1
+        home.stop()
+        home.releaseLoggers()
+        return home
+
+    def get_home(self, home_id) -> SmartHome | None:
+        return self.homes.get(home_id)
+
+    def get_size(self):
+        return len(self.homes)
+
+    def __len__(self):
+        return self.get_size()
+
+    def get_stats(self) -> dict:
+        # Tick lag per worker shows when a worker has more homes than its loop can tick on time.
+        with self.lock:
+            homes = list(self.homes.items())
+            shards = [{"homes": size, "ticks": 0, "missed_ticks": 0, "max_tick_lag": 0.0} for size in self.shard_sizes]
+        for home_id, home in homes:
+            tick = home.tickTicker.get_stats()
+            shard = shards[self.shard_of(home_id)]
+            shard["ticks"] += tick["ticks"]
+            shard["missed_ticks"] += tick["missed"]
+            shard["max_tick_lag"] = max(shard["max_tick_lag"], tick["max_lag"])
+        return {"workers": self.workers, "homes": len(homes), "running": self.running, "shards": shards}
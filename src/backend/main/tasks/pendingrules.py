@@ -0,0 +1,125 @@
+import threading
+import time
+from collections import deque
+
+from ..datastructures.linkedlist import LinkedList
+
+
+class PendingRules:     # FIFO of rules waiting to run, indexed by the state each rule writes.
+    def __init__(self):
+        self.rules = LinkedList()       # (rule, time.perf_counter() when it was added, target key) triples.
+        self.by_target = {}     # Target key -> deque of node handles of the pending rules writing it, oldest first.
+        self.queued = 0         # Rules ever added.
+        self.coalesced = 0      # Rules dropped because a later rule overwrote the same target.
+        self.cancelled = 0      # Rules dropped through cancel.
+        self.lock = threading.Lock()
+        self.arrived = threading.Condition(self.lock)     # Notified whenever a rule is added.
+        self.arrival_listeners = []     # Called after every add, for waiters that are not threads.
+        self.generation = 0     # Bumped by close. A wait for an older generation returns at once.
+
+    def _drop(self, key):
+        dropped = 0
+        for node in self.by_target.pop(key, ()):
+            if self.rules.remove_node(node) is not None:
+                dropped += 1
+        return dropped
+
+    def add(self, rule, key=None, overrides=True):
+        # A rule that overrides its target supersedes every pending rule for the same
+        # target. Rules without a key, and rules that depend on the current state
+        # (flips), are queued without dropping anything.
+        with self.lock:
+            if key is not None and overrides:
+                self.coalesced += self._drop(key)
+            node = self.rules.add_end((rule, time.perf_counter(), key))
+            if key is not None:
+                self.by_target.setdefault(key, deque()).append(node)
+            self.queued += 1
+            self.arrived.notify_all()
+        self._notify_listeners()
+        return node
+
+    def add_front(self, rule):  # Immediate rules run before everything pending, so they never supersede anything.
+        with self.lock:
+            self.queued += 1
+            node = self.rules.add_front((rule, time.perf_counter(), None))
+            self.arrived.notify_all()
+        self._notify_listeners()
+        return node
+
+    def add_arrival_listener(self, listener):
+        self.arrival_listeners.append(listener)
+
+    def remove_arrival_listener(self, listener):
+        self.arrival_listeners.remove(listener)
+
+    def _notify_listeners(self):
+        for listener in self.arrival_listeners:
+            listener()
+
+    def cancel(self, key) -> int:   # Drops every pending rule for the target.
+        with self.lock:
+            dropped = self._drop(key)
+            self.cancelled += dropped
+            return dropped
+
+    def wait(self, timeout=None, batch_window=0.0, max_batch=None, generation=None) -> bool:
+        # Blocks until a rule is pending or the timeout passes. With a batch window the
+        # wait continues for up to that long after the first arrival, or until max_batch
+        # rules are pending, so a burst is drained as one batch. Returns whether rules are
+        # pending, and False once the queue has been closed since generation, which
+        # defaults to the current one.
+        with self.lock:
+            if generation is None:
+                generation = self.generation
+            closed = lambda: self.generation != generation
+            if not self.arrived.wait_for(lambda: closed() or self.rules.get_size() > 0, timeout) or closed():
+                return False
+            if batch_window > 0:
+                deadline = time.perf_counter() + batch_window
+                while not closed() and (max_batch is None or self.rules.get_size() < max_batch):
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    self.arrived.wait(remaining)
+            return True
+
+    def close(self):    # Releases every wait started before it, for good. Rules can still be added and drained.
+        with self.lock:
+            self.generation += 1
+            self.arrived.notify_all()
+
+    def drain(self, limit=None):    # Takes the pending (rule, enqueue time) pairs in one lock round-trip, oldest first, at most limit of them.
+        with self.lock:
+            if limit is None or limit >= self.rules.get_size():
+                self.by_target.clear()
+                return ((rule, enqueued) for rule, enqueued, _ in self.rules.drain())
+            taken = []
+            for _ in range(limit):
+                rule, enqueued, key = self.rules.remove_front()
+                if key is not None:
+                    # Rules leave from the front, so the taken rule is the oldest one for its key.
+                    nodes = self.by_target[key]
+                    nodes.popleft()
+                    if not nodes:
+                        del self.by_target[key]
+                taken.append((rule, enqueued))
+            return taken
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return {
+                "pending": self.rules.get_size(),
+                "queued": self.queued,
+                "coalesced": self.coalesced,
+                "cancelled": self.cancelled,
+            }
+
+    def get_size(self):
+        return self.rules.get_size()
+
+    def __len__(self):
+        return self.get_size()
+
+    def __iter__(self):
+        return (rule for rule, _, _ in self.rules)
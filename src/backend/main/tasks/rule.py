@@ -1,5 +1,5 @@
 class Rule:
-    def __init__(self, deviceId, flipState, turnOn, turnOff, setPowerLevel, powerLevel, groupName, turnGroupOff, turnGroupOn, typeName, turnTypeOff, turnTypeOn, locationName, turnLocationOff, turnLocationOn):
+    def __init__(self, deviceId=-1, flipState=False, turnOn=False, turnOff=False, setPowerLevel=False, powerLevel=0, groupName="", turnGroupOff=False, turnGroupOn=False, typeName="", turnTypeOff=False, turnTypeOn=False, locationName="", turnLocationOff=False, turnLocationOn=False):
         self.__deviceId = deviceId
         self.__flipState = flipState
         self.__turnOn = turnOn
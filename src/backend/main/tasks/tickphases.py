@@ -0,0 +1,95 @@
+import threading
+import time
+
+
+class TickPhase:    # One step of the tick. Runs on ticks where (tick - offset) is a multiple of period.
+
+    __slots__ = ("name", "function", "period", "offset", "priority", "enabled", "runs", "errors", "total_time", "last_time")
+
+    def __init__(self, name, function, period=1, offset=0, priority=0, enabled=True):
+        if period < 1:
+            raise ValueError("Period must be at least one tick")
+        self.name = name
+        self.function = function
+        self.period = period        # In ticks.
+        self.offset = offset        # In ticks.
+        self.priority = priority    # Lower runs first within a tick.
+        self.enabled = enabled
+        self.runs = 0
+        self.errors = 0
+        self.total_time = 0.0
+        self.last_time = 0.0
+
+    def is_due(self, tick):
+        return self.enabled and tick >= self.offset and (tick - self.offset) % self.period == 0
+
+
+class PhaseRegistry:    # The phases of a tick, kept sorted by priority.
+    def __init__(self):
+        self.phases = {}        # Name -> TickPhase
+        self.order = []         # Phases sorted by priority, then registration order.
+        self.lock = threading.Lock()
+
+    def _sort(self):
+        self.order = sorted(self.phases.values(), key=lambda phase: phase.priority)
+
+    def register(self, name, function, period=1, offset=0, priority=0, enabled=True) -> TickPhase:    # Replaces a phase with the same name.
+        phase = TickPhase(name, function, period, offset, priority, enabled)
+        with self.lock:
+            self.phases.pop(name, None)
+            self.phases[name] = phase
+            self._sort()
+        return phase
+
+    def unregister(self, name) -> bool:
+        with self.lock:
+            if self.phases.pop(name, None) is None:
+                return False
+            self._sort()
+            return True
+
+    def set_enabled(self, name, enabled):
+        with self.lock:
+            self.phases[name].enabled = enabled
+
+    def set_period(self, name, period, offset=None):
+        if period < 1:
+            raise ValueError("Period must be at least one tick")
+        with self.lock:
+            phase = self.phases[name]
+            phase.period = period
+            if offset is not None:
+                phase.offset = offset
+
+    def due(self, tick) -> list[TickPhase]:
+        with self.lock:
+            return [phase for phase in self.order if phase.is_due(tick)]
+
+    def run(self, tick, on_error=None):     # Runs every phase due on this tick. A failing phase does not stop the others.
+        for phase in self.due(tick):
+            start = time.perf_counter()
+            try:
+                phase.function()
+            except Exception as e:
+                phase.errors += 1
+                if on_error is not None:
+                    on_error(phase, e)
+            phase.last_time = time.perf_counter() - start
+            phase.total_time += phase.last_time
+            phase.runs += 1
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return {
+                phase.name: {
+                    "period": phase.period,
+                    "offset": phase.offset,
+                    "priority": phase.priority,
+                    "enabled": phase.enabled,
+                    "runs": phase.runs,
+                    "errors": phase.errors,
+                    "last_time": phase.last_time,
+                    "mean_time": phase.total_time / phase.runs if phase.runs else 0.0,
+                }
+                for phase in self.order
+            }
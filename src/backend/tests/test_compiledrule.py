@@ -0,0 +1,55 @@
+import pytest
+
+from main.tasks.compiledrule import CompiledRule, RuleCache, RuleOp
+
+
+def test_normalize_ignores_case_and_spacing():
+    assert RuleCache.normalize("  Turn  Lamp\tON ") == "turn lamp on"
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = RuleCache(2)
+    cache.put("a", CompiledRule(RuleOp.GROUP_ON, "LIGHTS"))
+    cache.put("b", CompiledRule(RuleOp.GROUP_OFF, "LIGHTS"))
+    assert cache.get("a") is not None
+    cache.put("c", CompiledRule(RuleOp.TYPE_ON, "OTHERS"))
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert len(cache) == 2 and cache.hits == 3 and cache.misses == 1
+
+
+def test_invalidate_drops_only_the_entries_of_that_device():
+    cache = RuleCache(8)
+    lamp, fan = object(), object()
+    cache.put("turn 1 on", CompiledRule(RuleOp.TURN_ON, lamp))
+    cache.put("set 1 3", CompiledRule(RuleOp.SET_POWER_LEVEL, lamp, 3))
+    cache.put("turn 2 on", CompiledRule(RuleOp.TURN_ON, fan))
+    cache.put("group lights on", CompiledRule(RuleOp.GROUP_ON, "LIGHTS"))
+
+    cache.invalidate(lamp)
+    assert cache.get("turn 1 on") is None and cache.get("set 1 3") is None
+    assert cache.get("turn 2 on").target is fan
+    assert len(cache) == 2 and lamp not in cache.by_device
+
+
+def test_replaced_and_evicted_entries_leave_no_device_keys():
+    cache = RuleCache(1)
+    lamp, fan = object(), object()
+    cache.put("turn 1 on", CompiledRule(RuleOp.TURN_ON, lamp))
+    cache.put("turn 1 on", CompiledRule(RuleOp.TURN_ON, fan))
+    assert set(cache.by_device) == {fan}
+    cache.put("group lights on", CompiledRule(RuleOp.GROUP_ON, "LIGHTS"))
+    assert cache.by_device == {}
+
+
+def test_target_keys_separate_state_level_and_containers():
+    lamp = object()
+    assert CompiledRule(RuleOp.TURN_ON, lamp).target_key() == CompiledRule(RuleOp.FLIP, lamp).target_key() == ("state", lamp)
+    assert CompiledRule(RuleOp.SET_POWER_LEVEL, lamp, 2).target_key() == ("level", lamp)
+    assert CompiledRule(RuleOp.LOCATION_OFF, "KITCHEN").target_key() == ("location", "KITCHEN")
+    assert not CompiledRule(RuleOp.FLIP, lamp).overrides()
+
+
+def test_capacity_must_be_positive():
+    with pytest.raises(ValueError):
+        RuleCache(0)
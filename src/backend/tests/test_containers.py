@@ -0,0 +1,62 @@
+import pytest
+
+from main.datastructures.ngramindex import NGramIndex
+from main.enums.DeviceGroup import DeviceGroup, DeviceGroupEnum
+from main.enums.DeviceType import DeviceType, DeviceTypeEnum
+from main.enums.Devicelocation import DeviceLocation, DeviceLocationEnum
+from main.tasks.SmartHome import SmartHome
+
+CONTAINERS = [DeviceGroup, DeviceType, DeviceLocation]
+
+
+def build_devices(names):
+    home = SmartHome(float("inf"), 22, False, seed=0, autoStart=False)
+    return [home.createDevice(name, DeviceTypeEnum.OTHERS, DeviceGroupEnum.LIGHTS, DeviceLocationEnum.KITCHEN) for name in names]
+
+
+@pytest.mark.parametrize("container_class", CONTAINERS)
+def test_membership_follows_the_device_id(container_class):
+    container = container_class("KITCHEN")
+    first, second, third = build_devices(["lamp", "fan", "heater"])
+    container.add_devices([first, second])
+    container.add_device(third)
+    assert container.get_devices() == [first, second, third] and len(container) == 3
+    assert container.get_device_by_id(second.get_device_id()) is second
+
+    container.remove_device(second)
+    container.remove_device(second)     # Already gone.
+    assert container.get_devices() == [first, third] and len(container) == 2
+    assert not container.contains(second) and container.contains(first)
+    assert container.get_device_by_id(second.get_device_id()) is None
+
+    container.add_device(second)        # Re-added devices go to the end.
+    assert container.get_devices() == [first, third, second]
+
+
+@pytest.mark.parametrize("container_class", CONTAINERS)
+def test_another_device_with_the_same_id_is_not_a_member(container_class):
+    container = container_class("KITCHEN")
+    device, = build_devices(["lamp"])
+    impostor, = build_devices(["lamp"])     # A second home hands out the same first ID.
+    assert impostor.get_device_id() == device.get_device_id()
+    container.add_device(device)
+
+    assert not container.contains(impostor)
+    container.remove_device(impostor)
+    assert container.get_devices() == [device]
+
+
+@pytest.mark.parametrize("container_class", CONTAINERS)
+@pytest.mark.parametrize("indexed", [False, True])
+def test_search_only_returns_members(container_class, indexed):
+    index = NGramIndex() if indexed else None
+    container = container_class("KITCHEN", index)
+    devices = build_devices(["desk lamp", "floor lamp", "lamp", "fan"])
+    if index is not None:
+        index.add_many((device, device.get_device_name()) for device in devices)
+    container.add_devices(devices[1:])
+    container.remove_device(devices[3])
+
+    assert container.search_devices("lamp") == ([devices[2], devices[1]] if indexed else [devices[1], devices[2]])
+    assert container.search_devices("fan") == []
+    assert container.get_device_by_name("desk") is None
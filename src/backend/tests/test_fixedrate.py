@@ -0,0 +1,89 @@
+import asyncio
+import types
+
+import pytest
+
+from main.tasks import fixedrate
+from main.tasks.fixedrate import FixedRateTicker
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def drive(monkeypatch, policy, durations, jitter=0.0, max_catch_up=10):
+    # Runs the ticker on a fake clock. Each run takes the next duration, every sleep
+    # oversleeps by jitter, and the ticker stops after the last duration.
+    clock = FakeClock()
+    starts = []
+
+    def task():
+        starts.append(clock.now)
+        clock.now += durations[len(starts) - 1]
+        if len(starts) == len(durations):
+            ticker.stop()
+
+    async def sleep(delay):
+        clock.now += delay + jitter
+
+    ticker = FixedRateTicker(1.0, task, policy, max_catch_up, clock)
+    monkeypatch.setattr(fixedrate, "asyncio", types.SimpleNamespace(sleep=sleep))
+    asyncio.run(ticker.run_async())
+    return starts, ticker.get_stats()
+
+
+def test_skip_drops_missed_deadlines_and_keeps_the_grid(monkeypatch):
+    starts, stats = drive(monkeypatch, "skip", [0.2, 2.5, 0.2, 0.2])
+    assert starts == pytest.approx([1, 2, 5, 6])
+    assert (stats["overruns"], stats["missed"]) == (1, 2)
+
+
+def test_catch_up_runs_missed_deadlines_back_to_back(monkeypatch):
+    starts, stats = drive(monkeypatch, "catch_up", [0.2, 2.5, 0.2, 0.2])
+    assert starts == pytest.approx([1, 2, 4.5, 4.7])
+    assert (stats["overruns"], stats["missed"]) == (2, 0)
+    assert stats["max_lag"] == pytest.approx(1.5)
+
+
+def test_catch_up_skips_beyond_its_limit(monkeypatch):
+    starts, stats = drive(monkeypatch, "catch_up", [0.2, 2.5, 0.2, 0.2], max_catch_up=1)
+    assert starts == pytest.approx([1, 2, 4.5, 5])
+    assert stats["missed"] == 1
+
+
+def test_stretch_starts_a_new_grid_after_an_overrun(monkeypatch):
+    starts, stats = drive(monkeypatch, "stretch", [0.2, 2.5, 0.2, 0.2])
+    assert starts == pytest.approx([1, 2, 5.5, 6.5])
+    assert (stats["overruns"], stats["missed"]) == (1, 2)
+
+
+def test_lag_includes_oversleeping(monkeypatch):
+    starts, stats = drive(monkeypatch, "skip", [0.0, 0.0, 0.0], jitter=0.05)
+    assert starts == pytest.approx([1.05, 2.05, 3.05])
+    assert stats["last_lag"] == pytest.approx(0.05)
+    assert stats["max_lag"] == pytest.approx(0.05)
+    assert stats["mean_lag"] == pytest.approx(0.05)
+
+
+def test_threaded_lag_includes_oversleeping():
+    # The wait itself oversleeps here: the clock jumps while the ticker is asleep.
+    clock = FakeClock()
+    ticker = None
+
+    def task():
+        ticker.stop()
+
+    ticker = FixedRateTicker(0.01, task, clock=clock)
+    wait = ticker.stopped.wait
+
+    def oversleep(timeout):
+        clock.now += timeout + 0.3
+        return wait(0)
+
+    ticker.stopped.wait = oversleep
+    ticker.run()
+    assert ticker.get_stats()["last_lag"] == pytest.approx(0.3)
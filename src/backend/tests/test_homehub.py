@@ -0,0 +1,30 @@
+import logging
+
+from main.tasks.homehub import HomeHub
+
+
+def registered_loggers(home_id):
+    manager = logging.Logger.manager
+    names = [name for name in manager.loggerDict if name.endswith(f".{home_id}")]
+    held = [
+        logger.name
+        for entry in manager.loggerDict.values()
+        if isinstance(entry, logging.PlaceHolder)
+        for logger in entry.loggerMap
+        if logger.name.endswith(f".{home_id}")
+    ]
+    return names + held
+
+
+def test_unregister_releases_the_home_loggers():
+    hub = HomeHub(workers=2)
+    hub.start()
+    try:
+        for index in range(20):
+            hub.create_home(f"churn{index}", 1000, 22, False)
+        assert len(registered_loggers("churn0")) > 0
+        for index in range(20):
+            hub.unregister(f"churn{index}")
+        assert all(registered_loggers(f"churn{index}") == [] for index in range(20))
+    finally:
+        hub.stop(timeout=5)
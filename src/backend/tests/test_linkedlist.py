@@ -0,0 +1,87 @@
+from main.datastructures.linkedlist import LinkedList
+
+
+def build(values):
+    linked = LinkedList()
+    nodes = [linked.add_end(value) for value in values]
+    return linked, nodes
+
+
+def backwards(linked):
+    values = []
+    node = linked.tail
+    while node:
+        values.append(node.val)
+        node = node.prev
+    return values
+
+
+def test_remove_node_unlinks_in_place():
+    linked, nodes = build([1, 2, 3, 4])
+    assert linked.remove_node(nodes[1]) == 2
+    assert linked.remove_node(nodes[0]) == 1
+    assert linked.remove_node(nodes[3]) == 4
+    assert list(linked) == [3] and backwards(linked) == [3]
+    assert linked.get_size() == 1
+
+
+def test_remove_node_ignores_stale_and_foreign_nodes():
+    linked, nodes = build([1, 2, 3])
+    other, foreign = build([7, 8, 9])
+    linked.remove_node(nodes[1])
+    assert linked.remove_node(nodes[1]) is None
+    assert linked.remove_node(foreign[1]) is None
+    assert linked.remove_node(foreign[0]) is None
+    assert list(linked) == [1, 3] and linked.get_size() == 2
+    assert list(other) == [7, 8, 9] and other.get_size() == 3
+
+
+def test_remove_node_ignores_nodes_of_a_cleared_list():
+    linked, nodes = build([1, 2, 3])
+    linked.clear()
+    kept = linked.add_end(4)
+    assert linked.remove_node(nodes[1]) is None
+    assert list(linked) == [4] and linked.get_size() == 1
+    assert linked.remove_node(kept) == 4
+
+
+def test_reverse_keeps_both_directions_linked():
+    linked, nodes = build([1, 2, 3, 4])
+    linked.reverse()
+    assert list(linked) == [4, 3, 2, 1]
+    assert backwards(linked) == [1, 2, 3, 4]
+    assert linked.remove_node(nodes[2]) == 3
+    assert list(linked) == [4, 2, 1] and backwards(linked) == [1, 2, 4]
+
+
+def test_sort_is_stable_and_keeps_handles():
+    pairs = [(3, "a"), (1, "b"), (3, "c"), (2, "d"), (1, "e")]
+    linked, nodes = build(pairs)
+    linked.sortLL()
+    assert list(linked) == sorted(pairs, key=lambda pair: pair[0])
+    assert backwards(linked) == list(reversed(list(linked)))
+    assert linked.remove_node(nodes[0]) == (3, "a")
+    assert list(linked) == [(1, "b"), (1, "e"), (2, "d"), (3, "c")]
+    assert linked.peek_end() == (3, "c")
+
+
+def test_swap_out_hands_the_nodes_to_the_returned_list():
+    linked, nodes = build([1, 2, 3])
+    detached = linked.swap_out()
+    assert list(linked) == [] and linked.get_size() == 0 and linked.is_empty()
+    assert list(detached) == [1, 2, 3] and detached.get_size() == 3
+    assert linked.remove_node(nodes[1]) is None
+    assert detached.remove_node(nodes[1]) == 2
+    assert list(detached) == [1, 3] and backwards(detached) == [3, 1]
+
+    linked.add_end(4)
+    assert list(linked) == [4] and list(detached) == [1, 3]
+
+
+def test_drain_empties_the_list_once():
+    linked, _ = build([1, 2, 3])
+    drained = linked.drain()
+    linked.add_end(4)
+    assert list(drained) == [1, 2, 3]
+    assert list(linked.drain()) == [4]
+    assert list(linked.drain()) == [] and linked.get_size() == 0
@@ -0,0 +1,55 @@
+import random
+
+from main.datastructures.ngramindex import NGramIndex
+
+
+def expected(keys, order, text, limit=None, accept=None):     # The documented ranking, by checking every key.
+    query = text.casefold()
+    matches = sorted(
+        (key.find(query), len(key), order[item], item)
+        for item, key in keys.items()
+        if query in key and (accept is None or accept(item))
+    )
+    return [match[3] for match in matches][:limit]
+
+
+def test_ranks_exact_then_earlier_then_shorter_then_older():
+    index = NGramIndex()
+    index.add_many([("lamp 10", "Lamp 10"), ("desk lamp", "Desk Lamp"), ("lamp", "lamp"), ("lamp 2", "Lamp 2"), ("old lamp 2", "LAMP 2")])
+    assert index.search("LAMP") == ["lamp", "lamp 2", "old lamp 2", "lamp 10", "desk lamp"]
+    assert index.search("lamp", 2) == ["lamp", "lamp 2"]
+    assert index.search("p 1") == ["lamp 10"]
+    assert index.search("") == [] and index.search("sofa") == []
+
+
+def test_removed_and_renamed_items_are_searched_by_their_new_key():
+    index = NGramIndex()
+    index.add_many([(1, "kitchen light"), (2, "hall light"), (3, "garden light")])
+    index.remove(2)
+    index.update(1, "pantry fan")
+    assert index.search("light") == [3]
+    assert index.search("fan") == [1]
+    index.remove(1)
+    index.remove(3)
+    assert len(index) == 0 and not index.postings and not index.counts and not index.extensions
+
+
+def test_matches_a_full_scan():
+    rng = random.Random(0)
+    index = NGramIndex()
+    keys, order = {}, {}
+    for step in range(400):
+        item = rng.randrange(60)
+        if rng.random() < 0.7:
+            text = "".join(rng.choice("abAB 1") for _ in range(rng.randrange(9)))
+            index.add(item, text)
+            keys[item], order[item] = text.casefold(), step
+        else:
+            index.remove(item)
+            keys.pop(item, None)
+        query = "".join(rng.choice("ab 1") for _ in range(rng.randrange(1, 5)))
+        within = set(rng.sample(range(60), 8))
+        assert index.search(query, 5) == expected(keys, order, query, 5)
+        assert index.search(query, 5, within.__contains__) == expected(keys, order, query, 5, within.__contains__)
+        # A small among is ranked directly and must agree with the index walk.
+        assert index.search(query, 5, within.__contains__, within) == expected(keys, order, query, 5, within.__contains__)
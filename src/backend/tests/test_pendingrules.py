@@ -0,0 +1,122 @@
+import threading
+import time
+
+from main.tasks.pendingrules import PendingRules
+
+
+def rules_of(entries):
+    return [rule for rule, _ in entries]
+
+
+def test_overriding_rules_coalesce_and_flips_queue_up():
+    pending = PendingRules()
+    pending.add("on a", "a")
+    pending.add("flip a", "a", overrides=False)
+    pending.add("on b", "b")
+    pending.add("off a", "a")
+    pending.add("flip a again", "a", overrides=False)
+    pending.add("unkeyed")
+    assert list(pending) == ["on b", "off a", "flip a again", "unkeyed"]
+    assert pending.get_stats()["coalesced"] == 2
+
+
+def test_cancel_drops_every_rule_for_the_target():
+    pending = PendingRules()
+    pending.add("on a", "a")
+    pending.add("flip a", "a", overrides=False)
+    pending.add("on b", "b")
+    assert pending.cancel("a") == 2
+    assert pending.cancel("a") == 0
+    assert list(pending) == ["on b"]
+    assert pending.get_stats()["cancelled"] == 2
+
+
+def test_immediate_rules_run_first_and_supersede_nothing():
+    pending = PendingRules()
+    pending.add("on a", "a")
+    pending.add_front("now")
+    assert rules_of(pending.drain()) == ["now", "on a"]
+
+
+def test_limited_drain_takes_the_oldest_rules():
+    pending = PendingRules()
+    for index in range(5):
+        pending.add(f"rule {index}", index)
+    assert rules_of(pending.drain(2)) == ["rule 0", "rule 1"]
+    assert rules_of(pending.drain(10)) == ["rule 2", "rule 3", "rule 4"]
+    assert pending.get_size() == 0
+
+
+def test_limited_drain_forgets_the_taken_rules():
+    pending = PendingRules()
+    pending.add("first", "first")
+    for index in range(1000):     # One rule always stays behind, so every drain is a partial one.
+        pending.add(f"flip {index}", ("state", index % 3), overrides=False)
+        pending.add(f"on {index}", ("state", "other", index))
+        pending.drain(2)
+    assert pending.get_size() == 1
+    assert sum(len(nodes) for nodes in pending.by_target.values()) == 1
+    pending.drain()
+    pending.add("flip", "a", overrides=False)
+    pending.add("flip", "a", overrides=False)
+    pending.add("on b", "b")
+    pending.drain(1)
+    # The flip left behind is still cancellable, the taken one is not counted again.
+    assert pending.cancel("a") == 1
+    assert list(pending) == ["on b"]
+
+
+def wait_in_thread(pending, **kwargs):
+    result = []
+    thread = threading.Thread(target=lambda: result.append(pending.wait(**kwargs)))
+    thread.start()
+    return thread, result
+
+
+def test_wait_returns_as_soon_as_a_rule_arrives():
+    pending = PendingRules()
+    assert not pending.wait(timeout=0.01)
+    thread, result = wait_in_thread(pending, timeout=10)
+    time.sleep(0.05)
+    assert result == []
+    started = time.perf_counter()
+    pending.add("on a", "a")
+    thread.join(10)
+    assert result == [True] and time.perf_counter() - started < 5
+    assert pending.wait(timeout=0)     # Rules are pending, so no waiting at all.
+
+
+def test_batch_window_waits_for_a_full_batch():
+    pending = PendingRules()
+    thread, result = wait_in_thread(pending, timeout=10, batch_window=10, max_batch=3)
+    for index in range(3):
+        pending.add(f"rule {index}", index)
+        time.sleep(0.01)
+    thread.join(5)
+    assert result == [True] and pending.get_size() == 3
+
+
+def test_close_releases_waits_for_good():
+    pending = PendingRules()
+    generation = pending.generation
+    thread, result = wait_in_thread(pending, timeout=10)
+    time.sleep(0.05)
+    pending.close()
+    thread.join(5)
+    assert result == [False]
+    pending.add("on a", "a")
+    assert not pending.wait(timeout=0, generation=generation)
+    assert pending.wait(timeout=0)
+    assert rules_of(pending.drain()) == ["on a"]
+
+
+def test_arrival_listeners_hear_every_rule():
+    pending = PendingRules()
+    heard = []
+    listener = lambda: heard.append(pending.get_size())
+    pending.add_arrival_listener(listener)
+    pending.add("on a", "a")
+    pending.add_front("now")
+    pending.remove_arrival_listener(listener)
+    pending.add("on b", "b")
+    assert heard == [1, 2]
@@ -0,0 +1,73 @@
+import random
+
+from main.datastructures.priorityqueue import OffsetPriorityQueue, Task
+
+
+def drain(queue):     # Effective priorities in dequeue order.
+    priorities = []
+    while not queue.isEmpty():
+        priorities.append(queue.getPriority(queue.peek().getTask()))
+        queue.dequeue()
+    return priorities
+
+
+def test_offset_shifts_every_task_of_its_bucket():
+    queue = OffsetPriorityQueue(lambda name: name[0])
+    queue.enqueueMany([Task("a1", 5), Task("a2", 7), Task("b1", 6)])
+    assert queue.peek().getTask() == "a1"
+
+    queue.setOffset("a", 10)
+    assert queue.getPriority("a1") == 15 and queue.getPriority("a2") == 17
+    assert queue.peek().getTask() == "b1"
+
+    queue.setOffset("a", 0)
+    assert [queue.dequeue().getTask() for _ in range(3)] == ["a1", "b1", "a2"]
+    assert queue.dequeue() is None
+
+
+def test_offset_of_an_empty_bucket_applies_to_later_tasks():
+    queue = OffsetPriorityQueue(lambda name: name[0])
+    queue.setOffset("a", 20)
+    queue.enqueue(Task("a1", 1))
+    queue.enqueue(Task("b1", 5))
+    assert queue.getPriority("a1") == 21
+    assert queue.peek().getTask() == "b1"
+
+
+def test_matches_a_brute_force_model():
+    rng = random.Random(0)
+    queue = OffsetPriorityQueue(lambda name: name % 4)
+    base, offsets = {}, {}
+    for _ in range(2000):
+        action = rng.random()
+        if action < 0.4:
+            name = rng.randrange(50)
+            base[name] = rng.randrange(100)
+            queue.enqueue(Task(name, base[name]))
+        elif action < 0.55:
+            names = rng.sample(range(50), 5)
+            for name in names:
+                base[name] = rng.randrange(100)
+            queue.enqueueMany([Task(name, base[name]) for name in names])
+        elif action < 0.7:
+            bucket = rng.randrange(4)
+            offsets[bucket] = rng.randrange(-50, 50)
+            queue.setOffset(bucket, offsets[bucket])
+        elif action < 0.8 and base:
+            name = rng.choice(list(base))
+            base[name] = rng.randrange(100)
+            queue.updatePriority(Task(name, 0), base[name])
+        elif action < 0.9 and base:
+            name = rng.choice(list(base))
+            del base[name]
+            queue.removeTaskT(name)
+        elif base:
+            name = queue.dequeue().getTask()
+            effective = {content: priority + offsets.get(content % 4, 0) for content, priority in base.items()}
+            assert effective[name] == min(effective.values())
+            del base[name]
+        assert queue.size() == len(base)
+
+    for name, priority in base.items():
+        assert queue.getPriority(name) == priority + offsets.get(name % 4, 0)
+    assert drain(queue) == sorted(priority + offsets.get(name % 4, 0) for name, priority in base.items())
@@ -0,0 +1,60 @@
+import pytest
+
+from main.datastructures.ringbuffer import RingBuffer
+
+
+def fill(buffer, values):
+    return [buffer.append(value) for value in values]
+
+
+def test_append_evicts_the_oldest_entry_once_full():
+    buffer = RingBuffer(3)
+    assert fill(buffer, "abcde") == [0, 1, 2, 3, 4]
+    assert buffer.to_list() == ["c", "d", "e"]
+    assert len(buffer) == 3
+
+
+def test_read_since_resumes_from_the_returned_cursor():
+    buffer = RingBuffer(4)
+    fill(buffer, "ab")
+    entries, cursor = buffer.read_since(0)
+    assert entries == ["a", "b"] and cursor == 2
+
+    fill(buffer, "cde")
+    assert buffer.read_since(cursor, limit=2) == (["c", "d"], 4)
+    assert buffer.read_since(4) == (["e"], 5)
+    assert buffer.read_since(5) == ([], 5)
+
+
+def test_read_since_skips_entries_evicted_past_the_cursor():
+    buffer = RingBuffer(3)
+    fill(buffer, "ab")
+    _, cursor = buffer.read_since(0)
+    fill(buffer, "cdefgh")     # Overwrites the buffer twice over since the last read.
+    entries, cursor = buffer.read_since(cursor)
+    assert entries == ["f", "g", "h"] and cursor == 8
+    assert buffer.read_since(cursor, limit=10) == ([], 8)
+
+
+def test_cursor_past_the_end_is_kept():
+    buffer = RingBuffer(3)
+    fill(buffer, "ab")
+    assert buffer.read_since(7) == ([], 7)
+    fill(buffer, "cdefgh")
+    assert buffer.read_since(7) == (["h"], 8)
+
+
+def test_clear_keeps_counting_sequence_numbers():
+    buffer = RingBuffer(3)
+    fill(buffer, "ab")
+    _, cursor = buffer.read_since(0)
+    fill(buffer, "c")
+    buffer.clear()
+    assert len(buffer) == 0 and buffer.to_list() == []
+    assert buffer.append("d") == 3
+    assert buffer.read_since(cursor) == (["d"], 4)
+
+
+def test_capacity_must_be_positive():
+    with pytest.raises(ValueError):
+        RingBuffer(0)
@@ -0,0 +1,552 @@
+import asyncio
+import collections
+import logging
+import random
+import threading
+import time
+
+import pytest
+
+from main.devices.AirConditioner import AirConditioner
+from main.enums.DeviceGroup import DeviceGroupEnum
+from main.enums.DeviceType import DeviceTypeEnum
+from main.enums.Devicelocation import DeviceLocationEnum
+from main.misc.RuleParsingException import RuleParsingException
+from main.tasks.SmartHome import SmartHome
+from main.tasks.compiledrule import RuleCache, RuleOp
+
+
+def build_home(threshold, devices=4):
+    home = SmartHome(threshold, 22, False, seed=0, autoStart=False)
+    home.addDevices(
+        home.createDevice(f"device{index}", DeviceTypeEnum.OTHERS, DeviceGroupEnum.LIGHTS, DeviceLocationEnum.KITCHEN, True, 0.0, 100.0, 0, 3)
+        for index in range(devices)
+    )
+    return home
+
+
+def test_removed_device_is_not_turned_back_on():
+    home = build_home(0)
+    while home.turnBackOnDevices.size() == 0:
+        home.checkPowerConsumption()
+    device = home.turnBackOnDevices.peek().task
+
+    home.removeDevice(device)
+    assert home.turnBackOnDevices.getTaskT(device) is None
+
+    home.threshold = float("inf")
+    for _ in range(4):
+        home.checkPowerConsumption()
+    assert device not in home.poweredOnDevices
+    assert home.deviceQueue.getTaskT(device) is None
+
+
+def test_created_device_counts_only_once_added():
+    home = SmartHome(float("inf"), 22, False, seed=0, autoStart=False)
+    device = home.createDevice("lamp", DeviceTypeEnum.OTHERS, DeviceGroupEnum.LIGHTS, DeviceLocationEnum.KITCHEN, True, 0.0, 100.0)
+    assert home.getPowerConsumption() == 0
+
+    home.addDevice(device)
+    assert home.deviceTable.check_totals() == 0
+    assert device.get_table() is home.deviceTable
+
+
+def test_removed_device_frees_its_row():
+    home = build_home(float("inf"))
+    device = home.getDeviceByName("device0")
+
+    home.removeDevice(device)
+    assert len(home.deviceTable) == 3
+    assert device.get_table() is not home.deviceTable
+    assert device.deviceName == "device0"
+    assert home.deviceTable.check_totals() == 0
+
+
+def test_created_device_keeps_its_battery_level():
+    home = SmartHome(float("inf"), 22, False, seed=0, autoStart=False)
+    device = home.createDevice("remote", DeviceTypeEnum.OTHERS, DeviceGroupEnum.LIGHTS, DeviceLocationEnum.KITCHEN, True, 15.0, 1.0, 1000)
+    home.addDevice(device)
+    assert device.get_current_battery_capacity() == 150
+
+    home.reduceBatteryTick()
+    assert device.get_battery_level() == 14
+
+
+def test_restart_leaves_one_set_of_worker_threads():
+    baseline = threading.active_count()
+    home = SmartHome(float("inf"), 22, False, seed=0, configureLogging=False)
+    for _ in range(5):
+        home.stop()
+        home.start()
+    time.sleep(0.5)
+    assert threading.active_count() - baseline == 4    # Tick, log, rule executor and scheduled rules.
+
+    home.stop()
+    deadline = time.time() + 5
+    while threading.active_count() > baseline and time.time() < deadline:
+        time.sleep(0.05)
+    assert threading.active_count() == baseline
+
+
+def test_asyncio_runtime_without_a_loop_asks_for_one():
+    with pytest.raises(RuntimeError, match="autoStart=False"):
+        SmartHome(float("inf"), 22, False, runtime="asyncio", configureLogging=False)
+
+    home = SmartHome(float("inf"), 22, False, runtime="asyncio", configureLogging=False, autoStart=False)
+
+    async def run():
+        home.start()
+        await asyncio.sleep(0)
+        assert home.isRunning()
+        home.stop()
+        await home.asyncRuntime.wait_closed()
+
+    asyncio.run(run())
+    assert not home.isRunning()
+
+
+def test_check_totals_catches_subtotal_drift():
+    home = build_home(float("inf"))
+    table = home.deviceTable
+    assert table.check_totals() == 0
+
+    location = next(iter(table.location_draw))
+    table.location_draw[location] += 5
+    assert table.check_totals() == 5
+    table.recompute_totals()
+
+    table.total_base -= 2
+    assert table.check_totals() == 2
+
+
+def build_mixed_home(on):     # Every type, group and location, with some devices at power level 0.
+    home = SmartHome(float("inf"), 22, False, seed=0, autoStart=False)
+    types, groups, locations = list(DeviceTypeEnum), list(DeviceGroupEnum), list(DeviceLocationEnum)
+    home.addDevices(
+        home.createDevice(f"device{index}", types[index % len(types)], groups[index % len(groups)], locations[index % len(locations)], on, 0.0, 10.0, 0, index % 3)
+        for index in range(120)
+    )
+    for location in (DeviceLocationEnum.KITCHEN, DeviceLocationEnum.KITCHEN, DeviceLocationEnum.GARDEN):
+        home.addPerson(location)
+    return home
+
+
+def drain_queue(queue):     # (device name, effective priority) in dequeue order.
+    order = []
+    while not queue.isEmpty():
+        task = queue.peek()
+        order.append((task.getTask().deviceName, queue.getPriority(task.getTask())))
+        queue.dequeue()
+    return order
+
+
+def test_bulk_queueing_matches_turning_devices_on_one_by_one():
+    single = build_mixed_home(False)
+    for device in list(single.poweredOffDevices):
+        single.turnOnDevice(device)
+    switched = build_mixed_home(False)
+    switched.turnOnAllDevices()
+    added = build_mixed_home(True)
+
+    people = {DeviceLocationEnum.KITCHEN: 2, DeviceLocationEnum.GARDEN: 1}
+    for device in single.poweredOnDevices:
+        expected = device.device_type.priority + device.device_group.priority + people.get(device.location, 0) * 10
+        assert single.deviceQueue.getPriority(device) == expected
+    for queue in ("deviceQueue", "powerReducibleDevices"):
+        order = drain_queue(getattr(single, queue))
+        assert drain_queue(getattr(switched, queue)) == order
+        assert drain_queue(getattr(added, queue)) == order
+    assert len(order) == 80     # Devices at power level 0 cannot be turned down.
+
+
+@pytest.mark.parametrize("barrier", ["group LIGHTS", "type OTHERS"])
+def test_rules_apply_in_queue_order_across_a_barrier(barrier):
+    home = build_home(float("inf"))
+    first, second = home.getDeviceByName("device0"), home.getDeviceByName("device1")
+    for rule in (
+        f"turn {first.deviceId} off",
+        f"{barrier} on",            # Turns the first device back on.
+        f"turn {second.deviceId} off",
+        f"{barrier} off",           # Turns the second device off again, and every other one.
+        f"turn {first.deviceId} on",
+    ):
+        home.addRule(home.compileRule(rule))
+    home.executeRules()
+
+    assert first.is_turned_on() and not second.is_turned_on()
+    assert list(home.poweredOnDevices) == [first]
+    assert home.deviceTable.check_totals() == 0
+
+
+def test_failing_rule_does_not_drop_the_rest_of_its_batch():
+    home = build_home(float("inf"))
+    removed, kept = home.getDeviceByName("device0"), home.getDeviceByName("device1")
+    home.addRule(home.compileRule(f"set {kept.deviceId} 1"))
+    home.addRule(home.compileRule(f"turn {removed.deviceId} off"))
+    home.addImmediateRule(home.compileRule(f"flip {removed.deviceId}"))
+    home.addRule(home.compileRule(f"turn {kept.deviceId} off"))
+    home.removeDevice(removed)      # Cancels the queued rules for the device, but not the immediate one.
+    assert len(home.getRuleList()) == 3
+
+    home.executeRules()
+    assert kept.get_power_level() == 1 and not kept.is_turned_on()
+    assert len(home.getRuleList()) == 0
+    assert any(f"ID {removed.deviceId} not found" in message for message in home.severeTasks.to_list())
+
+
+def test_log_drains_every_queued_entry_once():
+    home = build_home(float("inf"))
+    for index in range(5):
+        home.addLog(logging.ERROR, f"entry {index}")
+    home.addPowerLog(logging.WARNING, "power")
+
+    home.log()
+    assert home.getLoggingList().is_empty()
+    assert home.getPowerConsumptionLogList().is_empty()
+    home.addLog(logging.INFO, "later")
+    assert [task.message for task in home.getLoggingList()] == ["later"]
+
+
+def test_log_streams_are_bounded_and_read_by_cursor():
+    home = SmartHome(float("inf"), 22, False, seed=0, autoStart=False)
+    home.clearSevereTasks()
+    _, cursor = home.readLogSince("severe", 0)
+    for index in range(home.LOG_CAPACITY + 5):
+        home.addLog(logging.ERROR, f"entry {index}")
+
+    entries, cursor = home.readLogSince("severe", cursor)
+    assert len(entries) == home.LOG_CAPACITY
+    assert entries[0] == "entry 5" and entries[-1] == f"entry {home.LOG_CAPACITY + 4}"
+    home.addLog(logging.ERROR, "later")
+    assert home.readLogSince("severe", cursor) == (["later"], cursor + 1)
+
+
+def test_occupancy_shifts_the_priority_of_devices_in_that_location():
+    home = build_mixed_home(False)
+    home.turnOnAllDevices()
+    kitchen = [device for device in home.poweredOnDevices if device.location == DeviceLocationEnum.KITCHEN]
+    before = {device: home.deviceQueue.getPriority(device) for device in kitchen}
+
+    home.addPerson(DeviceLocationEnum.KITCHEN)
+    assert all(home.deviceQueue.getPriority(device) == priority + 10 for device, priority in before.items())
+    for _ in range(3):
+        home.removePerson(DeviceLocationEnum.KITCHEN)
+    home.removePerson(DeviceLocationEnum.KITCHEN)     # Nobody left, so the offset stays at 0.
+    assert all(home.deviceQueue.getPriority(device) == priority - 20 for device, priority in before.items())
+
+
+def build_random_home(seed, devices=300):    # Random draws, power levels and batteries, with about half the devices on.
+    rng = random.Random(seed)
+    home = SmartHome(float("inf"), 22, False, seed=seed, autoStart=False)
+    types, groups, locations = list(DeviceTypeEnum), list(DeviceGroupEnum), list(DeviceLocationEnum)
+    home.addDevices(
+        home.createDevice(
+            f"device{index}", rng.choice(types), rng.choice(groups), rng.choice(locations), rng.random() < 0.5,
+            rng.choice([0.0, rng.uniform(0, 100)]), rng.uniform(0, 50), rng.choice([0, 500, 5000]), rng.randrange(6),
+        )
+        for index in range(devices)
+    )
+    return home
+
+
+def scalar_consumption(home, baseOnly=False):     # The per-device formula the table columns replaced.
+    breakdown = {"total": 0.0, "location": {}, "group": {}, "type": {}}
+    for device in home.devicesById.values():
+        if not device.isTurnedOn:
+            continue
+        draw = device.basePowerConsumption * (1 if baseOnly or device.powerLevel <= 0 else device.powerLevel)
+        breakdown["total"] += draw
+        for kind, key in (("location", device.location), ("group", device.device_group), ("type", device.device_type)):
+            breakdown[kind][key] = breakdown[kind].get(key, 0.0) + draw
+    return breakdown
+
+
+def assert_breakdown_matches(home, baseOnly=False):
+    expected = scalar_consumption(home, baseOnly)
+    breakdown = home.calculatePowerBreakdown(baseOnly)
+    assert breakdown["total"] == pytest.approx(expected["total"])
+    for kind in ("location", "group", "type"):
+        assert {key: total for key, total in breakdown[kind].items() if total} == pytest.approx(expected[kind])
+
+
+def test_vectorized_consumption_matches_the_scalar_formula():
+    home = build_random_home(1)
+    assert_breakdown_matches(home)
+    assert_breakdown_matches(home, baseOnly=True)
+    assert home.calculateCurrentPowerConsumption() == pytest.approx(scalar_consumption(home)["total"])
+    assert home.calculateCurrentBasePowerConsumption() == pytest.approx(scalar_consumption(home, True)["total"])
+
+    rng = random.Random(2)
+    devices = list(home.devicesById.values())
+    for device in rng.sample(devices, 100):
+        home.setDevicePowerLevel(device, rng.randrange(6))
+    for device in rng.sample(devices, 50):
+        (home.turnOffDevice if device.isTurnedOn else home.turnOnDevice)(device)
+    home.realisticPowerConsumption()
+    assert_breakdown_matches(home)
+    assert home.calculateCurrentPowerConsumption() == pytest.approx(home.recalculatePowerConsumption())
+    assert home.deviceTable.check_totals() == pytest.approx(0)
+
+
+def test_vectorized_battery_tick_matches_the_scalar_formula():
+    home = build_random_home(3)
+    devices = list(home.devicesById.values())
+    model = {
+        device: {"on": device.isTurnedOn, "battery": device.onBattery, "capacity": device.currentBatteryCapacity, "level": device.batteryLevel}
+        for device in devices
+    }
+    for _ in range(30):
+        home.reduceBatteryTick()
+        for device, state in model.items():
+            if not state["on"]:
+                continue
+            if device.maxBatteryCapacity > 0 and state["capacity"] == 0:
+                state.update(capacity=device.maxBatteryCapacity, battery=True, level=100)
+            if state["battery"]:
+                # reduceBatteryLevel, on the model's copy of the device.
+                state["capacity"] -= device.basePowerConsumption * device.powerLevel
+                state["level"] = int(state["capacity"] / device.maxBatteryCapacity * 100) if device.maxBatteryCapacity else 0
+                state["on"] = state["level"] > 0      # A depleted battery turns the device off.
+        for device, state in model.items():
+            assert device.isTurnedOn == state["on"] and device.onBattery == state["battery"]
+            assert device.currentBatteryCapacity == pytest.approx(state["capacity"])
+            assert device.batteryLevel == state["level"]
+    assert any(not state["on"] and state["battery"] for state in model.values())
+    assert home.deviceTable.check_totals() == pytest.approx(0)
+
+
+def snapshot(home):
+    return [(device.isTurnedOn, device.powerLevel, device.basePowerConsumption) for device in home.devicesById.values()]
+
+
+def test_simulation_is_reproducible_and_keeps_the_home_consistent():
+    homes = [build_random_home(4), build_random_home(4)]
+    levelZero = {device.deviceId for device in homes[0].devicesById.values() if device.powerLevel == 0}
+    for _ in range(10):
+        for home in homes:
+            home.simulateDeviceChange()
+            home.realisticPowerConsumption()
+        assert snapshot(homes[0]) == snapshot(homes[1])
+
+    home = homes[0]
+    assert snapshot(home) != snapshot(build_random_home(4))
+    for device in home.devicesById.values():
+        assert device.powerLevel == 0 if device.deviceId in levelZero else 1 <= device.powerLevel <= 6
+        assert (device in home.poweredOnDevices) == device.isTurnedOn != (device in home.poweredOffDevices)
+        assert (home.deviceQueue.getTaskT(device) is not None) == device.isTurnedOn
+    assert home.deviceTable.check_totals() == pytest.approx(0)
+
+
+def test_removed_device_leaves_its_group_type_and_location():
+    home = build_mixed_home(True)
+    device = home.getDeviceByName("device7")
+    containers = [home.groupMap[device.device_group.name], home.typeMap[device.device_type.name], home.locationMap[device.location.name]]
+    assert all(container.contains(device) for container in containers)
+
+    home.removeDevice(device)
+    assert not any(container.contains(device) for container in containers)
+    assert device not in home.getDevicesByLocation(device.location.name)
+    home.turnOffDevicesByLocation(device.location.name)
+    assert device.isTurnedOn
+
+
+def test_compiled_rules_resolve_their_targets_once():
+    home = build_home(float("inf"))
+    device = home.getDeviceByName("device2")
+    for text, op, target, argument in (
+        (f"turn {device.deviceId} on", RuleOp.TURN_ON, device, None),
+        ("turn device2 off", RuleOp.TURN_OFF, device, None),
+        (f"set {device.deviceId} 4", RuleOp.SET_POWER_LEVEL, device, 4),
+        (f"flip {device.deviceId}", RuleOp.FLIP, device, None),
+        ("group LIGHTS off", RuleOp.GROUP_OFF, "LIGHTS", None),
+        ("type OTHERS on", RuleOp.TYPE_ON, "OTHERS", None),
+        ("location KITCHEN off", RuleOp.LOCATION_OFF, "KITCHEN", None),
+    ):
+        compiled = home.compileRule(text)
+        assert (compiled.op, compiled.target, compiled.argument) == (op, target, argument)
+    assert home.compileRule("TURN   device2 OFF") is home.compileRule("turn device2 off")
+    with pytest.raises(RuleParsingException):
+        home.compileRule(f"set {device.deviceId} 9")
+
+
+def test_renamed_and_removed_devices_drop_their_cached_rules():
+    home = build_home(float("inf"))
+    renamed, removed = home.getDeviceByName("device2"), home.getDeviceByName("device3")
+    home.compileRule("turn device2 on")
+    byId = home.compileRule(f"turn {removed.deviceId} on")
+    assert len(home.ruleCache) == 2
+
+    renamed.deviceName = "porch"
+    assert len(home.ruleCache) == 1
+    with pytest.raises(RuleParsingException):
+        home.compileRule("turn device2 on")
+    assert home.compileRule("turn porch off").target is renamed
+
+    home.removeDevice(removed)
+    assert home.ruleCache.get(RuleCache.normalize(f"turn {removed.deviceId} on")) is None
+    with pytest.raises(RuleParsingException):
+        home.compileRule(f"turn {removed.deviceId} on")
+    with pytest.raises(RuleParsingException):
+        home.runCompiledRule(byId)
+
+
+def queued_rules(home):
+    return [rule for rule, _ in home.getRuleList().drain()]
+
+
+def test_condition_rule_fires_when_its_condition_becomes_true():
+    home = build_home(float("inf"))
+    target = home.getDeviceByName("device1")
+    rule = home.addConditionRule(f"if KITCHEN people >= 2 turn {target.deviceId} off")
+    home.evaluateConditionRules()
+    assert queued_rules(home) == []
+
+    home.addPerson(DeviceLocationEnum.KITCHEN)
+    home.addPerson(DeviceLocationEnum.KITCHEN)
+    home.evaluateConditionRules()
+    assert queued_rules(home) == [rule.action]
+    home.addPerson(DeviceLocationEnum.KITCHEN)     # Still true, so nothing new.
+    home.evaluateConditionRules()
+    home.evaluateConditionRules()
+    assert queued_rules(home) == []
+
+    for _ in range(3):
+        home.removePerson(DeviceLocationEnum.KITCHEN)
+    home.evaluateConditionRules()
+    home.addPerson(DeviceLocationEnum.KITCHEN)
+    home.addPerson(DeviceLocationEnum.KITCHEN)
+    home.evaluateConditionRules()
+    assert queued_rules(home) == [rule.action]
+
+
+def test_condition_rule_true_when_added_fires_once():
+    home = build_home(float("inf"))
+    home.addConditionRule("if power > 100 group LIGHTS off")
+    home.evaluateConditionRules()
+    home.evaluateConditionRules()
+    assert [rule.op for rule in queued_rules(home)] == [RuleOp.GROUP_OFF]
+
+
+def test_condition_rules_are_only_evaluated_when_an_input_changes():
+    home = build_home(float("inf"))
+    watched, other = home.getDeviceByName("device0"), home.getDeviceByName("device1")
+    calls = []
+    action = home.compileRule(f"turn {other.deviceId} off")
+    home.registerConditionRule([("device", watched, "power_level")], lambda: calls.append(watched.powerLevel) or watched.powerLevel >= 4, action)
+    home.evaluateConditionRules()
+    assert calls == [3]
+
+    home.setDevicePowerLevel(other, 5)
+    home.evaluateConditionRules()
+    assert calls == [3]
+    home.setDevicePowerLevel(watched, 4)
+    home.evaluateConditionRules()
+    assert calls == [3, 4] and queued_rules(home) == [action]
+
+
+def test_removing_a_device_drops_the_condition_rules_that_use_it():
+    home = build_home(float("inf"))
+    watched, target = home.getDeviceByName("device0"), home.getDeviceByName("device1")
+    home.addConditionRule(f"if {watched.deviceId} level >= 4 group LIGHTS off")
+    home.addConditionRule(f"if power > 0 turn {target.deviceId} off")
+    kept = home.addConditionRule("if KITCHEN temperature > 30 group LIGHTS off")
+    assert len(home.conditionRules) == 3
+
+    home.removeDevice(watched)
+    home.removeDevice(target)
+    assert list(home.conditionRules.rules) == [kept.rule_id]
+    assert home.removeConditionRule(kept.rule_id) and not home.removeConditionRule(kept.rule_id)
+    assert home.conditionRules.dependents == {}
+
+
+def test_running_home_applies_a_submitted_rule_without_polling():
+    home = SmartHome(float("inf"), 22, False, seed=0, configureLogging=False, autoStart=False)
+    device = home.createDevice("lamp", DeviceTypeEnum.OTHERS, DeviceGroupEnum.LIGHTS, DeviceLocationEnum.KITCHEN, True, 0.0, 100.0)
+    home.addDevice(device)
+    home.setRuleBatchWindow(0)
+    home.start()
+    try:
+        home.submitRule(f"turn {device.deviceId} off")
+        deadline = time.time() + 5
+        while device.isTurnedOn and time.time() < deadline:
+            time.sleep(0.001)
+        assert not device.isTurnedOn
+        assert home.getRuleLatencyStats()["count"] == 1
+    finally:
+        home.stop()
+
+
+def test_tick_phase_periods_are_given_in_seconds():
+    home = build_home(float("inf"))
+    for name in list(home.getTickPhaseStats()):
+        home.setTickPhaseEnabled(name, False)
+    ticks = []
+    home.registerTickPhase("probe", lambda: ticks.append(home.tickCount), 3 * home.TICK_INTERVAL, offset=home.TICK_INTERVAL)
+    for _ in range(7):
+        home.tickTask()
+    assert ticks == [1, 4, 7]
+
+    home.setTickPhasePeriod("probe", 2 * home.TICK_INTERVAL, 0)
+    ticks.clear()
+    for _ in range(4):
+        home.tickTask()
+    assert ticks == [8, 10]
+    assert home.getTickPhaseStats()["probe"]["runs"] == 5
+    assert not home.getTickPhaseStats()["battery"]["enabled"]
+
+
+def home_state(home):
+    return (
+        sorted(device.deviceName for device in home.poweredOnDevices),
+        sorted(device.deviceName for device in home.poweredOffDevices),
+        [device.deviceName for device in home.devicesById.values() if device.isTurnedOn],
+        drain_queue(home.deviceQueue),
+        drain_queue(home.powerReducibleDevices),
+        home.deviceTable.check_totals(),
+    )
+
+
+@pytest.mark.parametrize("kind", ["Group", "Type", "Location"])
+def test_bulk_switching_off_matches_switching_devices_one_by_one(kind):
+    name = {"Group": "LIGHTS", "Type": "OTHERS", "Location": "KITCHEN"}[kind]
+    bulk, single = build_mixed_home(True), build_mixed_home(True)
+    getattr(bulk, f"turnOffDevicesBy{kind}")(name)
+    for device in getattr(single, f"getDevicesBy{kind}")(name):
+        single.turnOffDevice(device)
+    assert home_state(bulk) == home_state(single)
+
+
+def test_bulk_transitions_skip_devices_already_in_that_state():
+    home = build_mixed_home(False)
+    devices = list(home.poweredOffDevices)[:10]
+    assert home.applyTransitions(devices[:5], True) == devices[:5]
+    assert home.applyTransitions(devices + devices, True) == devices[5:]
+    assert home.applyTransitions(devices[:5], True) == []
+    assert home.applyTransitions(devices[:3], False) == devices[:3]
+    assert len(home.poweredOnDevices) == 7 and home.deviceQueue.size() == 7
+    assert home.deviceTable.check_totals() == pytest.approx(0)
+
+
+def test_add_devices_skips_invalid_devices_and_keeps_the_rest():
+    home = build_home(float("inf"), devices=2)
+    Attic = collections.namedtuple("Location", "name")("ATTIC")     # Never added to the home.
+    existing = home.getDeviceByName("device0")
+    duplicate = home.createDevice("copy", DeviceTypeEnum.OTHERS, DeviceGroupEnum.LIGHTS, DeviceLocationEnum.KITCHEN, True)
+    lost = home.createDevice("lost", DeviceTypeEnum.OTHERS, DeviceGroupEnum.LIGHTS, Attic, True)
+    cooler = home.createDevice("cooler", DeviceTypeEnum.OTHERS, DeviceGroupEnum.AIRCONDITIONERS, DeviceLocationEnum.KITCHEN, False, 0.0, 50.0)
+    lamp = home.createDevice("lamp", DeviceTypeEnum.OTHERS, DeviceGroupEnum.LIGHTS, DeviceLocationEnum.KITCHEN, True, 0.0, 20.0)
+    clash = SmartHome(float("inf"), 22, False, autoStart=False).createDevice(
+        "clash", DeviceTypeEnum.OTHERS, DeviceGroupEnum.LIGHTS, DeviceLocationEnum.KITCHEN, True
+    )
+    assert clash.deviceId == existing.deviceId
+
+    added = home.addDevices([duplicate, duplicate, lost, cooler, lamp, clash])
+    assert [device.deviceName for device in added] == ["copy", "cooler", "lamp"]
+    assert isinstance(home.getDeviceByName("cooler"), AirConditioner)
+    assert home.getDevice(existing.deviceId) is existing
+    assert len(home.deviceTable) == 5 and lost.get_table() is not home.deviceTable
+    assert set(home.poweredOnDevices) == {existing, home.getDeviceByName("device1"), duplicate, lamp}
+    assert set(home.poweredOffDevices) == {home.getDeviceByName("cooler")}
+    assert home.deviceQueue.size() == 4 and home.deviceQueue.getTaskT(lamp) is not None
+    assert home.getPowerConsumption() == pytest.approx(2 * 300 + 20)
+    assert home.deviceTable.check_totals() == pytest.approx(0)
@@ -0,0 +1,78 @@
+import pytest
+
+from main.tasks.tickphases import PhaseRegistry
+
+
+def run_ticks(registry, ticks, on_error=None):
+    for tick in range(1, ticks + 1):
+        registry.run(tick, on_error)
+
+
+def recorder(calls, name):
+    return lambda: calls.append(name)
+
+
+def test_phases_run_on_their_period_and_offset():
+    registry = PhaseRegistry()
+    calls = []
+    for name, period, offset in (("every", 1, 0), ("third", 3, 0), ("late", 4, 2)):
+        registry.register(name, recorder(calls, name), period, offset)
+    ticks = {"every": [], "third": [], "late": []}
+    for tick in range(1, 13):
+        registry.run(tick)
+        for name in calls:
+            ticks[name].append(tick)
+        calls.clear()
+    assert ticks == {"every": list(range(1, 13)), "third": [3, 6, 9, 12], "late": [2, 6, 10]}
+
+
+def test_phases_run_by_priority_then_registration_order():
+    registry = PhaseRegistry()
+    calls = []
+    registry.register("b", recorder(calls, "b"), priority=5)
+    registry.register("a", recorder(calls, "a"), priority=5)
+    registry.register("first", recorder(calls, "first"), priority=-1)
+    registry.run(1)
+    assert calls == ["first", "b", "a"]
+
+    registry.register("b", recorder(calls, "b again"), priority=5)    # Replacing a phase moves it behind its ties.
+    calls.clear()
+    registry.run(1)
+    assert calls == ["first", "a", "b again"]
+
+
+def test_disabled_phases_and_new_periods_apply_from_the_next_tick():
+    registry = PhaseRegistry()
+    calls = []
+    registry.register("phase", recorder(calls, "phase"), enabled=False)
+    run_ticks(registry, 2)
+    assert calls == []
+
+    registry.set_enabled("phase", True)
+    registry.set_period("phase", 2, offset=1)
+    run_ticks(registry, 6)
+    assert len(calls) == 3      # Ticks 1, 3 and 5.
+    assert registry.unregister("phase") and not registry.unregister("phase")
+    run_ticks(registry, 2)
+    assert len(calls) == 3
+
+    with pytest.raises(ValueError):
+        registry.register("fast", recorder(calls, "fast"), period=0)
+
+
+def test_failing_phase_does_not_stop_the_others():
+    registry = PhaseRegistry()
+    calls, errors = [], []
+
+    def fail():
+        raise RuntimeError("boom")
+
+    registry.register("fail", fail, priority=0)
+    registry.register("after", recorder(calls, "after"), priority=1)
+    run_ticks(registry, 3, lambda phase, e: errors.append((phase.name, str(e))))
+    assert calls == ["after"] * 3 and errors == [("fail", "boom")] * 3
+
+    stats = registry.get_stats()
+    assert list(stats) == ["fail", "after"]
+    assert stats["fail"]["runs"] == 3 and stats["fail"]["errors"] == 3
+    assert stats["after"]["errors"] == 0 and stats["after"]["mean_time"] >= 0
@@ -0,0 +1,23 @@
+import random
+
+from main.datastructures.timingwheel import TimingWheel
+
+
+def expected_deadline(wheel, handles):    # What next_deadline promises, by looking at every live timer.
+    ticks = [handle.tick for handle in handles if handle.is_active()]
+    if not ticks:
+        return None
+    horizon = wheel.current_tick + wheel.wheel_size
+    return min([tick for tick in ticks if tick <= horizon] or [horizon]) * wheel.resolution
+
+
+def test_next_deadline_matches_a_full_scan():
+    rng = random.Random(0)
+    wheel = TimingWheel(wheel_size=16, start=0)
+    handles = [wheel.schedule(index, rng.uniform(1, 100), rng.choice([None, 7.0])) for index in range(300)]
+    for step in range(60):
+        wheel.advance(step * 3.5)
+        for handle in rng.sample(handles, 5):
+            wheel.cancel(handle)
+        handles.append(wheel.schedule("late", step * 3.5 + rng.uniform(1, 40)))
+        assert wheel.next_deadline() == expected_deadline(wheel, handles)